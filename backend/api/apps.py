@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Connect cache invalidation receivers
+        from . import signals  # noqa: F401
+        # Register system checks
+        from . import checks  # noqa: F401
+        # Count every query towards the current request's metrics
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid='api.metrics.install_query_recorder')
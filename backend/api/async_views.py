@@ -0,0 +1,169 @@
+import json
+import math
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, ParseError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import StatelessJWTAuthentication
+from .cache import aget_question_list, etag_matches
+from .models import PersonalityQuestion, UserLocation
+from .pagination import PersonalityQuestionPagination
+from .serializers import PersonalityQuestionSerializer, UserLocationSerializer
+from .throttling import acheck_throttle
+
+User = get_user_model()
+
+# Async versions of the small, I/O-bound endpoints. Under ASGI each request
+# is a coroutine on the worker's event loop instead of a thread, so a worker
+# can hold many concurrent location pings. DRF views are sync-only, so these
+# are plain Django views that reproduce the DRF responses. api/urls.py
+# serves them in place of the DRF views when ASYNC_API_VIEWS is on.
+
+
+async def authenticate(request, stateless=False):
+    """
+    Async equivalent of simplejwt's JWTAuthentication: validates the bearer
+    token, then loads its user with the async ORM.
+
+    Args:
+        request: The request
+        stateless: Skip the user query and return a TokenClaimsUser, like
+                   StatelessJWTAuthentication (for safe methods only)
+
+    Returns:
+        The user, or None if the request carries no token
+
+    Raises:
+        InvalidToken, AuthenticationFailed
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+    validated_token = authenticator.get_validated_token(raw_token)
+    if stateless:
+        return StatelessJWTAuthentication().get_user(validated_token)
+    try:
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+    user = await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None:
+        raise AuthenticationFailed("User not found", code="user_not_found")
+    if not user.is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return user
+
+def error_response(exc):
+    """Render an APIException the way DRF's default exception handler does."""
+    data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = JWTAuthentication().authenticate_header(None)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = str(math.ceil(exc.wait))
+    return response
+
+
+class AsyncAPIView(View):
+    """
+    Base for the async views: JWT authentication, throttling by
+    `throttle_scope`, no CSRF (like DRF's views) and APIExceptions turned
+    into DRF-style error responses.
+    """
+    authentication_required = True
+    stateless_authentication = False
+    throttle_scope = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.authentication_required:
+                stateless = self.stateless_authentication and request.method in SAFE_METHODS
+                request.user = await authenticate(request, stateless)
+                if request.user is None:
+                    raise NotAuthenticated()
+            await acheck_throttle(request, self.throttle_scope)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return error_response(exc)
+
+    def parse_json(self, request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {e}")
+
+
+# --- View for Personality Questions (GET) ---
+class AsyncPersonalityQuestionListView(AsyncAPIView):
+    """
+    Async PersonalityQuestionListView: the same pre-rendered list, ETag,
+    caching headers and keyset pages. Accessible by anyone.
+    """
+    authentication_required = False
+
+    async def get(self, request, *args, **kwargs):
+        paginator = PersonalityQuestionPagination()
+        if paginator.is_requested(request):
+            questions = await paginator.apaginate_queryset(PersonalityQuestion.objects.all(), request)
+            response = JsonResponse(paginator.get_paginated_data(PersonalityQuestionSerializer(questions, many=True).data))
+            patch_cache_control(response, public=True, max_age=settings.QUESTION_LIST_MAX_AGE)
+            return response
+
+        async def build():
+            questions = [question async for question in PersonalityQuestion.objects.order_by('order')]
+            return list(PersonalityQuestionSerializer(questions, many=True).data)
+
+        payload = await aget_question_list(build)
+        if etag_matches(request, payload.etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(payload.body, content_type='application/json')
+        response['ETag'] = payload.etag
+        patch_cache_control(response, public=True, max_age=settings.QUESTION_LIST_MAX_AGE)
+        return response
+
+# --- View for User Location (GET, POST) ---
+class AsyncUserLocationView(AsyncAPIView):
+    """
+    Async UserLocationView.
+    GET: Retrieves the user's latest location
+    POST: Creates a new location entry
+    """
+    stateless_authentication = True # Reads don't need the user row
+    throttle_scope = 'location'
+
+    async def get(self, request, *args, **kwargs):
+        location = await UserLocation.objects.filter(user_id=request.user.pk).order_by('-last_updated').afirst()
+        if location is None:
+            return JsonResponse({"detail": "No location data found for this user."}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(UserLocationSerializer(location).data)
+
+    async def post(self, request, *args, **kwargs):
+        serializer = UserLocationSerializer(data=self.parse_json(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        location = await UserLocation.objects.acreate(
+            user_id=request.user.pk,
+            latitude=serializer.validated_data['latitude'],
+            longitude=serializer.validated_data['longitude'],
+            is_active=serializer.validated_data.get('is_active', True),
+        )
+        return JsonResponse(UserLocationSerializer(location).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .last_login import record_login
+
+User = get_user_model()
+
+# --- Stateless JWT authentication ---
+# JWTAuthentication loads the user row on every request. Our tokens also
+# carry the user's active flag, so hot endpoints that only need to know who
+# is calling can authenticate reads from the verified token alone with
+# StatelessJWTAuthentication. Claims are fixed when the refresh token is
+# issued; refreshing re-checks the account, so a deactivated user keeps read
+# access for at most one ACCESS_TOKEN_LIFETIME. Writes still load the user:
+# a token outlives a deleted account, and rows must never be created for a
+# user id that no longer exists.
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token with an is_active claim (access tokens inherit it)."""
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['is_active'] = user.is_active
+        return token
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login serializer (SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER']) issuing
+    ClaimsRefreshTokens. last_login is written later, in bulk (api/last_login.py).
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user.pk)
+        return data
+
+class LastLoginTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER']) that also counts as a login."""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Already verified by super()
+        refresh = self.token_class(attrs['refresh'], verify=False)
+        record_login(User._meta.pk.to_python(refresh[jwt_settings.USER_ID_CLAIM]))
+        return data
+
+
+class TokenClaimsUser:
+    """
+    Stand-in for the authenticated user, built from token claims. pk/id and
+    is_active come from the token; reading any other attribute (email,
+    is_staff, ...) loads the user row once, on first use.
+
+    Not a model instance: filter and create with `user_id=request.user.pk`
+    rather than `user=request.user`.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self.token = token
+        # simplejwt stores the id as a string
+        self.pk = self.id = User._meta.pk.to_python(token[jwt_settings.USER_ID_CLAIM])
+        self.is_active = token.get('is_active', True)
+
+    @cached_property
+    def user(self):
+        """The full user row."""
+        try:
+            return User.objects.get(**{jwt_settings.USER_ID_FIELD: self.pk})
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+    def __getattr__(self, name):
+        # Only called for attributes not set above
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __str__(self):
+        return f"user {self.pk}"
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Opt-in (per view) JWT authentication. Safe methods (GET, HEAD, OPTIONS)
+    trust the verified token and run no query; request.user is a
+    TokenClaimsUser. Other methods load the user like JWTAuthentication.
+    """
+    stateless = True
+
+    def authenticate(self, request):
+        self.stateless = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.stateless:
+            return super().get_user(validated_token)
+        if jwt_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        user = TokenClaimsUser(validated_token)
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -0,0 +1,212 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+
+from .cache import VersionWatcher, bump_version
+from .models import Club, Course, Interest, Major, Minor, Profile
+
+AUTOCOMPLETE_VERSION = 'autocomplete'
+
+# kind -> (model, Profile M2M fields whose links count towards popularity)
+AUTOCOMPLETE_SOURCES = {
+    'interests': (Interest, ['interests']),
+    'clubs': (Club, ['clubs']),
+    'majors': (Major, ['majors']),
+    'minors': (Minor, ['minors']),
+    'courses': (Course, ['courses_taking', 'favorite_courses']),
+}
+
+# Prefixes up to this length match too many names to rank per keystroke,
+# so their top results are computed when the index is built
+SHORT_PREFIX_LENGTH = 2
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class AutocompleteIndex:
+    """
+    In-memory typeahead index over one reference table.
+
+    Names are kept sorted by their normalized form, so a prefix is a
+    contiguous range found by binary search. Queries that match no (or too
+    few) prefixes fall back to a trigram index, which finds names containing
+    the query anywhere (e.g. "comp" -> "Intro to Computer Science").
+    Results are ranked by popularity: how many profiles link to the name.
+
+    Names created after the build are added with add(). They are kept in a
+    short side list, searched by a linear scan until the next rebuild folds
+    them into the sorted index.
+    """
+    def __init__(self, entries, max_results):
+        # entries: iterable of (name, popularity)
+        rows = sorted((normalize(name), name, count) for name, count in entries)
+        self.keys = [row[0] for row in rows]
+        self.names = [row[1] for row in rows]
+        self.counts = [row[2] for row in rows]
+        self.max_results = max_results
+        self._added = () # (popularity, key, name), replaced rather than mutated
+        self._add_lock = threading.Lock()
+
+        self._short_prefixes = defaultdict(list)
+        self._trigrams = defaultdict(set)
+        for i, key in enumerate(self.keys):
+            for length in range(1, SHORT_PREFIX_LENGTH + 1):
+                if len(key) >= length:
+                    self._short_prefixes[key[:length]].append(i)
+            for trigram in trigrams(key):
+                self._trigrams[trigram].add(i)
+        for prefix, indexes in self._short_prefixes.items():
+            self._short_prefixes[prefix] = self._top(indexes, max_results)
+
+    def __len__(self):
+        return len(self.keys) + len(self._added)
+
+    def __contains__(self, name):
+        key = normalize(name)
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.names[i] == name:
+                return True
+            i += 1
+        return any(added_name == name for _, _, added_name in self._added)
+
+    def add(self, name, count=0):
+        """Add a name created since the build, unless the index has it already."""
+        with self._add_lock:
+            if name not in self:
+                self._added = (*self._added, (count, normalize(name), name))
+
+    def _top(self, indexes, limit):
+        return heapq.nsmallest(limit, indexes, key=lambda i: (-self.counts[i], self.keys[i]))
+
+    def _prefix_matches(self, query, limit):
+        if len(query) <= SHORT_PREFIX_LENGTH:
+            return self._short_prefixes.get(query, [])[:limit]
+        lo = bisect_left(self.keys, query)
+        hi = bisect_left(self.keys, query + '\uffff')
+        return self._top(range(lo, hi), limit)
+
+    def _substring_matches(self, query, limit, exclude):
+        query_trigrams = sorted((self._trigrams.get(t, set()) for t in trigrams(query)), key=len)
+        if not query_trigrams or not query_trigrams[0]:
+            return []
+        candidates = set.intersection(*query_trigrams)
+        # Trigrams can match out of order, so confirm the substring
+        matches = [i for i in candidates if i not in exclude and query in self.keys[i]]
+        return self._top(matches, limit)
+
+    def _with_added(self, indexes, added, limit):
+        """Rank the index's matches together with matching added names."""
+        matches = [(self.counts[i], self.keys[i], self.names[i]) for i in indexes]
+        if added:
+            matches = heapq.nsmallest(limit, matches + added, key=lambda match: (-match[0], match[1]))
+        return matches
+
+    def search(self, query, limit=10):
+        """
+        Return up to `limit` (name, popularity) pairs matching `query`,
+        prefix matches first.
+        """
+        query = normalize(query)
+        limit = min(limit, self.max_results)
+        if not query or limit <= 0:
+            return []
+        added = self._added
+        indexes = self._prefix_matches(query, limit)
+        matches = self._with_added(indexes, [match for match in added if match[1].startswith(query)], limit)
+        if len(matches) < limit and len(query) >= 3:
+            found = self._substring_matches(query, limit - len(matches), set(indexes))
+            contained = [match for match in added if query in match[1] and not match[1].startswith(query)]
+            matches += self._with_added(found, contained, limit - len(matches))
+        return [(name, count) for count, _, name in matches]
+
+
+def _popularity(m2m_fields):
+    counts = Counter()
+    for field_name in m2m_fields:
+        field = Profile._meta.get_field(field_name)
+        target_column = f"{field.m2m_reverse_field_name()}_id"
+        rows = (
+            field.remote_field.through.objects
+            .values(target_column)
+            .annotate(total=Count('pk'))
+            .values_list(target_column, 'total')
+        )
+        counts.update(dict(rows))
+    return counts
+
+def build_index(kind):
+    model, m2m_fields = AUTOCOMPLETE_SOURCES[kind]
+    counts = _popularity(m2m_fields)
+    entries = [(name, counts.get(pk, 0)) for pk, name in model.objects.values_list('pk', 'name')]
+    return AutocompleteIndex(entries, settings.AUTOCOMPLETE_MAX_RESULTS)
+
+
+# --- Index store ---
+# Each worker builds an index per kind on first use. New names (onboarding
+# creates them all the time) are added to this worker's index in place;
+# other workers pick them up at their next popularity refresh, every
+# AUTOCOMPLETE_REFRESH_INTERVAL seconds. Renames and deletes mark the
+# kind's index dirty, locally and in other workers through a per-kind
+# shared version token. While an index rebuilds, other threads keep using
+# the old one.
+
+_indexes = {} # kind -> (built_at, index)
+_dirty = set(AUTOCOMPLETE_SOURCES)
+_build_lock = threading.Lock()
+_shared_versions = {
+    kind: VersionWatcher(f"{AUTOCOMPLETE_VERSION}:{kind}", settings.AUTOCOMPLETE_CHECK_INTERVAL)
+    for kind in AUTOCOMPLETE_SOURCES
+}
+
+def _is_stale(kind, current):
+    return (
+        current is None
+        or kind in _dirty
+        or time.monotonic() - current[0] > settings.AUTOCOMPLETE_REFRESH_INTERVAL
+    )
+
+def get_index(kind):
+    """Return the current AutocompleteIndex for `kind`, rebuilding it if needed."""
+    if _shared_versions[kind].changed():
+        _dirty.add(kind)
+    current = _indexes.get(kind)
+    if not _is_stale(kind, current):
+        return current[1]
+    # Without an index we have to wait; otherwise only one thread rebuilds
+    if _build_lock.acquire(blocking=current is None):
+        try:
+            # Another thread may have rebuilt it while we waited
+            current = _indexes.get(kind)
+            if _is_stale(kind, current):
+                _dirty.discard(kind)
+                current = _indexes[kind] = (time.monotonic(), build_index(kind))
+        finally:
+            _build_lock.release()
+    return current[1]
+
+def _kinds(model):
+    return [kind for kind, (source_model, _) in AUTOCOMPLETE_SOURCES.items() if source_model is model]
+
+def add_name(model, name):
+    """Add a newly created name to this worker's index over `model`, if it has one."""
+    for kind in _kinds(model):
+        current = _indexes.get(kind)
+        if current is not None:
+            current[1].add(name)
+
+def mark_dirty(model):
+    """Rebuild the index over `model` on its next use, in every worker."""
+    for kind in _kinds(model):
+        _dirty.add(kind)
+        bump_version(f"{AUTOCOMPLETE_VERSION}:{kind}")
@@ -0,0 +1,223 @@
+# Helpers for writing users, profiles and their relations in bulk.
+#
+# bulk_create() doesn't send model signals, so nothing here invalidates the
+# profile cache. That's fine for newly created rows, which can't be cached
+# yet; callers changing existing profiles must call invalidate_profile().
+import io
+import json
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from django.db import connections, models, router
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from .models import Profile
+
+
+def profile_m2m_fields():
+    """Names of the Profile many-to-many fields (majors, interests, ...)."""
+    return [field.name for field in Profile._meta.many_to_many]
+
+def profile_links(field_name, pairs):
+    """
+    Build (unsaved) through-table rows for a Profile M2M field.
+
+    Args:
+        field_name: Profile M2M field, e.g. 'interests'
+        pairs: Iterable of (profile_id, target_id)
+
+    Returns:
+        List of through model instances ready for bulk_create
+    """
+    field = Profile._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = f"{field.m2m_field_name()}_id"
+    target = f"{field.m2m_reverse_field_name()}_id"
+    return [through(**{source: profile_id, target: target_id}) for profile_id, target_id in pairs]
+
+def link_profiles(field_name, pairs, batch_size=1000):
+    """bulk_create the through-table rows for `pairs` (see profile_links)."""
+    links = profile_links(field_name, pairs)
+    if links:
+        links[0].__class__.objects.bulk_create(links, batch_size=batch_size, ignore_conflicts=True)
+    return len(links)
+
+@contextmanager
+def explicit_auto_now(model, field_name):
+    """
+    Let bulk_create() store the given values of an auto_now field (e.g.
+    UserLocation.last_updated when loading historical pings) instead of
+    overwriting them with the current time. Affects the whole process, so
+    only use it from management commands.
+    """
+    field = model._meta.get_field(field_name)
+    auto_now = field.auto_now
+    field.auto_now = False
+    try:
+        yield
+    finally:
+        field.auto_now = auto_now
+
+def resolve_names(model, names, batch_size=1000):
+    """
+    Bulk equivalent of `model.objects.get_or_create(name=name)` for a
+    reference model: missing names are created, existing ones reused.
+
+    Returns:
+        Dict of name -> pk. Where names aren't unique (Course), the oldest
+        row wins.
+    """
+    names = list(set(names))
+    found = {}
+    for start in range(0, len(names), batch_size):
+        rows = model.objects.filter(name__in=names[start:start + batch_size]).order_by('-pk').values_list('name', 'pk')
+        found.update(rows)
+    missing = [name for name in names if name not in found]
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing], batch_size=batch_size, ignore_conflicts=True)
+        for start in range(0, len(missing), batch_size):
+            rows = model.objects.filter(name__in=missing[start:start + batch_size]).order_by('-pk').values_list('name', 'pk')
+            found.update(rows)
+    return found
+
+
+# --- Parallel batches ---
+
+def run_batches(function, jobs, workers):
+    """
+    Yield `function(job)` for every job: in order in this process when
+    `workers` is 1, else in completion order from that many forked
+    processes. If a batch raises, the batches not yet started are cancelled
+    and the pool is shut down before the error propagates.
+    """
+    if workers == 1:
+        for job in jobs:
+            yield function(job)
+        return
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(function, job) for job in jobs]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        except BaseException:
+            # Also when the caller stops early; the with-block then waits
+            # for the batches already running
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+# --- COPY loading ---
+# On PostgreSQL, COPY streams rows in one round trip without building an
+# INSERT statement per batch, which makes it several times faster than
+# bulk_create() for large loads. Other databases fall back to bulk_create().
+
+def _copy_value(field, obj, connection):
+    value = field.pre_save(obj, add=True)
+    if value is None:
+        return None
+    if isinstance(field, models.JSONField):
+        return json.dumps(value, cls=field.encoder)
+    value = field.get_db_prep_save(value, connection)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+def _copy_csv(rows):
+    # Every value is quoted, so empty strings stay distinct from NULL
+    # (an unquoted empty field)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join('' if value is None else '"' + value.replace('"', '""') + '"' for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+def bulk_insert(model, objs, batch_size=1000):
+    """
+    Insert new rows with COPY on PostgreSQL and bulk_create() elsewhere.
+
+    Like bulk_create() this skips save() and signals. Unlike it, primary
+    keys are not set on `objs` on the COPY path: look the rows up by a
+    unique column afterwards.
+
+    Returns:
+        Number of rows inserted
+    """
+    if not objs:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        return len(objs)
+
+    fields = [field for field in model._meta.concrete_fields if not field.db_returning]
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    sql = f"COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    data = _copy_csv([_copy_value(field, obj, connection) for field in fields] for obj in objs)
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'): # psycopg2
+            raw_cursor.copy_expert(sql, data)
+        else: # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                copy.write(data.getvalue())
+    return len(objs)
+
+
+# --- Raw cascaded deletes ---
+# QuerySet.delete() loads every row it cascades to into Python (our models
+# have signal receivers, which rules out Django's fast path) and sends a
+# signal per row. These helpers follow the same on_delete rules with plain
+# DELETE/UPDATE statements, handling only primary keys.
+
+def _delete_relations(model):
+    return list(get_candidate_relations_to_delete(model._meta))
+
+def raw_cascade_delete(model, pks):
+    """
+    Delete the rows with the given primary keys and everything that
+    cascades from them, without loading instances or sending signals.
+    Call it in a transaction, with a bounded number of `pks`.
+
+    Args:
+        model: Model class to delete from
+        pks: Primary keys of the rows to delete
+
+    Returns:
+        Counter of model label -> rows deleted
+
+    Raises:
+        ValueError: If a relation uses an on_delete other than CASCADE,
+                    SET_NULL or DO_NOTHING
+    """
+    deleted = Counter()
+    pks = list(pks)
+    if not pks:
+        return deleted
+    using = router.db_for_write(model)
+    for relation in _delete_relations(model):
+        related_model = relation.related_model
+        field = relation.field
+        on_delete = field.remote_field.on_delete
+        related = related_model._base_manager.using(using).filter(**{f"{field.name}__in": pks})
+        if on_delete is models.CASCADE:
+            if _delete_relations(related_model):
+                deleted += raw_cascade_delete(related_model, related.values_list('pk', flat=True))
+            else:
+                # Nothing points at these rows (answers, M2M links,
+                # locations), so they can go in one statement
+                count = related._raw_delete(using)
+                if count:
+                    deleted[related_model._meta.label] += count
+        elif on_delete is models.SET_NULL:
+            related.update(**{field.name: None})
+        elif on_delete is not models.DO_NOTHING:
+            raise ValueError(f"Can't raw-delete through {related_model._meta.label}.{field.name} ({on_delete.__name__})")
+    deleted[model._meta.label] += model._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+    return deleted
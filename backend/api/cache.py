@@ -0,0 +1,226 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from typing import Any, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .monitoring import count_cache_lookup
+from .replicas import use_primary
+
+
+# --- Version tokens ---
+# Cached entries record the version tokens that were current when they were
+# built. Invalidating a group only means replacing its token, so a single
+# cache write retires every entry in the group without having to find them.
+
+def _version_key(name):
+    return f"version:{name}"
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+def get_version(name):
+    """
+    Return the current version token for `name`, creating one if the cache
+    doesn't have it yet (first use, eviction or a cache restart).
+    """
+    key = _version_key(name)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, _new_token(), None)
+        token = cache.get(key)
+    return token
+
+async def aget_version(name):
+    """Async get_version(), for async views."""
+    key = _version_key(name)
+    token = await cache.aget(key)
+    if token is None:
+        await cache.aadd(key, _new_token(), None)
+        token = await cache.aget(key)
+    return token
+
+def bump_version(*names):
+    """Retire every cache entry built against the current version of each of `names`."""
+    cache.set_many({_version_key(name): _new_token() for name in names}, None)
+
+class VersionWatcher:
+    """
+    Polls a shared version token at most once per `interval` seconds, so
+    in-process structures can notice changes made by other workers without
+    a cache round trip on every request.
+    """
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self._seen = None
+        self._next_check = 0.0
+
+    def changed(self):
+        """True if the token moved since the last check."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.interval
+        version = get_version(self.name)
+        changed = self._seen is not None and version != self._seen
+        self._seen = version
+        return changed
+
+
+# --- ETags ---
+
+def make_etag(data):
+    """Build a strong ETag from the JSON encoding of `data`."""
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode('utf-8')
+    return quote_etag(hashlib.sha256(payload).hexdigest()[:32])
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match header covers `etag`."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+# --- Serialized profile cache ---
+# Keyed by user id (known straight from the access token) so a hit doesn't
+# need to look the profile up first. Each entry is checked against the
+# per-user token and the global 'profiles' token in one get_many call.
+
+PROFILES_VERSION = 'profiles'
+
+def _profile_entry_key(user_id, variant):
+    return f"profile:{user_id}:{variant}"
+
+def _profile_version_name(user_id):
+    return f"profile:{user_id}"
+
+def cached_profile_payload(user_id, build, variant=''):
+    """
+    Return `(etag, data)` for a user's serialized profile.
+
+    Args:
+        user_id: Primary key of the profile's user
+        build: Callable returning the serialized profile, used on a miss
+        variant: Distinguishes differently shaped payloads for the same user
+
+    Returns:
+        Tuple of the payload's ETag and the payload itself
+    """
+    entry_key = _profile_entry_key(user_id, variant)
+    user_version_key = _version_key(_profile_version_name(user_id))
+    global_version_key = _version_key(PROFILES_VERSION)
+
+    found = cache.get_many([entry_key, user_version_key, global_version_key])
+    user_version = found.get(user_version_key) or get_version(_profile_version_name(user_id))
+    global_version = found.get(global_version_key) or get_version(PROFILES_VERSION)
+
+    entry = found.get(entry_key)
+    hit = entry is not None and entry[0] == user_version and entry[1] == global_version
+    count_cache_lookup('profile', hit)
+    if hit:
+        return entry[2], entry[3]
+
+    # Versions are read before building, so a write that lands while we
+    # serialize replaces the token and the entry below is never served.
+    # A replica may not have that write yet, so build from 'default'.
+    with use_primary():
+        data = build()
+    etag = make_etag(data)
+    cache.set(entry_key, (user_version, global_version, etag, data), settings.PROFILE_CACHE_TIMEOUT)
+    return etag, data
+
+def invalidate_profile(user_id):
+    """Drop every cached payload for a single user's profile."""
+    bump_version(_profile_version_name(user_id))
+
+def invalidate_profiles(user_ids):
+    """invalidate_profile() for many users, in one cache write."""
+    bump_version(*(_profile_version_name(user_id) for user_id in user_ids))
+
+def invalidate_all_profiles():
+    """Drop every cached profile payload (e.g. after a reference rename)."""
+    bump_version(PROFILES_VERSION)
+
+
+# --- Pre-rendered payloads ---
+# Small, rarely changing lists are kept in process memory already encoded to
+# JSON. Each worker holds its own copy and rebuilds it when the shared
+# version token moves. Bumps only reach other workers (and management
+# commands only reach the web workers) through a shared cache, so copies are
+# also rebuilt after QUESTION_LIST_LOCAL_MAX_AGE seconds whatever the token says.
+
+class PrerenderedPayload(NamedTuple):
+    version: str
+    etag: str
+    data: Any
+    body: bytes
+    built_at: float = 0.0 # time.monotonic()
+
+def prerender(version, data):
+    """Encode `data` once and key it by the hash of the encoded bytes."""
+    body = JSONRenderer().render(data)
+    etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+    return PrerenderedPayload(version, etag, data, body, time.monotonic())
+
+QUESTIONS_VERSION = 'questions'
+
+_question_list = None
+_question_list_lock = threading.Lock()
+
+def _is_current(payload, version):
+    return (
+        payload is not None
+        and payload.version == version
+        and time.monotonic() - payload.built_at < settings.QUESTION_LIST_LOCAL_MAX_AGE
+    )
+
+def get_question_list(build):
+    """
+    Return the pre-rendered personality question list, calling `build` to
+    serialize the questions when the in-memory copy is missing or stale.
+    """
+    global _question_list
+    version = get_version(QUESTIONS_VERSION)
+    current = _question_list
+    hit = _is_current(current, version)
+    count_cache_lookup('question_list', hit)
+    if hit:
+        return current
+    with _question_list_lock:
+        current = _question_list
+        if not _is_current(current, version):
+            current = _question_list = prerender(version, build())
+    return current
+
+async def aget_question_list(abuild):
+    """Async get_question_list(); `abuild` is a coroutine function."""
+    global _question_list
+    version = await aget_version(QUESTIONS_VERSION)
+    current = _question_list
+    hit = _is_current(current, version)
+    count_cache_lookup('question_list', hit)
+    if not hit:
+        # Concurrent misses may each build; they produce the same payload
+        current = _question_list = prerender(version, await abuild())
+    return current
+
+def invalidate_question_list():
+    bump_version(QUESTIONS_VERSION)
+
+def invalidate_question_set():
+    """
+    Retire the question list and every profile payload in a single cache
+    write: question domain/facet/keying feed every profile's personality
+    results.
+    """
+    bump_version(QUESTIONS_VERSION, PROFILES_VERSION)
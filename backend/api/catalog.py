@@ -0,0 +1,49 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from django.conf import settings
+
+from .cache import prerender
+
+TEST_STRUCTURE_PATH = os.path.join(settings.BASE_DIR, 'api', 'data', 'personality_test.json')
+
+
+@lru_cache(maxsize=1)
+def _load_test_structure():
+    with open(TEST_STRUCTURE_PATH, 'rb') as f:
+        raw = f.read()
+    return hashlib.sha256(raw).hexdigest()[:12], json.loads(raw)
+
+def get_test_structure():
+    """Return the parsed personality_test.json (read once per process)."""
+    return _load_test_structure()[1]
+
+def get_catalog_version():
+    """Return the content version of the personality text catalog."""
+    return _load_test_structure()[0]
+
+@lru_cache(maxsize=1)
+def get_personality_catalog():
+    """
+    Return the pre-rendered personality text catalog.
+
+    Profiles only carry domain/facet codes, scores and result levels; clients
+    resolve the prose (titles, descriptions, result texts) from this catalog,
+    matching the `version` a profile was scored against.
+    """
+    version, test_structure = _load_test_structure()
+    domains = {}
+    for domain in test_structure:
+        domains[domain['domain']] = {
+            'title': domain['title'],
+            'short_description': domain['shortDescription'],
+            'description': domain['description'],
+            'results': {result['score']: result['text'] for result in domain['results']},
+            'facets': {
+                str(facet['facet']): {'title': facet['title'], 'description': facet['text']}
+                for facet in domain['facets']
+            },
+        }
+    return prerender(version, {'version': version, 'domains': domains})
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends that keep nothing, or keep it in the process that wrote it
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(deploy=True)
+def check_deploy_cache(app_configs, **kwargs):
+    """Invalidations are cache writes; other processes only see them in a shared cache."""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "The default cache is process-local, so cached profiles and the question list "
+        "aren't invalidated in other workers, or by management commands.",
+        hint="Point DJANGO_CACHE_BACKEND at a cache every worker shares (Redis, Memcached or the database cache).",
+        id='api.W002',
+    )]
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Read-your-writes after a write only works if every worker sees the marker."""
+    if not settings.DATABASE_REPLICAS or settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "DATABASE_REPLICAS is set but the default cache is process-local, so a user's "
+        "reads can go to a lagging replica right after they wrote through another worker.",
+        hint="Point DJANGO_CACHE_BACKEND at a cache every worker shares (Redis, Memcached or the database cache).",
+        id='api.W001',
+    )]
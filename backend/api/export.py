@@ -0,0 +1,142 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import (
+    Club, Course, Interest, Major, Minor, PersonalityAnswer, Profile,
+    UserLocation,
+)
+
+# Everything here streams: rows are read with .iterator(), which uses a
+# server-side cursor on PostgreSQL, and encoded one line at a time, so memory
+# use depends on chunk_size rather than on the size of the table.
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+PROFILE_NAME_FIELDS = {
+    'majors': Major,
+    'minors': Minor,
+    'interests': Interest,
+    'courses_taking': Course,
+    'favorite_courses': Course,
+    'clubs': Club,
+}
+PROFILE_COLUMNS = [
+    'profile_id', 'user_id', 'email', 'first_name', 'last_name', 'preferred_name',
+    'date_joined', 'year_in_school', 'department', *PROFILE_NAME_FIELDS, 'socials',
+]
+ANSWER_COLUMNS = ['profile_id', 'user_id', 'question_id', 'domain', 'facet', 'reverse_scale', 'answer_score']
+LOCATION_COLUMNS = ['id', 'user_id', 'latitude', 'longitude', 'last_updated', 'is_active']
+
+
+def _profile_rows(chunk_size, since, user_ids, using):
+    queryset = Profile.objects.using(using).select_related('user').order_by('pk').prefetch_related(*(
+        # Names are all we export, so don't load the rest of each row
+        Prefetch(field_name, queryset=model.objects.only('pk', 'name'))
+        for field_name, model in PROFILE_NAME_FIELDS.items()
+    ))
+    if since is not None:
+        queryset = queryset.filter(user__date_joined__gte=since)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    # prefetch_related runs once per chunk of `chunk_size` profiles
+    for profile in queryset.iterator(chunk_size=chunk_size):
+        user = profile.user
+        row = [
+            profile.pk, user.pk, user.email, user.first_name, user.last_name, user.preferred_name,
+            user.date_joined, profile.year_in_school, profile.department,
+        ]
+        row += [[item.name for item in getattr(profile, field_name).all()] for field_name in PROFILE_NAME_FIELDS]
+        row.append(profile.socials or {})
+        yield row
+
+def _answer_rows(chunk_size, since, user_ids, using):
+    queryset = PersonalityAnswer.objects.using(using).order_by('pk').values_list(
+        'profile_id', 'profile__user_id', 'question_id', 'question__domain',
+        'question__facet', 'question__reverse_scale', 'answer_score',
+    )
+    if since is not None:
+        queryset = queryset.filter(profile__user__date_joined__gte=since)
+    if user_ids is not None:
+        queryset = queryset.filter(profile__user_id__in=user_ids)
+    return queryset.iterator(chunk_size=chunk_size)
+
+def _location_rows(chunk_size, since, user_ids, using):
+    queryset = UserLocation.objects.using(using).order_by('pk').values_list(*LOCATION_COLUMNS)
+    if since is not None:
+        queryset = queryset.filter(last_updated__gte=since)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return queryset.iterator(chunk_size=chunk_size)
+
+# name -> (columns, row generator)
+EXPORTS = {
+    'profiles': (PROFILE_COLUMNS, _profile_rows),
+    'answers': (ANSWER_COLUMNS, _answer_rows),
+    'locations': (LOCATION_COLUMNS, _location_rows),
+}
+
+
+def parse_since(value):
+    """
+    Parse an ISO date or datetime for the `since` filter. Naive values are
+    taken to be in the current time zone.
+
+    Raises:
+        ValueError: If `value` is neither
+    """
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"'{value}' is not an ISO date or datetime.")
+        since = datetime.combine(day, time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+class _LineBuffer:
+    """File-like object that hands back whatever csv.writer writes to it."""
+    def write(self, value):
+        return value
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+def export_lines(name, file_format='jsonl', chunk_size=2000, since=None, user_ids=None, using=None):
+    """
+    Stream one of the EXPORTS as JSONL or CSV.
+
+    Args:
+        name: 'profiles', 'answers' or 'locations'
+        file_format: 'jsonl' (one JSON object per line) or 'csv' (with a
+                     header row; name lists are joined with ';')
+        chunk_size: Rows fetched from the database per round trip
+        since: Optional datetime; only rows for users who joined (profiles,
+               answers) or pings recorded (locations) at or after it
+        user_ids: Optional list; only rows belonging to these users
+        using: Database alias to read from (default: as routed)
+
+    Yields:
+        Encoded lines, each ending in a newline
+    """
+    columns, rows = EXPORTS[name]
+    if file_format == 'csv':
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(columns)
+        for row in rows(chunk_size, since, user_ids, using):
+            yield writer.writerow([_csv_value(value) for value in row])
+    else:
+        encoder = DjangoJSONEncoder()
+        for row in rows(chunk_size, since, user_ids, using):
+            yield encoder.encode(dict(zip(columns, row))) + '\n'
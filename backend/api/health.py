@@ -0,0 +1,36 @@
+import time
+
+from django.db import DatabaseError, connections
+
+
+def database_status():
+    """
+    Check every configured database and describe how its connections are managed.
+
+    Returns:
+        Dict of alias -> {ok, latency_ms, error, vendor, conn_max_age,
+        health_checks, pool}, where `pool` holds the psycopg pool's counters
+        (size, available, requests waiting, ...) or None without a pool
+    """
+    status = {}
+    for alias in connections:
+        connection = connections[alias]
+        started = time.perf_counter()
+        error = None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError as e:
+            error = str(e)
+        # Only the PostgreSQL backend has a pool (None when it isn't configured)
+        pool = getattr(connection, 'pool', None)
+        status[alias] = {
+            'ok': error is None,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'error': error,
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'pool': pool.get_stats() if pool is not None else None,
+        }
+    return status
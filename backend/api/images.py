@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import invalidate_profile
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+# --- Profile image pipeline ---
+# Uploads are saved as they arrive, which is quick, and processed after the
+# request in a small thread pool (Pillow releases the GIL while decoding,
+# resizing and encoding). Processing turns the upload into:
+#   profile_images/<hh>/<hash>/full.jpg     at most PROFILE_IMAGE_MAX_SIZE px
+#   profile_images/<hh>/<hash>/<name>.jpg   square thumbnails, PROFILE_IMAGE_THUMBNAILS
+# all re-encoded as JPEG without EXIF or other metadata (phone photos carry
+# GPS coordinates). <hash> is the SHA-256 of the uploaded bytes, so the same
+# upload is only processed and stored once, whoever uploads it. The profile
+# then points at full.jpg, the original is deleted and image_hash is set.
+# Until then the API serves the original and no thumbnails.
+
+UPLOAD_DIR = 'profile_images' # Profile.image upload_to; processed files live in subdirectories
+IMAGE_FORMAT = 'JPEG'
+IMAGE_EXTENSION = 'jpg'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def image_dir(image_hash):
+    return posixpath.join(UPLOAD_DIR, image_hash[:2], image_hash)
+
+def image_path(image_hash, name):
+    return posixpath.join(image_dir(image_hash), f"{name}.{IMAGE_EXTENSION}")
+
+def thumbnail_urls(profile):
+    """
+    Returns:
+        {name: storage URL} for the profile's thumbnails, or None if it has
+        no image or the image hasn't been processed yet
+    """
+    # A new upload keeps the previous hash until it's processed itself
+    if not profile.image or not profile.image_hash or profile.image.name != image_path(profile.image_hash, 'full'):
+        return None
+    return {name: default_storage.url(image_path(profile.image_hash, name)) for name in settings.PROFILE_IMAGE_THUMBNAILS}
+
+
+def encode(image):
+    """JPEG bytes of `image`, without metadata (Pillow only writes EXIF when asked to)."""
+    output = BytesIO()
+    image.save(output, IMAGE_FORMAT, quality=settings.PROFILE_IMAGE_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+def render_variants(data):
+    """
+    Decode an upload and render every variant.
+
+    Returns:
+        {name: JPEG bytes}, 'full' plus one per PROFILE_IMAGE_THUMBNAILS entry
+
+    Raises:
+        UnidentifiedImageError, OSError: `data` isn't a readable image
+    """
+    with Image.open(BytesIO(data)) as upload:
+        # Phones store the rotation in EXIF, which is about to be dropped
+        image = ImageOps.exif_transpose(upload)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        full = image.copy()
+        full.thumbnail((settings.PROFILE_IMAGE_MAX_SIZE, settings.PROFILE_IMAGE_MAX_SIZE), Image.Resampling.LANCZOS)
+        variants = {'full': encode(full)}
+        for name, size in settings.PROFILE_IMAGE_THUMBNAILS.items():
+            variants[name] = encode(ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS))
+    return variants
+
+def store_variants(image_hash, data):
+    """Render and save the variants of `data` unless this content was stored before."""
+    names = ['full', *settings.PROFILE_IMAGE_THUMBNAILS]
+    if all(default_storage.exists(image_path(image_hash, name)) for name in names):
+        return False
+    for name, content in render_variants(data).items():
+        path = image_path(image_hash, name)
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(content))
+    return True
+
+
+def process_profile_image(profile_id):
+    """
+    Process the profile's current upload (see above). Does nothing if the
+    image was processed already, or replaced or removed meanwhile.
+
+    Returns:
+        The content hash, or None if there was nothing to do
+    """
+    profile = Profile.objects.filter(pk=profile_id).only('pk', 'user_id', 'image', 'image_hash').first()
+    if profile is None or not profile.image:
+        return None
+    original = profile.image.name
+    if posixpath.dirname(original) != UPLOAD_DIR:
+        return None # Already processed
+
+    with profile.image.open('rb') as upload:
+        data = upload.read()
+    image_hash = hashlib.sha256(data).hexdigest()
+    try:
+        store_variants(image_hash, data)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        logger.warning("Could not process image %s of profile %s", original, profile_id, exc_info=True)
+        return None
+
+    # Only if no newer upload replaced it while we worked
+    updated = Profile.objects.filter(pk=profile_id, image=original).update(
+        image=image_path(image_hash, 'full'), image_hash=image_hash,
+    )
+    if updated:
+        default_storage.delete(original)
+        # update() sends no signals
+        invalidate_profile(profile.user_id)
+    return image_hash
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PROFILE_IMAGE_WORKERS, thread_name_prefix='profile-image')
+        return _executor
+
+def _process_in_background(profile_id):
+    try:
+        process_profile_image(profile_id)
+    except Exception:
+        logger.exception("Processing the image of profile %s failed", profile_id)
+    finally:
+        # Connections are per thread; don't leave this one's open
+        connections.close_all()
+
+def schedule_profile_image(profile_id):
+    """
+    Process the profile's image once the current transaction commits, in
+    the worker pool (or right away when PROFILE_IMAGE_WORKERS is 0).
+    """
+    if settings.PROFILE_IMAGE_WORKERS <= 0:
+        transaction.on_commit(lambda: process_profile_image(profile_id))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_process_in_background, profile_id))
@@ -0,0 +1,96 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# --- Deferred last_login writes ---
+# simplejwt's UPDATE_LAST_LOGIN saves the user row on every login (and
+# through post_save, drops their cached profile). Instead, the token
+# endpoints record logins here and each worker writes what it buffered in a
+# single bulk UPDATE, from a background thread, LAST_LOGIN_FLUSH_INTERVAL
+# seconds after the first unwritten login. So last_login lags by at most
+# that interval; logins buffered by a worker that is killed outright are
+# lost (gunicorn.conf.py flushes on a normal worker exit).
+
+
+class LastLoginBuffer:
+    """Per-process user id -> latest login time, written out by flush()."""
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, user_id, when=None):
+        """Buffer a login of `user_id`, at `when` (default: now)."""
+        when = when or timezone.now()
+        interval = settings.LAST_LOGIN_FLUSH_INTERVAL
+        with self._lock:
+            self._merge({user_id: when})
+            if interval > 0 and self._timer is None:
+                self._timer = threading.Timer(interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+        if interval <= 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every buffered login in one bulk UPDATE (batched for very
+        large buffers). On failure the logins are put back for the next
+        flush.
+
+        Returns:
+            Number of users written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel() # No-op when called from the timer itself
+                self._timer = None
+        if not pending:
+            return 0
+        users = [User(pk=pk, last_login=when) for pk, when in pending.items()]
+        try:
+            User.objects.bulk_update(users, ['last_login'], batch_size=1000)
+        except Exception:
+            with self._lock:
+                self._merge(pending)
+            raise
+        return len(users)
+
+    def _merge(self, logins):
+        # Caller holds the lock
+        for user_id, when in logins.items():
+            previous = self._pending.get(user_id)
+            if previous is None or when > previous:
+                self._pending[user_id] = when
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Writing buffered last_login values failed; retrying on the next login")
+        finally:
+            # Connections are per thread and this one is done
+            connections.close_all()
+
+
+_buffer = LastLoginBuffer()
+
+def record_login(user_id, when=None):
+    """Note that `user_id` just logged in or refreshed their token."""
+    _buffer.record(user_id, when)
+
+def flush_last_logins():
+    """Write the buffered logins now, e.g. before the worker exits."""
+    return _buffer.flush()
@@ -0,0 +1,42 @@
+# backend/api/management/commands/export_data.py
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_FORMATS, EXPORTS, export_lines, parse_since
+from api.replicas import pick_replica
+
+
+class Command(BaseCommand):
+    help = 'Stream profiles, personality answers or locations to a JSONL or CSV file for offline analysis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl', help='Output format (default: jsonl)')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--since', help='Only users who joined / pings recorded at or after this ISO date or datetime')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip (default: 2000)')
+        parser.add_argument('--database', help='Database alias to read from (default: a read replica, if any)')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since']) if options['since'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        using = options['database'] or pick_replica()
+        if using not in settings.DATABASES:
+            raise CommandError(f"Unknown database '{using}'")
+        lines = export_lines(options['name'], options['format'], max(1, options['chunk_size']), since, using=using)
+        count = -1 if options['format'] == 'csv' else 0 # don't count the header
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                for line in lines:
+                    output.write(line)
+                    count += 1
+            self.stderr.write(self.style.SUCCESS(f"Exported {max(count, 0)} {options['name']} rows to {options['output']}"))
+        else:
+            # Written straight to stdout so the output can be piped
+            for line in lines:
+                sys.stdout.write(line)
@@ -0,0 +1,410 @@
+# backend/api/management/commands/generate_campus_dataset.py
+import math
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.bulk import explicit_auto_now, link_profiles, run_batches
+from api.management.commands.generate_test_users import (
+    ACADEMIC_YEARS, FIRST_NAMES, LAST_NAMES, TEST_EMAIL_DOMAIN, TEST_PASSWORD,
+)
+from api.models import (
+    Club, Course, Interest, Major, Minor, PersonalityAnswer,
+    PersonalityQuestion, Profile, UserLocation,
+)
+
+User = get_user_model()
+
+CAMPUS_TZ = ZoneInfo('America/Denver')
+
+# Approximate building coordinates around the University of Denver campus
+BUILDINGS = {
+    'library': (39.6790, -104.9617),
+    'student_center': (39.6772, -104.9626),
+    'gym': (39.6745, -104.9621),
+    'humanities': (39.6779, -104.9632),
+    'sciences': (39.6763, -104.9614),
+    'engineering': (39.6755, -104.9603),
+    'business': (39.6780, -104.9590),
+    'arts': (39.6757, -104.9560),
+    'north_dorms': (39.6792, -104.9653),
+    'south_dorms': (39.6739, -104.9645),
+    'west_dorms': (39.6735, -104.9625),
+}
+DORMS = ['north_dorms', 'south_dorms', 'west_dorms']
+
+# department -> (major name, building its classes are in)
+DEPARTMENTS = {
+    'COMP': ("Computer Science", 'engineering'),
+    'ENGR': ("Mechanical Engineering", 'engineering'),
+    'MATH': ("Mathematics", 'engineering'),
+    'PHYS': ("Physics", 'sciences'),
+    'CHEM': ("Chemistry", 'sciences'),
+    'BIO': ("Biology", 'sciences'),
+    'PSYC': ("Psychology", 'humanities'),
+    'ENG': ("English", 'humanities'),
+    'HIST': ("History", 'humanities'),
+    'PHIL': ("Philosophy", 'humanities'),
+    'POLI': ("Political Science", 'humanities'),
+    'ECON': ("Economics", 'business'),
+    'BUS': ("Business Administration", 'business'),
+    'ACCT': ("Accounting", 'business'),
+    'MUS': ("Music", 'arts'),
+    'ART': ("Studio Art", 'arts'),
+    'THEA': ("Theatre", 'arts'),
+}
+COURSE_NUMBERS = ['1010', '1020', '2010', '2050', '2800', '3100', '3350', '3700', '4100', '4500']
+
+MINORS = [
+    "Data Science", "Business", "Statistics", "Creative Writing", "Music",
+    "Art History", "Spanish", "French", "Environmental Studies", "Philosophy",
+    "Film Studies", "Economics", "Psychology", "Leadership", "Public Health",
+    "Sustainability", "Computer Science", "Mathematics", "Japanese", "German",
+]
+
+# Listed roughly from most to least popular; popularity follows a Zipf curve
+INTERESTS = [
+    "Music", "Movies", "Hiking", "Travel", "Gaming", "Cooking", "Reading",
+    "Photography", "Sports", "Fitness", "Art", "Programming", "Skiing",
+    "Coffee", "Dancing", "Yoga", "Writing", "Podcasts", "Anime", "Board Games",
+    "Rock Climbing", "Running", "Volunteering", "Fashion", "Concerts",
+    "Snowboarding", "Basketball", "Soccer", "Baking", "Camping", "Chess",
+    "Drawing", "Theatre", "Politics", "Startups", "Investing", "Cycling",
+    "Guitar", "Piano", "Singing", "Poetry", "History", "Astronomy", "Robotics",
+    "Gardening", "Thrifting", "K-pop", "Film Photography", "Birdwatching",
+    "Woodworking", "Knitting", "Calligraphy", "Fencing", "Sailing", "Archery",
+    "Origami", "Beekeeping", "Juggling", "Lockpicking", "Falconry",
+]
+CLUBS = [
+    "Outdoors Club", "Ski & Snowboard Club", "Coding Club", "Student Government",
+    "Intramural Soccer", "Dance Team", "Film Society", "Photography Club",
+    "Debate Team", "Entrepreneurship Club", "Chess Club", "Robotics Team",
+    "Theatre Group", "A Cappella", "Environmental Club", "Book Club",
+    "Hiking Club", "Climbing Club", "Anime Club", "Investment Club",
+    "Pre-Med Society", "Model UN", "Jazz Ensemble", "Volunteer Corps",
+    "Esports Team", "Cycling Club", "Art Collective", "Poetry Society",
+    "Astronomy Club", "Fencing Club", "Sailing Club", "Knitting Circle",
+]
+
+DOMAINS = ['O', 'C', 'E', 'A', 'N']
+# Approximate Big Five domain intercorrelations from published norms
+DOMAIN_CORRELATIONS = [
+    #  O      C      E      A      N
+    [1.00, 0.00, 0.20, 0.10, -0.10],
+    [0.00, 1.00, 0.10, 0.25, -0.30],
+    [0.20, 0.10, 1.00, 0.15, -0.25],
+    [0.10, 0.25, 0.15, 1.00, -0.20],
+    [-0.10, -0.30, -0.25, -0.20, 1.00],
+]
+
+ZIPF_EXPONENT = 1.1
+
+
+def cholesky(matrix):
+    size = len(matrix)
+    lower = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        for j in range(i + 1):
+            total = sum(lower[i][k] * lower[j][k] for k in range(j))
+            if i == j:
+                lower[i][j] = math.sqrt(matrix[i][i] - total)
+            else:
+                lower[i][j] = (matrix[i][j] - total) / lower[j][j]
+    return lower
+
+DOMAIN_CHOLESKY = cholesky(DOMAIN_CORRELATIONS)
+
+def zipf_weights(count):
+    return [1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(count)]
+
+def weighted_sample(rng, population, weights, k):
+    """Sample `k` distinct items, each drawn with probability proportional to its weight."""
+    k = min(k, len(population))
+    # Efraimidis-Spirakis: keep the k largest u ** (1 / w)
+    keyed = sorted(((rng.random() ** (1 / w), item) for item, w in zip(population, weights)), reverse=True)
+    return [item for _, item in keyed[:k]]
+
+def correlated_traits(rng):
+    """Draw one person's Big Five domain z-scores with realistic intercorrelations."""
+    z = [rng.gauss(0, 1) for _ in DOMAINS]
+    return {
+        domain: sum(DOMAIN_CHOLESKY[i][j] * z[j] for j in range(i + 1))
+        for i, domain in enumerate(DOMAINS)
+    }
+
+def answer_score(rng, facet_z, reverse_scale):
+    """Likert answer (1-5) for a question measuring a facet at `facet_z`."""
+    signal = -facet_z if reverse_scale else facet_z
+    return max(1, min(5, round(3 + 1.1 * signal + rng.gauss(0, 0.6))))
+
+def jitter(rng, point, meters=15):
+    lat, lon = point
+    degrees = meters / 111_000
+    return lat + rng.gauss(0, degrees), lon + rng.gauss(0, degrees / math.cos(math.radians(lat)))
+
+
+def daily_trace(rng, schedule, day, ping_minutes, extraversion):
+    """
+    Simulate one day of pings for a student.
+
+    Args:
+        schedule: dict with 'home' (lat, lon), 'classes' {weekday: [(hour, building)]},
+                  'library', 'gym' (daily probabilities)
+        day: local date
+        ping_minutes: Minutes between pings
+        extraversion: Domain z-score; extraverts spend more time out and have the app open more
+
+    Returns:
+        List of (datetime, latitude, longitude, is_active)
+    """
+    weekday = day.weekday()
+    stays = [] # (start hour, end hour, location)
+    if weekday < 5:
+        for hour, building in schedule['classes'].get(weekday, []):
+            stays.append((hour, hour + 50 / 60, BUILDINGS[building]))
+        if rng.random() < 0.7:
+            stays.append((12, 13, BUILDINGS['student_center']))
+        if rng.random() < schedule['library']:
+            start = rng.choice([14, 15, 19, 20])
+            stays.append((start, start + rng.uniform(1, 2.5), BUILDINGS['library']))
+    if rng.random() < schedule['gym']:
+        start = rng.choice([7, 17, 18])
+        stays.append((start, start + 1.25, BUILDINGS['gym']))
+    if rng.random() < 0.3 + 0.15 * extraversion:
+        stays.append((20, 22.5, BUILDINGS['student_center']))
+
+    pings = []
+    start_hour = 8 if weekday < 5 else 10
+    minute = start_hour * 60 + rng.randint(0, ping_minutes)
+    while minute < 23 * 60:
+        hour = minute / 60
+        location = schedule['home']
+        for stay_start, stay_end, stay_location in stays:
+            if stay_start <= hour < stay_end:
+                location = stay_location
+        timestamp = datetime.combine(day, time(int(hour), minute % 60), tzinfo=CAMPUS_TZ)
+        latitude, longitude = jitter(rng, location)
+        is_active = rng.random() < 0.5 + 0.1 * extraversion
+        pings.append((timestamp, latitude, longitude, is_active))
+        minute += ping_minutes + rng.randint(-ping_minutes // 4, ping_minutes // 4)
+    return pings
+
+
+def generate_campus_batch(job):
+    """
+    Create one batch of synthetic students with profiles, answers and
+    location traces. Runs in the command's process or a worker process.
+
+    Returns:
+        Tuple of (users created, location pings created)
+    """
+    rng = random.Random(job['seed'])
+    refs = job['references']
+    batch_size = job['batch_size']
+    days = [job['first_day'] + timedelta(days=offset) for offset in range(job['days'])]
+
+    with transaction.atomic():
+        users = []
+        for i in range(job['start'], job['end']):
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            username = f"{first_name.lower()}.{last_name.lower()}.{job['run_tag']}{i}"
+            users.append(User(
+                email=f"{username}{TEST_EMAIL_DOMAIN}",
+                username=username,
+                password=job['password_hash'],
+                first_name=first_name,
+                last_name=last_name,
+                preferred_name=first_name if rng.random() > 0.7 else "",
+            ))
+        User.objects.bulk_create(users, batch_size=batch_size)
+
+        students = []
+        for user in users:
+            departments = weighted_sample(rng, refs['departments'], refs['department_weights'], rng.choice([1, 1, 1, 2]))
+            year = rng.choice(ACADEMIC_YEARS)
+            students.append({
+                'user': user,
+                'departments': departments,
+                'traits': correlated_traits(rng),
+                'profile': Profile(
+                    user_id=user.pk,
+                    year_in_school=year,
+                    department=DEPARTMENTS[departments[0]][0],
+                    socials={"instagram": f"{user.first_name.lower()}{user.last_name.lower()}"} if rng.random() > 0.4 else {},
+                ),
+            })
+        Profile.objects.bulk_create([student['profile'] for student in students], batch_size=batch_size)
+
+        links = defaultdict(list)
+        answers = []
+        locations = []
+        for student in students:
+            profile_id = student['profile'].pk
+            traits = student['traits']
+
+            majors = [refs['majors'][department] for department in student['departments']]
+            links['majors'].extend((profile_id, major_id) for major_id in majors)
+            if rng.random() < 0.4:
+                links['minors'].append((profile_id, rng.choice(refs['minors'])))
+            # Extraverts list more interests and join more clubs
+            interest_count = max(2, round(5 + 1.5 * traits['E'] + rng.gauss(0, 1.5)))
+            interests = weighted_sample(rng, refs['interests'], refs['interest_weights'], interest_count)
+            links['interests'].extend((profile_id, interest_id) for interest_id in interests)
+            club_count = max(0, round(1.5 + traits['E'] + rng.gauss(0, 1)))
+            clubs = weighted_sample(rng, refs['clubs'], refs['club_weights'], club_count)
+            links['clubs'].extend((profile_id, club_id) for club_id in clubs)
+
+            # Most courses come from the student's own departments
+            courses = []
+            for _ in range(rng.randint(3, 5)):
+                department = rng.choice(student['departments']) if rng.random() < 0.7 else rng.choice(refs['departments'])
+                course = rng.choice(refs['courses'][department])
+                if course not in courses:
+                    courses.append(course)
+            links['courses_taking'].extend((profile_id, course_id) for course_id, _ in courses)
+            favorites = rng.sample(courses, rng.randint(1, min(2, len(courses))))
+            links['favorite_courses'].extend((profile_id, course_id) for course_id, _ in favorites)
+
+            for question_id, domain, facet, reverse_scale in job['questions']:
+                facet_z = 0.75 * traits[domain] + 0.66 * rng.gauss(0, 1)
+                answers.append(PersonalityAnswer(
+                    profile_id=profile_id,
+                    question_id=question_id,
+                    answer_score=answer_score(rng, facet_z, reverse_scale),
+                ))
+
+            # Weekly class timetable: MWF or TR slots in the course's building
+            classes = defaultdict(list)
+            for _, building in courses:
+                pattern = rng.choice([(0, 2, 4), (1, 3)])
+                hour = rng.choice([8, 9, 10, 11, 13, 14, 15, 16])
+                for weekday in pattern:
+                    classes[weekday].append((hour, building))
+            on_campus = student['profile'].year_in_school in ('FR', 'SO') or rng.random() < 0.2
+            schedule = {
+                'home': BUILDINGS[rng.choice(DORMS)] if on_campus else jitter(rng, BUILDINGS['student_center'], meters=1500),
+                'classes': classes,
+                'library': min(0.9, max(0.1, 0.45 + 0.15 * traits['C'])),
+                'gym': 0.4 if refs['sports_interests'] & set(interests) else 0.15,
+            }
+            for day in days:
+                for timestamp, latitude, longitude, is_active in daily_trace(rng, schedule, day, job['ping_minutes'], traits['E']):
+                    locations.append(UserLocation(
+                        user_id=student['user'].pk,
+                        latitude=latitude,
+                        longitude=longitude,
+                        last_updated=timestamp,
+                        is_active=is_active,
+                    ))
+
+        for field_name, pairs in links.items():
+            link_profiles(field_name, pairs, batch_size=batch_size)
+        PersonalityAnswer.objects.bulk_create(answers, batch_size=batch_size)
+        with explicit_auto_now(UserLocation, 'last_updated'):
+            UserLocation.objects.bulk_create(locations, batch_size=batch_size)
+
+    return len(users), len(locations)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a realistic synthetic campus dataset for load testing: skewed interest/club '
+        'popularity, correlated answers to the full IPIP question set and daily location traces'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of students to create (default: 1000)')
+        parser.add_argument('--days', type=int, default=3, help='Days of location history per student, ending yesterday (default: 3)')
+        parser.add_argument('--ping-minutes', type=int, default=20, help='Average minutes between location pings (default: 20)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible dataset')
+        parser.add_argument('--batch-size', type=int, default=500, help='Students per bulk batch/transaction (default: 500)')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1)')
+
+    def handle(self, *args, **options):
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        count = options['users']
+
+        if PersonalityQuestion.objects.count() < 120:
+            self.stdout.write("Loading the IPIP personality questions...")
+            call_command('populate_big5_test', stdout=self.stdout)
+        questions = list(PersonalityQuestion.objects.values_list('id', 'domain', 'facet', 'reverse_scale'))
+
+        self.stdout.write("Creating reference data...")
+        references = self.create_references()
+
+        # Whole days only: a trace for today would run on to 23:00, into the future
+        today = datetime.now(CAMPUS_TZ).date()
+        run_tag = uuid.uuid4().hex[:6]
+        password_hash = make_password(TEST_PASSWORD)
+        jobs = [
+            {
+                'start': start,
+                'end': min(start + batch_size, count),
+                'seed': seed + start,
+                'run_tag': run_tag,
+                'password_hash': password_hash,
+                'references': references,
+                'questions': questions,
+                'batch_size': batch_size,
+                'first_day': today - timedelta(days=options['days']),
+                'days': options['days'],
+                'ping_minutes': max(1, options['ping_minutes']),
+            }
+            for start in range(0, count, batch_size)
+        ]
+
+        self.stdout.write(f"Creating {count} students in {len(jobs)} batches with {workers} worker(s) (seed {seed})...")
+        created_users = created_pings = 0
+        for users, pings in run_batches(generate_campus_batch, jobs, workers):
+            created_users += users
+            created_pings += pings
+            self.stdout.write(f"  {created_users}/{count} students, {created_pings} location pings")
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully created {created_users} students and {created_pings} location pings'))
+        self.stdout.write(f"All students have the password: '{TEST_PASSWORD}' (emails end in {run_tag}<n>{TEST_EMAIL_DOMAIN})")
+
+    def create_references(self):
+        """
+        get_or_create the campus reference rows and return their ids and
+        popularity weights as plain data for the batch workers.
+        """
+        majors = {
+            department: Major.objects.get_or_create(name=major_name)[0].pk
+            for department, (major_name, _) in DEPARTMENTS.items()
+        }
+        courses = {}
+        for department, (_, building) in DEPARTMENTS.items():
+            courses[department] = [
+                (Course.objects.get_or_create(
+                    name=f"{department} {number}", department=department, course_number=number
+                )[0].pk, building)
+                for number in COURSE_NUMBERS
+            ]
+        interests = [Interest.objects.get_or_create(name=name)[0].pk for name in INTERESTS]
+        sports = {"Sports", "Fitness", "Basketball", "Soccer", "Running", "Rock Climbing", "Yoga"}
+        departments = list(DEPARTMENTS)
+        return {
+            'departments': departments,
+            'department_weights': zipf_weights(len(departments)),
+            'majors': majors,
+            'minors': [Minor.objects.get_or_create(name=name)[0].pk for name in MINORS],
+            'interests': interests,
+            'interest_weights': zipf_weights(len(interests)),
+            'sports_interests': frozenset(
+                pk for pk, name in zip(interests, INTERESTS) if name in sports
+            ),
+            'clubs': [Club.objects.get_or_create(name=name)[0].pk for name in CLUBS],
+            'club_weights': zipf_weights(len(CLUBS)),
+            'courses': courses,
+        }
@@ -1,8 +1,13 @@
 # backend/api/management/commands/generate_test_users.py
 import random
+import uuid
+from collections import defaultdict
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from api.bulk import link_profiles, run_batches
 from api.models import (
     Profile, Interest, Course, Club, Major, Minor,
     PersonalityQuestion, PersonalityAnswer
@@ -10,6 +15,136 @@ from api.models import (
 
 User = get_user_model()
 
+# Sample data for test users
+MAJORS = ["Computer Science", "Psychology", "Biology", "Economics", 
+        "Mathematics", "English", "Political Science", "Physics", 
+        "History", "Chemistry", "Mechanical Engineering"]
+
+MINORS = ["Data Science", "Business", "Statistics", "Creative Writing", 
+        "Music", "Art History", "Spanish", "French", "Environmental Studies", 
+        "Philosophy", "Film Studies"]
+
+INTERESTS = ["Programming", "Reading", "Hiking", "Gaming", "Music", 
+            "Sports", "Photography", "Cooking", "Travel", "Movies", 
+            "Art", "Dancing", "Chess", "Yoga", "Writing"]
+
+COURSES = [
+    {"name": "Intro to Computer Science", "department": "COMP", "course_number": "101"},
+    {"name": "Data Structures", "department": "COMP", "course_number": "201"},
+    {"name": "Algorithms", "department": "COMP", "course_number": "301"},
+    {"name": "Machine Learning", "department": "COMP", "course_number": "401"},
+    {"name": "General Psychology", "department": "PSYC", "course_number": "101"},
+    {"name": "Cognitive Psychology", "department": "PSYC", "course_number": "301"},
+    {"name": "Intro to Biology", "department": "BIO", "course_number": "101"},
+    {"name": "Microeconomics", "department": "ECON", "course_number": "101"},
+    {"name": "Macroeconomics", "department": "ECON", "course_number": "201"},
+    {"name": "Calculus I", "department": "MATH", "course_number": "101"},
+    {"name": "Calculus II", "department": "MATH", "course_number": "102"},
+    {"name": "Literature & Composition", "department": "ENG", "course_number": "101"},
+    {"name": "Physics I", "department": "PHYS", "course_number": "101"},
+    {"name": "U.S. History", "department": "HIST", "course_number": "101"},
+    {"name": "Organic Chemistry", "department": "CHEM", "course_number": "201"}
+]
+
+CLUBS = ["Coding Club", "Chess Club", "Debate Team", "Hiking Club", 
+        "Photography Club", "Theatre Group", "Student Government", 
+        "Robotics Team", "Environmental Club", "Film Society", 
+        "Music Society", "Dance Club", "Art Club", "Book Club"]
+
+# First names and last names for generating realistic usernames
+FIRST_NAMES = ["Alex", "Jamie", "Jordan", "Taylor", "Morgan", "Casey", 
+              "Riley", "Avery", "Quinn", "Dakota", "Skyler", "Charlie",
+              "Blake", "Cameron", "Hayden", "Drew", "Alexis", "Parker",
+              "Reese", "Bailey", "Sam", "Rowan", "Jesse", "Phoenix"]
+
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", 
+             "Miller", "Davis", "Rodriguez", "Martinez", "Hernandez", 
+             "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", 
+             "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", 
+             "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez"]
+
+TEST_EMAIL_DOMAIN = '@testuser.com'
+TEST_PASSWORD = 'testpassword'
+
+ACADEMIC_YEARS = [year[0] for year in Profile.AcademicYear.choices]
+
+def generate_bulk_batch(job):
+    """
+    Create one batch of test users, with profiles, M2M links and answers,
+    using a handful of bulk INSERTs. Runs in the command's process or in a
+    worker process, so it only takes plain data.
+
+    Args:
+        job: dict with 'start'/'end' user indexes, 'seed', 'run_tag',
+             'password_hash', 'references' (M2M field -> candidate ids, plus
+             'department_names'), 'question_ids' and 'batch_size'
+
+    Returns:
+        Number of users created
+    """
+    rng = random.Random(job['seed'])
+    references = job['references']
+    batch_size = job['batch_size']
+
+    with transaction.atomic():
+        users = []
+        for i in range(job['start'], job['end']):
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            username = f"{first_name.lower()}.{last_name.lower()}.{job['run_tag']}{i}"
+            users.append(User(
+                email=f"{username}{TEST_EMAIL_DOMAIN}",
+                username=username,
+                password=job['password_hash'], # Hashed once for the whole run
+                first_name=first_name,
+                last_name=last_name,
+                preferred_name=first_name if rng.random() > 0.7 else ""
+            ))
+        User.objects.bulk_create(users, batch_size=batch_size)
+
+        profiles = []
+        for user in users:
+            first_name = user.first_name.lower()
+            last_name = user.last_name.lower()
+            profiles.append(Profile(
+                user_id=user.pk,
+                year_in_school=rng.choice(ACADEMIC_YEARS),
+                department=rng.choice(references['department_names']) if rng.random() > 0.5 else "",
+                socials={
+                    "instagram": f"{first_name}{last_name}" if rng.random() > 0.4 else "",
+                    "snapchat": f"{first_name}.snap" if rng.random() > 0.6 else "",
+                    "x": f"@{first_name}{rng.randint(10, 999)}" if rng.random() > 0.7 else ""
+                }
+            ))
+        Profile.objects.bulk_create(profiles, batch_size=batch_size)
+
+        # Same shape as the one-at-a-time path
+        links = defaultdict(list)
+        answers = []
+        for profile in profiles:
+            def pick(field_name, low, high, population=None):
+                population = population or references[field_name]
+                chosen = rng.sample(population, rng.randint(low, min(high, len(population))))
+                links[field_name].extend((profile.pk, target_id) for target_id in chosen)
+                return chosen
+
+            pick('majors', 1, 2)
+            pick('minors', 0, 2)
+            pick('interests', 3, 7)
+            courses = pick('courses_taking', 3, 6)
+            pick('favorite_courses', 1, 3, population=courses)
+            pick('clubs', 0, 3)
+            answers.extend(
+                PersonalityAnswer(profile_id=profile.pk, question_id=question_id, answer_score=rng.randint(1, 5))
+                for question_id in job['question_ids']
+            )
+
+        for field_name, pairs in links.items():
+            link_profiles(field_name, pairs, batch_size=batch_size)
+        PersonalityAnswer.objects.bulk_create(answers, batch_size=batch_size)
+
+    return len(users)
+
 class Command(BaseCommand):
     help = 'Generate test users with profiles, interests, courses, and personality answers'
 
@@ -25,62 +160,34 @@ class Command(BaseCommand):
             action='store_true',
             help='Delete existing test users before creating new ones'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Create users with bulk INSERTs and a single password hash (for large load-test datasets)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users per bulk batch/transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes for --bulk (default: 1)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for --bulk, for reproducible datasets'
+        )
 
     def handle(self, *args, **options):
         count = options['count']
         purge = options.get('purge', False)
         
-        # Sample data for test users
-        MAJORS = ["Computer Science", "Psychology", "Biology", "Economics", 
-                "Mathematics", "English", "Political Science", "Physics", 
-                "History", "Chemistry", "Mechanical Engineering"]
-        
-        MINORS = ["Data Science", "Business", "Statistics", "Creative Writing", 
-                "Music", "Art History", "Spanish", "French", "Environmental Studies", 
-                "Philosophy", "Film Studies"]
-        
-        INTERESTS = ["Programming", "Reading", "Hiking", "Gaming", "Music", 
-                    "Sports", "Photography", "Cooking", "Travel", "Movies", 
-                    "Art", "Dancing", "Chess", "Yoga", "Writing"]
-        
-        COURSES = [
-            {"name": "Intro to Computer Science", "department": "COMP", "course_number": "101"},
-            {"name": "Data Structures", "department": "COMP", "course_number": "201"},
-            {"name": "Algorithms", "department": "COMP", "course_number": "301"},
-            {"name": "Machine Learning", "department": "COMP", "course_number": "401"},
-            {"name": "General Psychology", "department": "PSYC", "course_number": "101"},
-            {"name": "Cognitive Psychology", "department": "PSYC", "course_number": "301"},
-            {"name": "Intro to Biology", "department": "BIO", "course_number": "101"},
-            {"name": "Microeconomics", "department": "ECON", "course_number": "101"},
-            {"name": "Macroeconomics", "department": "ECON", "course_number": "201"},
-            {"name": "Calculus I", "department": "MATH", "course_number": "101"},
-            {"name": "Calculus II", "department": "MATH", "course_number": "102"},
-            {"name": "Literature & Composition", "department": "ENG", "course_number": "101"},
-            {"name": "Physics I", "department": "PHYS", "course_number": "101"},
-            {"name": "U.S. History", "department": "HIST", "course_number": "101"},
-            {"name": "Organic Chemistry", "department": "CHEM", "course_number": "201"}
-        ]
-        
-        CLUBS = ["Coding Club", "Chess Club", "Debate Team", "Hiking Club", 
-                "Photography Club", "Theatre Group", "Student Government", 
-                "Robotics Team", "Environmental Club", "Film Society", 
-                "Music Society", "Dance Club", "Art Club", "Book Club"]
-        
-        # First names and last names for generating realistic usernames
-        FIRST_NAMES = ["Alex", "Jamie", "Jordan", "Taylor", "Morgan", "Casey", 
-                      "Riley", "Avery", "Quinn", "Dakota", "Skyler", "Charlie",
-                      "Blake", "Cameron", "Hayden", "Drew", "Alexis", "Parker",
-                      "Reese", "Bailey", "Sam", "Rowan", "Jesse", "Phoenix"]
-        
-        LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", 
-                     "Miller", "Davis", "Rodriguez", "Martinez", "Hernandez", 
-                     "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", 
-                     "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", 
-                     "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez"]
-        
-        # Academic years
-        ACADEMIC_YEARS = [year[0] for year in Profile.AcademicYear.choices]
-        
         # Create or get personality questions
         if not PersonalityQuestion.objects.exists():
             self.stdout.write("Creating personality questions...")
@@ -145,7 +252,20 @@ class Command(BaseCommand):
         # Purge existing test users if requested
         if purge:
             self.stdout.write("Purging existing test users...")
-            User.objects.filter(email__endswith='@testuser.com').delete()
+            call_command('purge_users', test_users=True, stdout=self.stdout)
+        
+        if options['bulk']:
+            references = {
+                'majors': [major.pk for major in created_majors],
+                'minors': [minor.pk for minor in created_minors],
+                'interests': [interest.pk for interest in created_interests],
+                'courses_taking': [course.pk for course in created_courses],
+                'clubs': [club.pk for club in created_clubs],
+                'department_names': [major.name for major in created_majors],
+            }
+            question_ids = [question.pk for question in personality_questions]
+            self.create_bulk(count, references, question_ids, options)
+            return
         
         # Create test users
         self.stdout.write(f"Creating {count} test users...")
@@ -229,4 +349,38 @@ class Command(BaseCommand):
         for user in User.objects.filter(email__endswith='@testuser.com').order_by('email'):
             self.stdout.write(f"{user.email:<30} | testpassword")
             
-        self.stdout.write("\nAll users have the password: 'testpassword'")
\ No newline at end of file
+        self.stdout.write("\nAll users have the password: 'testpassword'")
+
+    def create_bulk(self, count, references, question_ids, options):
+        """
+        Create `count` test users in batches, optionally across worker processes.
+        """
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        # Keeps emails unique across runs without looking up existing users
+        run_tag = uuid.uuid4().hex[:6]
+        password_hash = make_password(TEST_PASSWORD)
+
+        jobs = [
+            {
+                'start': start,
+                'end': min(start + batch_size, count),
+                'seed': seed + start,
+                'run_tag': run_tag,
+                'password_hash': password_hash,
+                'references': references,
+                'question_ids': question_ids,
+                'batch_size': batch_size,
+            }
+            for start in range(0, count, batch_size)
+        ]
+
+        self.stdout.write(f"Creating {count} test users in {len(jobs)} batches with {workers} worker(s)...")
+        created_count = 0
+        for created in run_batches(generate_bulk_batch, jobs, workers):
+            created_count += created
+            self.stdout.write(f"  {created_count}/{count}")
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully created {created_count} test users'))
+        self.stdout.write(f"\nAll users have the password: '{TEST_PASSWORD}' (emails end in {run_tag}<n>{TEST_EMAIL_DOMAIN})")
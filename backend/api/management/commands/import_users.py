@@ -0,0 +1,318 @@
+# backend/api/management/commands/import_users.py
+import csv
+import hashlib
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from api.autocomplete import mark_dirty as mark_autocomplete_dirty
+from api.bulk import bulk_insert, profile_links, resolve_names
+from api.models import (
+    Club, Course, Interest, Major, Minor, PersonalityAnswer,
+    PersonalityQuestion, Profile,
+)
+
+User = get_user_model()
+
+# Profile M2M field -> reference model, as accepted by POST /api/onboarding/
+NAME_FIELDS = {
+    'majors': Major,
+    'minors': Minor,
+    'interests': Interest,
+    'courses_taking': Course,
+    'favorite_courses': Course,
+    'clubs': Club,
+}
+USER_FIELDS = ['first_name', 'last_name', 'preferred_name']
+
+
+def file_sha256(path):
+    """Hex SHA-256 of the file at `path`, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_records(path, file_format):
+    """
+    Stream records from a JSONL or CSV file without loading it into memory.
+    JSONL lines are yielded unparsed (blank lines as None) so a bad line
+    only rejects that record.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                yield line if line.strip() else None
+
+def clean_record(record, list_separator, question_ids):
+    """
+    Validate one roster record and normalize it to plain values.
+
+    Args:
+        record: Dict (CSV row or parsed JSON) or an unparsed JSONL line
+        list_separator: Separator for name lists given as strings (CSV)
+        question_ids: Ids of the existing personality questions
+
+    Returns:
+        Cleaned dict
+
+    Raises:
+        ValueError: With a message describing the first problem found
+    """
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}")
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+
+    email = (record.get('email') or '').strip().lower()
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError(f"invalid email {email!r}")
+
+    cleaned = {'email': email, 'password': record.get('password') or None}
+    for field_name in USER_FIELDS:
+        value = (record.get(field_name) or '').strip()
+        if len(value) > User._meta.get_field(field_name).max_length:
+            raise ValueError(f"{field_name} is too long")
+        cleaned[field_name] = value
+
+    year = record.get('year_in_school') or None
+    if year is not None and year not in Profile.AcademicYear.values:
+        raise ValueError(f"invalid year_in_school {year!r}")
+    cleaned['year_in_school'] = year
+    cleaned['department'] = (record.get('department') or '').strip()[:Profile._meta.get_field('department').max_length]
+
+    socials = record.get('socials') or {}
+    if isinstance(socials, str):
+        try:
+            socials = json.loads(socials)
+        except json.JSONDecodeError:
+            raise ValueError("socials must be a JSON object")
+    if not isinstance(socials, dict):
+        raise ValueError("socials must be a JSON object")
+    cleaned['socials'] = socials
+
+    for field_name, model in NAME_FIELDS.items():
+        names = record.get(field_name) or []
+        if isinstance(names, str):
+            names = names.split(list_separator)
+        if not isinstance(names, list):
+            raise ValueError(f"{field_name} must be a list of names")
+        names = list(dict.fromkeys(str(name).strip() for name in names if str(name).strip()))
+        max_length = model._meta.get_field('name').max_length
+        for name in names:
+            if len(name) > max_length:
+                raise ValueError(f"{field_name} name {name[:20]!r}... is too long")
+        cleaned[field_name] = names
+
+    answers = record.get('personality_answers') or []
+    if isinstance(answers, str):
+        try:
+            answers = json.loads(answers)
+        except json.JSONDecodeError:
+            raise ValueError("personality_answers must be a JSON list")
+    scores = {}
+    try:
+        for answer in answers:
+            question_id, score = int(answer['question_id']), int(answer['answer_score'])
+            if question_id not in question_ids:
+                raise ValueError(f"PersonalityQuestion with id {question_id} does not exist")
+            if not 1 <= score <= 5:
+                raise ValueError(f"answer_score {score} is out of range")
+            scores[question_id] = score
+    except (KeyError, TypeError):
+        raise ValueError("personality_answers must be a list of {question_id, answer_score}")
+    cleaned['personality_answers'] = scores
+    return cleaned
+
+
+class Command(BaseCommand):
+    help = (
+        'Import student rosters from a JSONL or CSV file in bulk. Records use the onboarding fields '
+        '(email, first_name, majors, interests, ...). Progress is checkpointed after every chunk, '
+        'so an interrupted import picks up where it stopped when run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL or CSV roster file')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='File format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Records per transaction (default: 1000)')
+        parser.add_argument('--list-separator', default=';', help="Separator for name lists in CSV cells (default: ';')")
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the first record')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        chunk_size = max(1, options['chunk_size'])
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+
+        # The checkpoint counts records, so it only applies to the exact same
+        # file: an edit that keeps the size (or the modification time) would
+        # shift records past the checkpoint or re-import some twice
+        progress = {'sha256': file_sha256(path), 'records': 0, 'created': 0, 'skipped': 0, 'rejected': 0}
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as f:
+                saved = json.load(f)
+            if saved.get('sha256') != progress['sha256']:
+                raise CommandError(
+                    f"{path} changed since the checkpoint in {checkpoint_path} was written; "
+                    "use --restart to import it from the beginning"
+                )
+            progress = saved
+            self.stdout.write(f"Resuming after record {progress['records']}")
+
+        self.question_ids = set(PersonalityQuestion.objects.values_list('id', flat=True))
+        self.unusable_password = make_password(None)
+
+        records = read_records(path, file_format)
+        # Records before the checkpoint are committed already
+        for _ in islice(records, progress['records']):
+            pass
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            created, skipped, rejected = self.import_chunk(chunk, progress['records'], options['list_separator'])
+            progress['records'] += len(chunk)
+            progress['created'] += created
+            progress['skipped'] += skipped
+            progress['rejected'] += rejected
+            self.write_checkpoint(checkpoint_path, progress)
+            self.stdout.write(f"  {progress['records']} records: {progress['created']} imported, "
+                              f"{progress['skipped']} already existed, {progress['rejected']} rejected")
+
+        if progress['created']:
+            # bulk inserts send no signals; new names and links change suggestions
+            for model in set(NAME_FIELDS.values()):
+                mark_autocomplete_dirty(model)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Import complete: {progress['created']} users imported, {progress['skipped']} already existed, "
+            f"{progress['rejected']} rejected"
+        ))
+
+    def write_checkpoint(self, checkpoint_path, progress):
+        # Written after the chunk commits; replace() keeps it whole if we're interrupted
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(progress, f)
+        os.replace(temp_path, checkpoint_path)
+
+    def import_chunk(self, chunk, offset, list_separator):
+        """
+        Validate and write one chunk of records in a single transaction.
+
+        Returns:
+            Tuple of (imported, skipped as existing, rejected) counts
+        """
+        records = {}
+        rejected = 0
+        for number, record in enumerate(chunk, start=offset + 1):
+            if record is None:
+                continue
+            try:
+                cleaned = clean_record(record, list_separator, self.question_ids)
+            except ValueError as e:
+                self.stderr.write(f"Record {number}: {e}")
+                rejected += 1
+                continue
+            # Later duplicates of an email within the file are skipped below
+            records.setdefault(cleaned['email'], cleaned)
+        duplicates = sum(1 for record in chunk if record is not None) - rejected - len(records)
+
+        with transaction.atomic():
+            # Emails already in the database were imported earlier (or signed up)
+            existing = set(User.objects.filter(email__in=records).values_list('email', flat=True))
+            records = [record for email, record in records.items() if email not in existing]
+            if not records:
+                return 0, len(existing) + duplicates, rejected
+
+            names = {}
+            for field_name, model in NAME_FIELDS.items():
+                wanted = {name for record in records for name in record[field_name]}
+                resolved = names.setdefault(model, {})
+                resolved.update(resolve_names(model, wanted - resolved.keys()))
+
+            usernames = self.assign_usernames([record['email'] for record in records])
+            bulk_insert(User, [
+                User(
+                    email=record['email'],
+                    username=usernames[record['email']],
+                    # Hashing is the slow part of signup; rosters usually
+                    # carry no password and students set one later
+                    password=make_password(record['password']) if record['password'] else self.unusable_password,
+                    **{field_name: record[field_name] for field_name in USER_FIELDS},
+                )
+                for record in records
+            ])
+            user_ids = dict(User.objects.filter(email__in=[record['email'] for record in records]).values_list('email', 'id'))
+
+            bulk_insert(Profile, [
+                Profile(
+                    user_id=user_ids[record['email']],
+                    year_in_school=record['year_in_school'],
+                    department=record['department'],
+                    socials=record['socials'],
+                )
+                for record in records
+            ])
+            profile_ids = dict(Profile.objects.filter(user_id__in=user_ids.values()).values_list('user_id', 'id'))
+
+            for field_name, model in NAME_FIELDS.items():
+                pairs = [
+                    (profile_ids[user_ids[record['email']]], names[model][name])
+                    for record in records for name in record[field_name]
+                ]
+                bulk_insert(Profile._meta.get_field(field_name).remote_field.through, profile_links(field_name, pairs))
+
+            bulk_insert(PersonalityAnswer, [
+                PersonalityAnswer(
+                    profile_id=profile_ids[user_ids[record['email']]],
+                    question_id=question_id,
+                    answer_score=score,
+                )
+                for record in records for question_id, score in record['personality_answers'].items()
+            ])
+        return len(records), len(existing) + duplicates, rejected
+
+    def assign_usernames(self, emails):
+        """
+        Derive usernames the way CustomUserManager.create_user does (the
+        email's local part, numbered on collision) with one query instead
+        of one per attempt.
+        """
+        bases = {email: email.split('@')[0][:140] for email in emails}
+        taken = set(User.objects.filter(username__in=set(bases.values())).values_list('username', flat=True))
+        colliding = {base for base in bases.values() if base in taken}
+        for base in colliding:
+            taken.update(User.objects.filter(username__startswith=base).values_list('username', flat=True))
+
+        usernames = {}
+        for email, base in bases.items():
+            username = base
+            counter = 1
+            while username in taken:
+                username = f"{base}{counter}"
+                counter += 1
+            taken.add(username)
+            usernames[email] = username
+        return usernames
@@ -1,52 +1,81 @@
 import json
+import os
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.cache import invalidate_question_set
 from api.models import PersonalityQuestion
-from django.db import IntegrityError
+
+QUESTIONS_PATH = os.path.join(settings.BASE_DIR, 'api', 'data', 'personality_questions.json')
+
+# Fields updated in place when a question's text already exists
+UPSERT_FIELDS = ['domain', 'facet', 'reverse_scale', 'order']
 
 class Command(BaseCommand):
-    help = 'Load personality questions from a JSON file'
+    help = 'Load personality questions from a JSON file (safe to re-run: existing questions are updated in place)'
 
-    def handle(self, *args, **kwargs):
-        file_path = 'api/data/personality_questions.json'
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=QUESTIONS_PATH, help=f'Questions JSON file (default: {QUESTIONS_PATH})')
+
+    def handle(self, *args, **options):
+        file_path = options['file']
 
         try:
             with open(file_path, 'r') as file:
                 data = json.load(file)
-
-            created_count = 0
-            skipped_count = 0
-            
-            # Enumerate data to get index for ordering
-            for index, item in enumerate(data):
-                text = item.get('text')
-                reverse_scale = item.get('keyed') == 'minus'
-                facet = item.get('facet')
-                domain = item.get('domain')
-                order = index + 1 # Use 1-based index for order
-                
-                try:
-                    # Try to create the new question, including order
-                    PersonalityQuestion.objects.create(
-                        text=text,
-                        reverse_scale=reverse_scale,
-                        facet=facet,
-                        domain=domain,
-                        order=order, # Add the order field here
-                    )
-                    created_count += 1
-                except IntegrityError:
-                    # This will catch duplicate text entries (since text is unique)
-                    self.stdout.write(self.style.WARNING(f'Skipping duplicate question: {text[:50]}'))
-                    skipped_count += 1
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'Error creating question "{text[:50]}": {str(e)}'))
-                    skipped_count += 1
-
-            self.stdout.write(self.style.SUCCESS(f'Import complete: {created_count} questions created, {skipped_count} skipped'))
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR(f'File not found: {file_path}'))
+            return
         except json.JSONDecodeError:
             self.stdout.write(self.style.ERROR('Error decoding the JSON file'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'An error occurred: {e}'))
-            
\ No newline at end of file
+            return
+
+        questions = {}
+        skipped_count = 0
+        # Enumerate data to get index for ordering
+        for index, item in enumerate(data):
+            text = item.get('text')
+            if not text or not item.get('domain') or item.get('facet') is None:
+                self.stdout.write(self.style.ERROR(f'Skipping incomplete question #{index + 1}: {item}'))
+                skipped_count += 1
+                continue
+            if text in questions:
+                # text is unique, and one upsert can't touch the same row twice
+                self.stdout.write(self.style.WARNING(f'Skipping duplicate question: {text[:50]}'))
+                skipped_count += 1
+                continue
+            questions[text] = PersonalityQuestion(
+                text=text,
+                reverse_scale=item.get('keyed') == 'minus',
+                facet=str(item['facet']),
+                domain=item['domain'],
+                order=index + 1, # Use 1-based index for order
+            )
+
+        existing = {
+            row[0]: row[1:]
+            for row in PersonalityQuestion.objects.filter(text__in=questions).values_list('text', *UPSERT_FIELDS)
+        }
+        created_count = len(questions) - len(existing)
+        changed = [
+            question for text, question in questions.items()
+            if text not in existing or existing[text] != tuple(getattr(question, field) for field in UPSERT_FIELDS)
+        ]
+        updated_count = len(changed) - created_count
+
+        if changed:
+            with transaction.atomic():
+                PersonalityQuestion.objects.bulk_create(
+                    changed,
+                    update_conflicts=True,
+                    unique_fields=['text'],
+                    update_fields=UPSERT_FIELDS,
+                )
+                # bulk_create sends no signals, so retire the cached question
+                # list and personality results here, once for the whole load
+                transaction.on_commit(invalidate_question_set)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Import complete: {created_count} questions created, {updated_count} updated, '
+            f'{len(questions) - len(changed)} unchanged, {skipped_count} skipped'
+        ))
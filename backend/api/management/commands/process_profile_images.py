@@ -0,0 +1,42 @@
+# backend/api/management/commands/process_profile_images.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.images import UPLOAD_DIR, process_profile_image
+from api.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Process profile images that are still stored as uploaded (thumbnails, metadata stripped, '
+        'recompressed, deduplicated), e.g. ones from before the image pipeline or whose processing failed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(settings.PROFILE_IMAGE_WORKERS, 1), help='Images processed in parallel (default: PROFILE_IMAGE_WORKERS)')
+
+    def handle(self, *args, **options):
+        # Processed images live in subdirectories of the upload directory
+        pending = list(
+            Profile.objects.filter(image__startswith=f"{UPLOAD_DIR}/")
+            .exclude(image__regex=rf'^{UPLOAD_DIR}/.+/')
+            .values_list('pk', flat=True)
+        )
+        if not pending:
+            self.stdout.write("No unprocessed images")
+            return
+
+        def process(profile_id):
+            try:
+                return process_profile_image(profile_id)
+            finally:
+                connections.close_all()
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            for image_hash in executor.map(process, pending):
+                done += image_hash is not None
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} of {len(pending)} images"))
@@ -0,0 +1,94 @@
+# backend/api/management/commands/purge_users.py
+import os
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.autocomplete import AUTOCOMPLETE_SOURCES, mark_dirty as mark_autocomplete_dirty
+from api.bulk import raw_cascade_delete
+from api.cache import invalidate_profiles
+from api.export import EXPORTS, export_lines
+from api.management.commands.generate_test_users import TEST_EMAIL_DOMAIN
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete (and optionally archive) test or inactive accounts in small batches with raw cascaded '
+        'deletes, so it can run against a live database without long locks or loading rows into memory'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test-users', action='store_true', help=f'Select generated test users (emails ending in {TEST_EMAIL_DOMAIN})')
+        parser.add_argument('--inactive-days', type=int, help="Select users who haven't logged in for this many days (or ever, and joined before then)")
+        parser.add_argument('--batch-size', type=int, default=500, help='Users deleted per transaction (default: 500)')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches to leave the database room for live traffic (default: 0)')
+        parser.add_argument('--archive', help='Directory to append the profiles, answers and locations of deleted users to (as JSONL)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many users would be deleted')
+
+    def handle(self, *args, **options):
+        if not options['test_users'] and options['inactive_days'] is None:
+            raise CommandError('Select users with --test-users and/or --inactive-days')
+
+        selection = Q()
+        if options['test_users']:
+            selection &= Q(email__endswith=TEST_EMAIL_DOMAIN)
+        if options['inactive_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['inactive_days'])
+            selection &= Q(last_login__lt=cutoff) | Q(last_login__isnull=True, date_joined__lt=cutoff)
+        # Never purge accounts that can reach the admin
+        users = User.objects.filter(selection).exclude(is_staff=True).exclude(is_superuser=True)
+
+        total = users.count()
+        if options['dry_run']:
+            self.stdout.write(f"{total} users would be deleted")
+            return
+        if not total:
+            self.stdout.write("No users to delete")
+            return
+        if options['archive']:
+            os.makedirs(options['archive'], exist_ok=True)
+
+        batch_size = max(1, options['batch_size'])
+        done = 0
+        last_pk = 0
+        deleted = {}
+        started = time.monotonic()
+        while True:
+            # Walk the primary key so each batch is an index range scan
+            batch = list(users.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            if options['archive']:
+                self.archive(options['archive'], batch)
+            with transaction.atomic():
+                for label, count in raw_cascade_delete(User, batch).items():
+                    deleted[label] = deleted.get(label, 0) + count
+                # Raw deletes send no signals. Tokens outlive the accounts, so
+                # their cached profiles must go too.
+                transaction.on_commit(lambda batch=batch: invalidate_profiles(batch))
+            done += len(batch)
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f"  {done}/{total} users deleted ({rate:.0f}/s)")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        # Bulk deletes send no signals; suggestion popularity changed
+        for model, _ in AUTOCOMPLETE_SOURCES.values():
+            mark_autocomplete_dirty(model)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {done} users"))
+        for label, count in sorted(deleted.items()):
+            self.stdout.write(f"  {label}: {count}")
+
+    def archive(self, directory, user_ids):
+        """Append everything we export about `user_ids` to <directory>/<export>.jsonl."""
+        for name in EXPORTS:
+            with open(os.path.join(directory, f"{name}.jsonl"), 'a', encoding='utf-8') as f:
+                f.writelines(export_lines(name, user_ids=user_ids))
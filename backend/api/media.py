@@ -0,0 +1,162 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# --- Media files ---
+# Serves MEDIA_ROOT (profile images) at MEDIA_URL, for deployments where no
+# web server or CDN sits in front of it. Every file gets an ETag and
+# Last-Modified, so repeated loads are answered with 304 Not Modified, and
+# single byte ranges (Range: bytes=...) are supported. Files under a
+# SHA-256 directory (processed images, see api/images.py) never change, so
+# caches may keep them for a year without revalidating.
+#
+# Under Gunicorn the file is handed to wsgi.file_wrapper, which sends it
+# with sendfile() (zero-copy) for plain HTTP. With MEDIA_ACCEL_REDIRECT set,
+# the view only checks the request and lets nginx send the file from an
+# internal location instead.
+
+IMMUTABLE_PATH = re.compile(r'(^|/)[0-9a-f]{64}/')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class FileRange:
+    """
+    Bytes [start, start + length) of an open file. Keeps fileno(), so
+    Gunicorn still uses sendfile() (it sends Content-Length bytes from the
+    file's current offset).
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat_result):
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def requested_range(request, size, etag, last_modified):
+    """
+    Parse the request's Range header, honouring If-Range. Only single
+    ranges are supported; for anything else the whole file is sent, which
+    the HTTP spec allows.
+
+    Returns:
+        (start, end) inclusive, None for the whole file, or False if the
+        range can't be satisfied
+    """
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range not in (etag, last_modified):
+        return None # Changed since the client's partial copy
+    match = RANGE_PATTERN.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@require_safe
+def serve_media(request, path):
+    """GET/HEAD a file from MEDIA_ROOT (see above)."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("No such file")
+    try:
+        stat_result = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("No such file")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404("No such file")
+
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+    last_modified = http_date(stat_result.st_mtime)
+    response = HttpResponse()
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    if IMMUTABLE_PATH.search(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        # May be replaced under the same name; revalidate (cheap 304s)
+        patch_cache_control(response, public=True, no_cache=True)
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat_result.st_mtime), response=response)
+    if conditional is not response:
+        return conditional # 304 Not Modified or 412 Precondition Failed
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if settings.MEDIA_ACCEL_REDIRECT:
+        # nginx serves it (ranges included) from an `internal` location
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + quote(path)
+        response['Content-Type'] = content_type
+        return response
+
+    byte_range = requested_range(request, size, etag, last_modified)
+    if byte_range is False:
+        response.status_code = 416
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == 'HEAD':
+        served = HttpResponse(content_type=content_type)
+    else:
+        file = open(full_path, 'rb')
+        content = FileRange(file, start, length) if byte_range else file
+        served = FileResponse(content, content_type=content_type)
+    for header in ('ETag', 'Last-Modified', 'Accept-Ranges', 'Cache-Control'):
+        served[header] = response[header]
+    served['Content-Length'] = length
+    if byte_range:
+        served.status_code = 206
+        served['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return served
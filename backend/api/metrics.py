@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --- Per-request metrics ---
+# RequestMetricsMiddleware puts a RequestMetrics in a context variable for the
+# duration of each request. Every database connection records its queries
+# into it (record_query is installed when the connection opens, so it covers
+# every alias, thread and async view) and serializers add the time they spend
+# converting data. Outside a request nothing is recorded.
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters for one request. Times are in seconds."""
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self._serializing = False
+
+@contextmanager
+def collect_metrics():
+    """Record queries and serializer time inside the block into a new RequestMetrics."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries and their time."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_time += time.perf_counter() - started
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver; reconnects reuse the wrapper list, so add it once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    """Time the block as serializer work; nested serializers count once."""
+    metrics = _current.get()
+    if metrics is None or metrics._serializing:
+        yield
+        return
+    metrics._serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+        metrics._serializing = False
+
+class TimedSerializerMixin:
+    """
+    Counts a serializer's conversions (both directions) as serializer time.
+    Queries run by the serializer (e.g. related fields) also count as SQL time.
+    """
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+    def to_internal_value(self, data):
+        with serializer_timer():
+            return super().to_internal_value(data)
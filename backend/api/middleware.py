@@ -0,0 +1,201 @@
+import json
+import logging
+import random
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .metrics import collect_metrics
+from .monitoring import observe_request
+from .profiling import RequestProfiler, new_profile_id
+
+logger = logging.getLogger('api.requests')
+
+
+# Accepted from a proxy's X-Request-ID; it also names files, so nothing path-like
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+def request_id(request):
+    """The request's ID: X-Request-ID if the client or proxy sent a usable one, else a new one."""
+    if not hasattr(request, 'id'):
+        incoming = request.headers.get('X-Request-ID', '')
+        request.id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+    return request.id
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when ENFORCE_QUERY_BUDGETS is on and a request runs too many queries."""
+
+
+def query_budget(request):
+    """
+    Look up the QUERY_BUDGETS entry for the request's endpoint:
+    '<METHOD> <url name>' first, then '<url name>'.
+
+    Returns:
+        Maximum number of queries, or None if the endpoint has no budget
+    """
+    match = request.resolver_match
+    if match is None:
+        return None
+    budgets = settings.QUERY_BUDGETS
+    return budgets.get(f"{request.method} {match.view_name}", budgets.get(match.view_name))
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures each request: query count, SQL time, serializer time and time
+    spent handling it (the view plus the middleware below this one).
+
+    The numbers go out in a Server-Timing header (browser dev tools show it)
+    and as one JSON log line per request on the 'api.requests' logger, at
+    WARNING when the endpoint went over its query budget. They also feed the
+    Prometheus histograms in api/monitoring.py. Place it first in
+    MIDDLEWARE so session and authentication queries are counted too.
+    Streaming responses are measured up to the start of the stream.
+    Also gives every request an ID (request.id, X-Request-ID response header)
+    that ties its log line to its profile, if it was profiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_id(request)
+        started = time.perf_counter()
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        request_id(request)
+        started = time.perf_counter()
+        # Sync code run via sync_to_async sees the same context variable
+        with collect_metrics() as metrics:
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics, elapsed):
+        response['X-Request-ID'] = request.id
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+                f'view;dur={elapsed * 1000:.1f}',
+            ])
+
+        observe_request(request, response, metrics, elapsed)
+
+        budget = query_budget(request)
+        over_budget = budget is not None and metrics.queries > budget
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps({
+            'request_id': request.id,
+            'method': request.method,
+            'path': request.path,
+            'view': request.resolver_match.view_name if request.resolver_match else None,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'query_budget': budget,
+            'db_ms': round(metrics.sql_time * 1000, 1),
+            'serializer_ms': round(metrics.serializer_time * 1000, 1),
+            'view_ms': round(elapsed * 1000, 1),
+        }))
+        if over_budget and settings.ENFORCE_QUERY_BUDGETS:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.path} ran {metrics.queries} queries; "
+                f"its budget is {budget} (QUERY_BUDGETS)"
+            )
+        return response
+
+
+# X-Profile header / ?profile= value -> profiler
+PROFILE_TRIGGERS = {'1': 'collapsed', 'true': 'collapsed', 'collapsed': 'collapsed', 'cprofile': 'prof', 'prof': 'prof'}
+
+def is_staff_request(request):
+    """Whether the request comes from staff, by admin session or by JWT."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under a profiler and stores the output under a profile
+    ID, its request ID plus a random suffix (see api/profiling.py), returned
+    in the X-Profile-Id header.
+
+    Staff trigger it with an `X-Profile: 1` header or `?profile=1`
+    (`cprofile` instead of `1` for cProfile stats). Besides that, a random
+    PROFILING_SAMPLE_RATE fraction of all requests is sampled, so slow
+    requests can be looked at after the fact. Place it after
+    AuthenticationMiddleware. Under ASGI, only the thread or event loop the
+    request starts on is profiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def requested_mode(self, request):
+        trigger = request.headers.get('X-Profile') or request.GET.get('profile')
+        mode = PROFILE_TRIGGERS.get(trigger.lower()) if trigger else None
+        return mode if mode and is_staff_request(request) else None
+
+    def sampled(self):
+        return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = self.requested_mode(request) or ('collapsed' if self.sampled() else None)
+        if mode is None:
+            return self.get_response(request)
+        profiler = RequestProfiler(mode)
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        return self.finish(request, response, profiler)
+
+    async def __acall__(self, request):
+        mode = None
+        if request.headers.get('X-Profile') or request.GET.get('profile'):
+            # Checking staff may load the user
+            mode = await sync_to_async(self.requested_mode)(request)
+        mode = mode or ('collapsed' if self.sampled() else None)
+        if mode is None:
+            return await self.get_response(request)
+        profiler = RequestProfiler(mode)
+        profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        return self.finish(request, response, profiler)
+
+    def finish(self, request, response, profiler):
+        profile_id = new_profile_id(request_id(request))
+        path = profiler.save(profile_id)
+        response['X-Profile-Id'] = profile_id
+        logger.info(json.dumps({'request_id': request.id, 'profile': path}))
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_userlocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personalityquestion',
+            index=models.Index(fields=['order', 'id'], name='api_persona_order_5cc9a3_idx'),
+        ),
+    ]
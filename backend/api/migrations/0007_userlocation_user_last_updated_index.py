@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_personalityquestion_order_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userlocation',
+            index=models.Index(fields=['user', 'last_updated'], name='api_userloc_user_id_25633b_idx'),
+        ),
+    ]
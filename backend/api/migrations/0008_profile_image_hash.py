@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_userlocation_user_last_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='SHA-256 of the uploaded image once it has been processed (api/images.py)', max_length=64),
+        ),
+    ]
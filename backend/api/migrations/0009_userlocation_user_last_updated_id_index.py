@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_profile_image_hash'),
+    ]
+
+    # The new index is built before the ones it replaces are dropped
+    operations = [
+        migrations.AddIndex(
+            model_name='userlocation',
+            index=models.Index(fields=['user', 'last_updated', 'id'], name='api_userloc_user_id_c381b8_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='userlocation',
+            name='api_userloc_user_id_25633b_idx',
+        ),
+        migrations.AlterField(
+            model_name='userlocation',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='locations', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -5,10 +5,13 @@ from django.core.validators import MinValueValidator, MaxValueValidator # Import
 from django.contrib.auth.models import BaseUserManager
 from django.utils.functional import cached_property
 from .ptest import process_answers, get_text_results
-import os
-import json
+from .catalog import get_catalog_version, get_test_structure
+from .monitoring import SCORING_DURATION
+import logging
 import math
 
+logger = logging.getLogger(__name__)
+
 class CustomUserManager(BaseUserManager):
     """
     Custom user manager where email is the unique identifier
@@ -128,7 +131,11 @@ class PersonalityQuestion(models.Model):
     facet = models.CharField(max_length=1, default="1")
     reverse_scale = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0, help_text="Display order")
-    class Meta: ordering = ['order']
+    class Meta:
+        ordering = ['order']
+        indexes = [
+            models.Index(fields=['order', 'id']), # Keyset pages (api.pagination)
+        ]
     def __str__(self): return self.text[:50] + "..."
 
 # 4. User Profile (Central Hub for User Data)
@@ -143,6 +150,7 @@ class Profile(models.Model):
 
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
     image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    image_hash = models.CharField(max_length=64, blank=True, default='', editable=False, help_text="SHA-256 of the uploaded image once it has been processed (api/images.py)")
     # Removed major CharField, replaced with ManyToManyField below
     year_in_school = models.CharField(
         max_length=2,
@@ -160,44 +168,84 @@ class Profile(models.Model):
     socials = models.JSONField(blank=True, null=True, default=dict, help_text='e.g., {"instagram": "username", "snapchat": "username", "x": "handle"}') # Updated help text
 
     @cached_property
-    def personality_results(self):
+    def _personality_scores(self):
         """
-        Calculate and return the personality test results based on the user's answers.
+        Score the profile's answers by domain and facet.
         Returns None if the user hasn't answered any questions.
         """
-        
-        # Get all answers for this profile
-        answers = self.personality_answers.all()
-        
-        if not answers.exists():
+        with SCORING_DURATION.time():
+            return self._score_answers()
+
+    def _score_answers(self):
+        if 'personality_answers' in getattr(self, '_prefetched_objects_cache', {}):
+            # Prefetched by a list view (see SparseFieldsetMixin.prefetch_for_fieldset)
+            answers = self.personality_answers.all()
+        else:
+            # select_related avoids one question query per answer
+            answers = self.personality_answers.select_related('question')
+
+        # Convert the answers to the required format
+        processed_answers = []
+        for answer in answers:
+            question = answer.question
+            score = answer.answer_score
+
+            # Handle reversed scoring
+            if question.reverse_scale:
+                score = 6 - score
+
+            processed_answers.append({
+                'domain': question.domain,
+                'facet': int(question.facet),
+                'score': score
+            })
+
+        if not processed_answers:
             return None
-            
+        return process_answers(processed_answers)
+
+    @cached_property
+    def personality_scores(self):
+        """
+        Return the compact personality results: domain and facet codes with their
+        scores and result levels, plus the catalog version the texts live under.
+        Returns None if the user hasn't answered any questions.
+        """
         try:
-            # Load the test structure
-            test_path = os.path.join(settings.BASE_DIR, 'api', 'data', 'personality_test.json')
-            with open(test_path, 'r') as f:
-                test_structure = json.load(f)
-            
-            # Convert the answers to the required format
-            processed_answers = []
-            for answer in answers:
-                question = answer.question
-                score = answer.answer_score
-                
-                # Handle reversed scoring
-                if question.reverse_scale:
-                    score = 6 - score
-                
-                processed_answers.append({
-                    'domain': question.domain,
-                    'facet': int(question.facet),
-                    'score': score
+            results = self._personality_scores
+            if results is None:
+                return None
+
+            domains = []
+            for domain_code in sorted(results):
+                domain_data = results[domain_code]
+                domains.append({
+                    'domain': domain_code,
+                    'result': domain_data['result'],
+                    'score': domain_data['score'],
+                    'count': domain_data['count'],
+                    'facets': domain_data['facet'],
                 })
-            
-            # Calculate the results
-            results = process_answers(processed_answers)
-            text_results = get_text_results(results, test_structure)
-            
+            return {'version': get_catalog_version(), 'domains': domains}
+
+        except Exception as e:
+            logger.error(f"Error calculating personality scores: {str(e)}")
+            return None
+
+    @cached_property
+    def personality_results(self):
+        """
+        Calculate and return the personality test results based on the user's answers,
+        including the descriptive texts from personality_test.json.
+        Returns None if the user hasn't answered any questions.
+        """
+        try:
+            results = self._personality_scores
+            if results is None:
+                return None
+
+            text_results = get_text_results(results, get_test_structure())
+
             # Format the results
             formatted_results = []
             for domain_code, domain_data in text_results.items():
@@ -211,13 +259,11 @@ class Profile(models.Model):
                     'raw_score': results[domain_code]['score'],
                     'count': results[domain_code]['count']
                 })
-            
+
             return formatted_results
-            
+
         except Exception as e:
             # Log the error
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Error calculating personality results: {str(e)}")
             return None
 
@@ -414,7 +460,8 @@ class PersonalityAnswer(models.Model):
 
 # 6. User Location Ping
 class UserLocation(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='locations')
+    # No index of its own: the (user, last_updated, id) index below starts with it
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='locations', db_index=False)
     latitude = models.FloatField()
     longitude = models.FloatField()
     last_updated = models.DateTimeField(auto_now=True)
@@ -427,4 +474,5 @@ class UserLocation(models.Model):
         indexes = [
             models.Index(fields=['last_updated']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['user', 'last_updated', 'id']), # Latest ping and history pages per user, in ('-last_updated', '-id') order
         ]
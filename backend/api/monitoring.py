@@ -0,0 +1,71 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess,
+)
+
+# --- Prometheus metrics ---
+# Served in the Prometheus text format at /metrics. Under Gunicorn each
+# worker is a separate process, so PROMETHEUS_MULTIPROC_DIR must be set
+# (gunicorn.conf.py does it): every process then writes its samples to files
+# in that directory and /metrics adds up all of them, whichever worker
+# answers the scrape. Without it (runserver, tests) the metrics are per process.
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests handled, by route (URL name) and status',
+    ['method', 'route', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request',
+    ['method', 'route'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run by a request',
+    ['method', 'route'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time a request spent waiting on the database',
+    ['method', 'route'],
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Cache lookups by cache and result (hit or miss); hit ratio = hit / all',
+    ['cache', 'result'],
+)
+SCORING_DURATION = Histogram(
+    'personality_scoring_duration_seconds', "Time spent scoring a profile's personality answers",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+
+def observe_request(request, response, metrics, elapsed):
+    """Record a finished request (called by RequestMetricsMiddleware)."""
+    # The URL name, not the path, so ids in URLs don't create new series
+    route = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+    REQUESTS.labels(request.method, route, response.status_code).inc()
+    REQUEST_DURATION.labels(request.method, route).observe(elapsed)
+    REQUEST_QUERIES.labels(request.method, route).observe(metrics.queries)
+    REQUEST_DB_DURATION.labels(request.method, route).observe(metrics.sql_time)
+
+def count_cache_lookup(cache_name, hit):
+    CACHE_LOOKUPS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. If METRICS_TOKEN is set, scrapers must send
+    it as a bearer token.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,208 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+# --- Keyset pagination ---
+# OFFSET paging makes the database step over every row before the page, so
+# page 1000 costs a thousand pages of work. A keyset cursor holds the sort
+# key of the last row served instead, and the next page is "rows after that
+# key", which an index on the ordering answers by seeking straight to it:
+# every page costs the same, and rows added or removed meanwhile don't
+# shift later pages (no duplicates, no gaps).
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination.
+
+    `ordering` lists model fields (prefix '-' for descending) ending in a
+    unique one, usually the primary key, so every row has a distinct
+    position. The fields must not be nullable, and should match an index,
+    e.g. ('order', 'id') for models.Index(fields=['order', 'id']).
+
+    Responses look like {"next": <url or null>, "results": [...]}. The
+    cursor in `next` is opaque to clients.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def is_requested(self, request):
+        """Whether the request asks for a page (for views that also serve the unpaged list)."""
+        return self.cursor_query_param in request.GET or self.page_size_query_param in request.GET
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns:
+            The rows of the requested page, in one query
+
+        Raises:
+            NotFound: The cursor is malformed
+        """
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page(list(queryset), queryset.model)
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views."""
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset], queryset.model)
+
+    def page_queryset(self, queryset, request):
+        """The query for the requested page, plus one row to tell whether there is a next page."""
+        return self.ordered_queryset(queryset, request)[:self.limit + 1]
+
+    def ordered_queryset(self, queryset, request):
+        """`queryset` in page order, starting after the request's cursor."""
+        self.request = request
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        self.limit = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.GET.get(self.cursor_query_param)
+        if cursor:
+            position = self.decode_cursor(cursor)
+            if len(position) != len(self.fields):
+                raise NotFound("Invalid cursor")
+            try:
+                values = [queryset.model._meta.get_field(name).to_python(value) for (name, _), value in zip(self.fields, position)]
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound("Invalid cursor")
+            # The ordering fields aren't nullable; to_python() passes None through
+            if any(value is None for value in values):
+                raise NotFound("Invalid cursor")
+            queryset = queryset.filter(self.after(self.fields, values))
+        return queryset
+
+    def set_page(self, rows, model):
+        self.page = rows[:self.limit]
+        self.next_position = None
+        if len(rows) > self.limit:
+            last = self.page[-1]
+            self.next_position = [model._meta.get_field(name).value_to_string(last) for name, _ in self.fields]
+        return self.page
+
+    def after(self, fields, values):
+        """
+        Rows that sort after `values`. For (a, b) ascending that's
+        a >= x AND (a > x OR b > y): the leading range lets the database
+        seek the index rather than filter every row.
+        """
+        (name, descending), value = fields[0], values[0]
+        strict = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+        if len(fields) == 1:
+            return strict
+        inclusive = Q(**{f"{name}__{'lte' if descending else 'gte'}": value})
+        return inclusive & (strict | self.after(fields[1:], values[1:]))
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (binascii.Error, ValueError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(position, list):
+            raise NotFound("Invalid cursor")
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        params = self.request.GET.copy()
+        params[self.cursor_query_param] = self.encode_cursor(self.next_position)
+        return self.request.build_absolute_uri(f"{self.request.path}?{params.urlencode()}")
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'results': data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PersonalityQuestionPagination(KeysetPagination):
+    ordering = ('order', 'id')
+    page_size = 50
+
+
+class LocationHistoryPagination(KeysetPagination):
+    """
+    Location pings, newest first, for the (user, last_updated, id) index.
+
+    ?every=<seconds> downsamples: only the newest ping of each `every`-second
+    window is returned. Windows are aligned to the epoch, not to the page,
+    so they come out the same however the history is paged.
+    """
+    ordering = ('-last_updated', '-id')
+    page_size = 100
+    max_page_size = 1000
+    every_query_param = 'every'
+    # When downsampling, a page reads at most this many rows per result, so
+    # a burst of pings in one window can't make a page unbounded
+    scan_factor = 20
+
+    def get_every(self, request):
+        value = request.GET.get(self.every_query_param)
+        if not value:
+            return None
+        try:
+            every = int(value)
+        except ValueError:
+            every = 0
+        if every < 1:
+            raise ValidationError({self.every_query_param: "Must be a whole number of seconds."})
+        return every
+
+    def paginate_queryset(self, queryset, request, view=None):
+        every = self.get_every(request)
+        if every is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        rows = self.ordered_queryset(queryset, request)
+        scan_limit = self.limit * self.scan_factor
+        kept, window, scanned, full = [], None, 0, False
+        for row in rows[:scan_limit].iterator(chunk_size=min(scan_limit, 2000)):
+            scanned += 1
+            row_window = int(row.last_updated.timestamp() // every)
+            if row_window == window:
+                continue
+            if len(kept) == self.limit:
+                full = True
+                break
+            kept.append(row)
+            window = row_window
+
+        self.page = kept
+        self.next_position = None
+        if kept and (full or scanned == scan_limit):
+            # Continue before the last window served; id 0 sorts after every
+            # row, so this position means "older than the window's start"
+            start = datetime.fromtimestamp(window * every, tz=timezone.utc)
+            self.next_position = [start.isoformat(), '0']
+        return self.page
@@ -0,0 +1,153 @@
+import cProfile
+import os
+import secrets
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+# --- Request profiling ---
+# ProfilingMiddleware runs selected requests under a profiler and stores the
+# output in PROFILING_DIR, named by a profile ID: the request ID plus a
+# random suffix, since clients can send (and replay) their own request IDs:
+#   <profile id>.collapsed  stack samples in the collapsed format that
+#                           flamegraph.pl and speedscope read
+#   <profile id>.prof       cProfile stats (pstats, snakeviz)
+
+PROFILE_FORMATS = {
+    'collapsed': 'text/plain; charset=utf-8',
+    'prof': 'application/octet-stream',
+}
+
+
+class StackSampler:
+    """
+    Sampling profiler: a background thread records the stack of one thread
+    every `interval` seconds. Cheap enough for random sampling in
+    production, since the profiled code itself isn't instrumented.
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """One 'frame;frame;... count' line per distinct stack, root first."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Profile the code between start() and stop() on the current thread, then
+    save() it under a profile ID.
+
+    Args:
+        mode: 'collapsed' (stack sampling) or 'prof' (cProfile, which
+              records every call: exact, but several times slower)
+    """
+    def __init__(self, mode='collapsed'):
+        self.mode = mode
+        if mode == 'prof':
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+
+    def start(self):
+        if self.mode == 'prof':
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+
+    def stop(self):
+        if self.mode == 'prof':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+
+    def save(self, profile_id):
+        """Write the output to PROFILING_DIR and prune the oldest files beyond PROFILING_MAX_FILES."""
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = profile_path(profile_id, self.mode)
+        if self.mode == 'prof':
+            self._profiler.dump_stats(path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.collapsed())
+        prune_profiles()
+        return path
+
+
+def new_profile_id(request_id):
+    """A file name for a profile of `request_id` that no other request's can take."""
+    return f"{request_id}-{secrets.token_hex(4)}"
+
+def profile_path(profile_id, mode):
+    return os.path.join(settings.PROFILING_DIR, f"{profile_id}.{mode}")
+
+def find_profile(profile_id):
+    """
+    Returns:
+        Tuple of (path, format) for the stored output of `profile_id`, or
+        None if there is none
+    """
+    for mode in PROFILE_FORMATS:
+        path = profile_path(profile_id, mode)
+        if os.path.exists(path):
+            return path, mode
+    return None
+
+def list_profiles(limit=50):
+    """The newest stored outputs as dicts of id, request_id, format, size and created (epoch seconds)."""
+    try:
+        entries = [entry for entry in os.scandir(settings.PROFILING_DIR) if entry.is_file()]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    profiles = []
+    for entry in entries[:limit]:
+        profile_id, _, mode = entry.name.rpartition('.')
+        if mode in PROFILE_FORMATS:
+            stat = entry.stat()
+            profiles.append({
+                'id': profile_id,
+                'request_id': profile_id.rpartition('-')[0],
+                'format': mode,
+                'size': stat.st_size,
+                'created': stat.st_mtime,
+            })
+    return profiles
+
+def prune_profiles():
+    try:
+        entries = [entry for entry in os.scandir(settings.PROFILING_DIR) if entry.is_file()]
+    except FileNotFoundError:
+        return
+    if len(entries) <= settings.PROFILING_MAX_FILES:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - settings.PROFILING_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass # Another worker pruned it first
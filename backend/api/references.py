@@ -0,0 +1,230 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models.signals import post_save
+
+from .cache import VersionWatcher, bump_version
+from .models import Club, Course, Interest, Major, Minor
+from .monitoring import count_cache_lookup
+
+REFERENCE_MODELS = (Major, Minor, Interest, Club, Course)
+REFERENCES_VERSION = 'references'
+
+
+class ReferenceCache:
+    """
+    Bounded, process-local name <-> id map for one reference model.
+
+    The reference tables are small and rarely change, so each worker keeps
+    the most recently used names in memory and only falls back to
+    get_or_create() for names it hasn't seen. Entries are only added once
+    the rows behind them are committed, so a rolled back get_or_create never
+    leaves a dangling id behind.
+    """
+    def __init__(self, model, maxsize):
+        self.model = model
+        self.maxsize = maxsize
+        self._ids = OrderedDict() # name -> pk, least recently used first
+        self._names = {} # pk -> name
+        self._lock = threading.Lock()
+        self._warmed = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def warm(self):
+        """Load up to `maxsize` rows in a single query."""
+        rows = list(self.model.objects.values_list('pk', 'name').order_by('pk')[:self.maxsize])
+        seen = set()
+        duplicates = set()
+        for pk, name in rows:
+            # Names that aren't unique (possible for Course) stay uncached so
+            # get_or_create keeps reporting the ambiguity
+            if name in seen:
+                duplicates.add(name)
+            seen.add(name)
+        with self._lock:
+            for pk, name in rows:
+                if name not in duplicates:
+                    self._store(pk, name)
+            self._warmed = True
+
+    def lookup(self, name):
+        """Return the cached pk for `name`, or None."""
+        with self._lock:
+            pk = self._ids.get(name)
+            if pk is not None:
+                self._ids.move_to_end(name)
+            return pk
+
+    def remember(self, pk, name):
+        with self._lock:
+            self._store(pk, name)
+
+    def _store(self, pk, name):
+        old_name = self._names.get(pk)
+        if old_name is not None and old_name != name:
+            self._ids.pop(old_name, None)
+        self._ids[name] = pk
+        self._ids.move_to_end(name)
+        self._names[pk] = name
+        while len(self._ids) > self.maxsize:
+            _, evicted_pk = self._ids.popitem(last=False)
+            self._names.pop(evicted_pk, None)
+
+    def evict(self, pk):
+        with self._lock:
+            name = self._names.pop(pk, None)
+            if name is not None:
+                self._ids.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._names.clear()
+            self._warmed = False
+
+    def _instance(self, pk, name):
+        # Only the pk and name are known; that's all M2M writes and
+        # NameRelatedField.to_representation need
+        instance = self.model(pk=pk, name=name)
+        instance._state.adding = False
+        instance._state.db = DEFAULT_DB_ALIAS
+        return instance
+
+    def get_or_create(self, name):
+        """Cached equivalent of `model.objects.get_or_create(name=name)[0]`."""
+        _check_shared_version()
+        # Rows read inside a transaction may not be committed yet
+        in_transaction = transaction.get_connection().in_atomic_block
+        if not self._warmed and not in_transaction:
+            self.warm()
+
+        pk = self.lookup(name)
+        count_cache_lookup('reference', pk is not None)
+        if pk is not None:
+            return self._instance(pk, name)
+
+        instance, created = self.model.objects.get_or_create(name=name)
+        transaction.on_commit(lambda: self.remember(instance.pk, instance.name))
+        return instance
+
+    def get_or_create_many(self, names):
+        """
+        get_or_create() for a list of names, returning instances in order.
+
+        The names that aren't cached are looked up in one query and the
+        missing ones inserted together, so a list costs the same number of
+        queries however many new names it brings.
+
+        Raises:
+            MultipleObjectsReturned: A name matches more than one row
+        """
+        _check_shared_version()
+        in_transaction = transaction.get_connection().in_atomic_block
+        if not self._warmed and not in_transaction:
+            self.warm()
+
+        ids = {}
+        for name in names:
+            if name in ids:
+                continue
+            pk = self.lookup(name)
+            count_cache_lookup('reference', pk is not None)
+            if pk is not None:
+                ids[name] = pk
+        missing = [name for name in dict.fromkeys(names) if name not in ids]
+        if missing:
+            found = self._get_or_create_rows(missing)
+            transaction.on_commit(lambda: [self.remember(pk, name) for name, pk in found.items()])
+            ids.update(found)
+        return [self._instance(ids[name], name) for name in names]
+
+    def _get_or_create_rows(self, names):
+        """Return {name: pk} for `names`, inserting the rows that don't exist."""
+        ids = {}
+        for pk, name in self.model.objects.filter(name__in=names).values_list('pk', 'name'):
+            if name in ids:
+                raise self.model.MultipleObjectsReturned(f"More than one {self.model.__name__} named {name!r}")
+            ids[name] = pk
+        new = [self.model(name=name) for name in names if name not in ids]
+        if not new:
+            return ids
+        try:
+            with transaction.atomic():
+                created = self.model.objects.bulk_create(new)
+        except IntegrityError:
+            # Another request created one of them first; fall back to one
+            # get_or_create per name, which handles that race
+            for instance in new:
+                ids[instance.name] = self.model.objects.get_or_create(name=instance.name)[0].pk
+            return ids
+        if any(instance.pk is None for instance in created):
+            # Backends that can't return ids from a bulk insert
+            created = list(self.model.objects.filter(name__in=[instance.name for instance in new]))
+        for instance in created:
+            ids[instance.name] = instance.pk
+            # bulk_create() skips signals; send the ones save() would have so
+            # the autocomplete index and other receivers still see the rows
+            post_save.send(
+                sender=self.model, instance=instance, created=True,
+                update_fields=None, raw=False, using=instance._state.db,
+            )
+        return ids
+
+
+_caches = {
+    model: ReferenceCache(model, settings.REFERENCE_CACHE_MAXSIZE)
+    for model in REFERENCE_MODELS
+}
+
+def reference_cache_for(model):
+    """Return the ReferenceCache for `model`, or None if it isn't cached."""
+    return _caches.get(model)
+
+def clear_reference_caches():
+    for reference_cache in _caches.values():
+        reference_cache.clear()
+
+def refresh_references(data):
+    """
+    Re-resolve the cached reference instances in `data` (a serializer's
+    validated_data) against the database, replacing them in place and
+    evicting their ids from the cache.
+
+    Returns:
+        Whether `data` held any reference instances
+    """
+    found = False
+    for key, value in data.items():
+        if not value or not isinstance(value, list) or not all(isinstance(item, REFERENCE_MODELS) for item in value):
+            continue
+        reference_cache = reference_cache_for(type(value[0]))
+        for item in value:
+            reference_cache.evict(item.pk)
+        data[key] = reference_cache.get_or_create_many([item.name for item in value])
+        found = True
+    return found
+
+
+# --- Cross-worker invalidation ---
+# Signals only reach the worker that made the change. With
+# REFERENCE_CACHE_SHARED_INVALIDATION on, changes also bump a version token
+# in the cache backend, which every worker polls at most once per
+# REFERENCE_CACHE_CHECK_INTERVAL seconds.
+
+_shared_version = VersionWatcher(REFERENCES_VERSION, settings.REFERENCE_CACHE_CHECK_INTERVAL)
+
+def _check_shared_version():
+    if settings.REFERENCE_CACHE_SHARED_INVALIDATION and _shared_version.changed():
+        clear_reference_caches()
+
+def invalidate_reference(model, pk):
+    """Forget a changed or deleted reference row in this and (optionally) other workers."""
+    reference_cache = reference_cache_for(model)
+    if reference_cache is not None:
+        reference_cache.evict(pk)
+    if settings.REFERENCE_CACHE_SHARED_INVALIDATION:
+        bump_version(REFERENCES_VERSION)
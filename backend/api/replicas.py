@@ -0,0 +1,132 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# --- Read replicas ---
+# Reads only go to a replica where we opt in: views using ReplicaReadMixin
+# and batch jobs inside use_replica(). Everything else, and every write,
+# uses 'default'. The chosen replica is kept in a context variable, so it
+# follows the request through threads and async code and one request never
+# mixes replicas.
+
+_replica = ContextVar('replica', default=None)
+
+def pick_replica():
+    """Return a random replica alias, or 'default' when none are configured."""
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+@contextmanager
+def use_replica():
+    """Send reads inside the block to one replica (e.g. for a batch job)."""
+    token = _replica.set(pick_replica())
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+@contextmanager
+def use_primary():
+    """
+    Send reads inside the block to 'default', even within a replica-reading
+    view. For data that outlives the request, like cached payloads: a copy
+    built from a lagging replica would be served long after it caught up.
+    """
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+# --- Read-your-writes ---
+# Replicas lag behind 'default'. After a user writes, their own reads stay on
+# 'default' for REPLICA_STICKY_SECONDS so they never see their change undone.
+# The marker lives in the cache, so with several workers the cache must be
+# shared (see api/checks.py); with a per-process cache the next request may
+# land on a worker that never saw it.
+
+def _sticky_key(user_id):
+    return f"replica-sticky:{user_id}"
+
+def mark_recent_write(user_id):
+    """Keep `user_id`'s reads on 'default' until replicas have caught up."""
+    if settings.DATABASE_REPLICAS and user_id is not None:
+        cache.set(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+def has_recent_write(user_id):
+    return user_id is not None and cache.get(_sticky_key(user_id)) is not None
+
+
+# Apps whose reads always go to 'default'. DatabaseCache entries
+# ('django_cache') hold the version tokens other workers bump to invalidate
+# cached payloads; read from a lagging replica, those bumps would be missed.
+PRIMARY_ONLY_APPS = {'django_cache'}
+
+
+class ReplicaRouter:
+    """
+    Database router for DATABASE_ROUTERS: reads go to the replica picked
+    for the current context, if any, except for PRIMARY_ONLY_APPS. Writes
+    and migrations go to 'default'.
+    """
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups stay on the database the instance came from
+            return instance._state.db
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as 'default'
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views. Safe-method requests read from a replica unless the user
+    wrote recently. Successful unsafe requests mark the user as having written.
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and not has_recent_write(request.user.pk)
+        ):
+            self._replica_token = _replica.set(pick_replica())
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Also when the view raises, so the choice can't leak into the
+            # next request handled by this thread
+            if self._replica_token is not None:
+                _replica.reset(self._replica_token)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            mark_recent_write(getattr(request.user, 'pk', None))
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,7 +1,8 @@
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.utils.functional import cached_property
 from .models import (
     Profile,
     Interest,
@@ -13,11 +14,15 @@ from .models import (
     PersonalityAnswer,
     UserLocation
 )
+from .authentication import ClaimsRefreshToken
+from .images import schedule_profile_image, thumbnail_urls
+from .metrics import TimedSerializerMixin
+from .references import reference_cache_for, refresh_references
 
 User = get_user_model()
 
 # --- Serializer for Personality Questions (Read Only) ---
-class PersonalityQuestionSerializer(serializers.ModelSerializer):
+class PersonalityQuestionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PersonalityQuestion
         fields = ['id', 'text', 'order']
@@ -40,8 +45,12 @@ class NameRelatedField(serializers.RelatedField):
 
     def to_internal_value(self, data):
         # Assumes data is the 'name' of the related object
-        # Handles get_or_create based on the 'name' field.
+        # Handles get_or_create based on the 'name' field, served from the
+        # process-local name cache when the model has one.
         try:
+            reference_cache = reference_cache_for(self.related_model)
+            if reference_cache is not None:
+                return reference_cache.get_or_create(data)
             instance, created = self.related_model.objects.get_or_create(name=data)
             return instance
         except (TypeError, ValueError):
@@ -52,17 +61,61 @@ class NameRelatedField(serializers.RelatedField):
              self.fail('multiple_matches', input=data)
 
 
+    def to_internal_value_many(self, data):
+        """to_internal_value() for a whole list, resolving new names together."""
+        reference_cache = reference_cache_for(self.related_model)
+        if reference_cache is None or not all(isinstance(name, str) for name in data):
+            return [self.to_internal_value(name) for name in data]
+        try:
+            return reference_cache.get_or_create_many(list(data))
+        except self.related_model.MultipleObjectsReturned:
+            self.fail('multiple_matches', input=data)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return NameListField(**list_kwargs)
+
     def to_representation(self, value):
         # Represents the object by its name attribute
         return getattr(value, 'name', None)
 
+
+class NameListField(serializers.ManyRelatedField):
+    """`many=True` NameRelatedField; a list's names are looked up and created in bulk."""
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.to_internal_value_many(data)
+
+def write_with_fresh_references(write, validated_data):
+    """
+    Call `write(validated_data)`, and if the transaction fails with an
+    IntegrityError, call it once more with the reference names re-read from
+    the database: another worker may have deleted a row whose id is still
+    in this worker's reference cache, which only fails the foreign key
+    check at commit.
+    """
+    try:
+        return write(dict(validated_data))
+    except IntegrityError:
+        if not refresh_references(validated_data):
+            raise
+        return write(validated_data)
+
+
 # Specific field for Courses, using NameRelatedField for now
 # Future enhancement: Accept dict {'name': 'X', 'department': 'Y', 'course_number': 'Z'}
 class CourseRelatedField(NameRelatedField):
      pass
 
 
-class OnboardingSerializer(serializers.ModelSerializer):
+class OnboardingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     # User fields
     password = serializers.CharField(write_only=True, style={'input_type': 'password'})
     email = serializers.EmailField(required=True) # Assuming email is used for login/uniqueness
@@ -107,6 +160,9 @@ class OnboardingSerializer(serializers.ModelSerializer):
         # Note: 'profile.' sourced fields are handled by the serializer logic
 
     def create(self, validated_data):
+        return write_with_fresh_references(self.create_user, validated_data)
+
+    def create_user(self, validated_data):
         # Extract profile-related data before User creation
         profile_related_data = {
             'image': validated_data.pop('image', None) if 'image' in validated_data else None,
@@ -136,38 +192,41 @@ class OnboardingSerializer(serializers.ModelSerializer):
                 if not k.endswith('_data')
             }
             profile = Profile.objects.create(user=user, **profile_direct_fields)
+            if profile.image:
+                schedule_profile_image(profile.pk)
 
-            # Set ManyToMany relationships for the profile
-            profile.majors.set(profile_related_data['majors_data'])
-            profile.minors.set(profile_related_data['minors_data'])
-            profile.interests.set(profile_related_data['interests_data'])
-            profile.courses_taking.set(profile_related_data['courses_taking_data'])
-            profile.favorite_courses.set(profile_related_data['favorite_courses_data'])
-            profile.clubs.set(profile_related_data['clubs_data'])
+            # Set ManyToMany relationships for the profile. It's new, so add() is
+            # enough and empty relations need no query at all.
+            for field_name in ('majors', 'minors', 'interests', 'courses_taking', 'favorite_courses', 'clubs'):
+                related = profile_related_data[f'{field_name}_data']
+                if related:
+                    getattr(profile, field_name).add(*related)
 
-            # Create PersonalityAnswer instances
+            # Create PersonalityAnswer instances, loading all their questions in one query
+            questions = PersonalityQuestion.objects.in_bulk(
+                {answer_data['question_id'] for answer_data in personality_answers_data}
+            )
             answers_to_create = []
             for answer_data in personality_answers_data:
-                try:
-                    question = PersonalityQuestion.objects.get(pk=answer_data['question_id'])
-                    answers_to_create.append(
-                        PersonalityAnswer(
-                            profile=profile,
-                            question=question,
-                            answer_score=answer_data['answer_score']
-                        )
-                    )
-                except PersonalityQuestion.DoesNotExist:
+                question = questions.get(answer_data['question_id'])
+                if question is None:
                     raise serializers.ValidationError(
                         f"PersonalityQuestion with id {answer_data['question_id']} does not exist."
                     )
+                answers_to_create.append(
+                    PersonalityAnswer(
+                        profile=profile,
+                        question=question,
+                        answer_score=answer_data['answer_score']
+                    )
+                )
             PersonalityAnswer.objects.bulk_create(answers_to_create)
 
         return user # Return the created user instance
     
     def to_representation(self, instance):
         # Generate tokens for the newly created user
-        refresh = RefreshToken.for_user(instance)
+        refresh = ClaimsRefreshToken.for_user(instance)
         data = super().to_representation(instance)
         
         # Add tokens to the response
@@ -178,23 +237,111 @@ class OnboardingSerializer(serializers.ModelSerializer):
         
         return data
 
-class PersonalityDomainResultSerializer(serializers.Serializer):
+class PersonalityDomainScoreSerializer(serializers.Serializer):
     """
-    Serializer for a single personality domain result.
+    Serializer for a single personality domain's scores. The descriptive
+    texts are served separately by the personality catalog endpoint.
     """
     domain = serializers.CharField()
-    title = serializers.CharField()
-    description = serializers.CharField()
     result = serializers.CharField()
-    result_text = serializers.CharField()
-    facets = serializers.DictField()
-    raw_score = serializers.FloatField()
+    score = serializers.FloatField()
     count = serializers.IntegerField()
+    facets = serializers.DictField()
+
+class PersonalityResultsSerializer(serializers.Serializer):
+    """
+    Serializer for a profile's compact personality results.
+    """
+    version = serializers.CharField()
+    domains = PersonalityDomainScoreSerializer(many=True)
+
+# --- Sparse fieldsets ---
+def requested_fieldset(query_params):
+    """
+    Read the `fields`, `expand` and `compact` query parameters into a
+    normalized (fields, expand, compact) tuple.
+    """
+    def names(param):
+        value = query_params.get(param)
+        if not value:
+            return None
+        return tuple(sorted({name.strip() for name in value.split(',') if name.strip()}))
+    compact = query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+    return names('fields'), names('expand') or (), compact
+
+def fieldset_key(query_params):
+    """A stable cache-key fragment identifying the requested fieldset."""
+    fields, expand, compact = requested_fieldset(query_params)
+    if fields is None and not expand and not compact:
+        return ''
+    return f"fields={','.join(fields or ())};expand={','.join(expand)};compact={int(compact)}"
+
+class SparseFieldsetMixin:
+    """
+    Lets clients trim a serializer's output with query parameters:
+
+        ?fields=image,interests      only these fields
+        ?compact=1                   only Meta.compact_fields
+        ?expand=personality_results  add fields to the above (or to the default)
+
+    Fields listed in Meta.deferred_fields are left out unless expanded.
+    Dropped fields are never read from the instance, so the queries behind
+    them (M2M lookups, personality scoring) don't run. Only the output is
+    trimmed; writes still accept every field.
+    """
+    @cached_property
+    def selected_field_names(self):
+        """Names of the readable fields to output, or None for all of them."""
+        meta = getattr(self, 'Meta', None)
+        deferred = set(getattr(meta, 'deferred_fields', ()))
+        request = self.context.get('request')
+        if request is None:
+            return None
+        fields, expand, compact = requested_fieldset(request.query_params)
+        if fields is None and compact:
+            fields = getattr(meta, 'compact_fields', None)
+        if fields is None and not expand and not deferred:
+            return None
+        selected = set(fields) if fields is not None else set(self.fields) - deferred
+        return selected | set(expand)
+
+    @property
+    def _readable_fields(self):
+        # Only the top-level serializer (or the child of a top-level list) is trimmed
+        parent = self.parent
+        is_root = parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+        selected = self.selected_field_names if is_root else None
+        for field in super()._readable_fields:
+            if selected is None or field.field_name in selected:
+                yield field
+
+    @classmethod
+    def prefetch_for_fieldset(cls, queryset, request):
+        """
+        Add prefetches for the relations a list response will actually read,
+        so trimmed list payloads also skip the corresponding queries.
+        """
+        selected = cls(context={'request': request}).selected_field_names
+        model = queryset.model
+        many_to_many = {field.name for field in model._meta.many_to_many}
+        prefetches = [
+            name for name in cls.Meta.fields
+            if name in many_to_many and (selected is None or name in selected)
+        ]
+        for name, lookups in getattr(cls.Meta, 'field_prefetches', {}).items():
+            if selected is None or name in selected:
+                prefetches.extend(lookups)
+        return queryset.prefetch_related(*prefetches)
 
 # --- Serializer for Profile Update (PATCH) ---
-class ProfileUpdateSerializer(serializers.ModelSerializer):
+class ProfileUpdateSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    # Read-only display name for cards and lists
+    name = serializers.SerializerMethodField()
+
     # Use the same related fields as in OnboardingSerializer for consistency
     image = serializers.ImageField(required=False)
+    # Square thumbnails, null until the uploaded image has been processed
+    image_thumbnails = serializers.SerializerMethodField()
     majors = NameRelatedField(related_model=Major, many=True, required=False)
     minors = NameRelatedField(related_model=Minor, many=True, required=False)
     interests = NameRelatedField(related_model=Interest, many=True, required=False)
@@ -203,24 +350,54 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
     clubs = NameRelatedField(related_model=Club, many=True, required=False)
     year_in_school = serializers.ChoiceField(choices=Profile.AcademicYear.choices, required=False, allow_null=True)
 
-    # Personality Test Results
-    personality_results = PersonalityDomainResultSerializer(many=True, read_only=True)
+    # Personality Test Results (codes, scores and levels; texts come from the catalog)
+    personality_results = PersonalityResultsSerializer(source='personality_scores', read_only=True)
 
     class Meta:
         model = Profile
         # Updated fields list for PATCHable profile attributes
         fields = [
-            'image', 'year_in_school', 'department', 'socials',
+            'name', 'image', 'image_thumbnails', 'year_in_school', 'department', 'socials',
             'majors', 'minors', 'interests', 'courses_taking', 'favorite_courses', 'clubs',
             'personality_results'
         ]
         read_only_fields = ['user'] # User should not be changed via this serializer
+        # ?compact=1 -> just enough for a list card
+        compact_fields = ['name', 'image', 'image_thumbnails', 'year_in_school', 'majors', 'interests']
+        # Extra prefetches for non-M2M fields when serializing lists
+        field_prefetches = {
+            'name': ['user'],
+            'personality_results': ['personality_answers__question'],
+        }
+
+    def get_name(self, profile):
+        user = profile.user
+        return user.preferred_name or user.first_name or ''
+
+    def get_image_thumbnails(self, profile):
+        urls = thumbnail_urls(profile)
+        request = self.context.get('request')
+        if urls and request is not None:
+            # Absolute, like the image URL
+            urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+        return urls
+
+    def update(self, instance, validated_data):
+        profile = write_with_fresh_references(lambda data: self.update_profile(instance, data), validated_data)
+        if validated_data.get('image'):
+            schedule_profile_image(profile.pk)
+        return profile
+
+    def update_profile(self, instance, validated_data):
+        # One transaction for the row and every M2M set(), instead of one each
+        with transaction.atomic():
+            return super().update(instance, validated_data)
 
     # Default update handles partial updates (PATCH) correctly for direct fields.
     # For M2M fields, DRF's default update replaces the entire set.
 
 # Serlializer for the user location ping 
-class UserLocationSerializer(serializers.ModelSerializer):
+class UserLocationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserLocation
         fields = ['latitude', 'longitude', 'last_updated', 'is_active']
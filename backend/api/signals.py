@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import add_name as add_autocomplete_name, mark_dirty as mark_autocomplete_dirty
+from .cache import invalidate_all_profiles, invalidate_profile, invalidate_question_set
+from .models import PersonalityAnswer, PersonalityQuestion, Profile
+from .references import REFERENCE_MODELS, invalidate_reference
+
+User = get_user_model()
+
+
+def _user_id_for_profile(profile_id):
+    return Profile.objects.filter(pk=profile_id).values_list('user_id', flat=True).first()
+
+
+# --- Profile cache invalidation ---
+# Note: bulk_create/update() don't send these signals. Code that writes
+# profile data in bulk has to call invalidate_profile() itself.
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_on_save(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+
+@receiver(post_save, sender=User)
+def invalidate_profile_on_user_save(sender, instance, created, **kwargs):
+    # Profiles show the user's display name
+    if not created:
+        invalidate_profile(instance.pk)
+
+def invalidate_profile_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_profile(instance.user_id)
+    elif pk_set is None:
+        # e.g. interest.profile_set.clear(); we don't know who was affected
+        invalidate_all_profiles()
+    else:
+        for user_id in Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+            invalidate_profile(user_id)
+
+for m2m_field in Profile._meta.many_to_many:
+    m2m_changed.connect(
+        invalidate_profile_on_m2m_change,
+        sender=m2m_field.remote_field.through,
+        dispatch_uid=f'invalidate_profile_{m2m_field.name}',
+    )
+
+@receiver([post_save, post_delete], sender=PersonalityAnswer)
+def invalidate_profile_on_answer_change(sender, instance, **kwargs):
+    if PersonalityAnswer.profile.is_cached(instance):
+        user_id = instance.profile.user_id
+    else:
+        user_id = _user_id_for_profile(instance.profile_id)
+    if user_id is not None:
+        invalidate_profile(user_id)
+
+def invalidate_on_reference_change(sender, instance, created=False, **kwargs):
+    # Autocomplete indexes only see committed names
+    if created:
+        # Onboarding creates names all the time; add them without a rebuild
+        name = instance.name
+        transaction.on_commit(lambda: add_autocomplete_name(sender, name))
+        return
+    # Profiles and the name lookup cache only care about renames/deletes
+    transaction.on_commit(lambda: mark_autocomplete_dirty(sender))
+    invalidate_reference(sender, instance.pk)
+    invalidate_all_profiles()
+
+for reference_model in REFERENCE_MODELS:
+    post_save.connect(invalidate_on_reference_change, sender=reference_model)
+    post_delete.connect(invalidate_on_reference_change, sender=reference_model)
+
+@receiver([post_save, post_delete], sender=PersonalityQuestion)
+def invalidate_on_question_change(sender, instance, **kwargs):
+    invalidate_question_set()
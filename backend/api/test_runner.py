@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    Runs the test suite with ENFORCE_QUERY_BUDGETS on, so any test request
+    that goes over its endpoint's QUERY_BUDGETS entry fails with
+    QueryBudgetExceeded instead of only logging a warning.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.ENFORCE_QUERY_BUDGETS = True
@@ -1,7 +1,45 @@
+import csv
+import json
+import multiprocessing
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import AsyncRequestFactory, override_settings
+from django.db import connection, router
+from django.db.utils import ConnectionDoesNotExist
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
-from rest_framework.test import APITestCase
-from .models import PersonalityQuestion, Profile, PersonalityAnswer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from .async_views import AsyncPersonalityQuestionListView, AsyncUserLocationView
+from .bulk import bulk_insert, run_batches
+from .cache import invalidate_profiles
+from .management.commands.import_users import file_sha256
+from .models import PersonalityQuestion, Profile, PersonalityAnswer, UserLocation
+from .authentication import ClaimsRefreshToken, StatelessJWTAuthentication
+from .images import _process_in_background, image_path, process_profile_image, store_variants
+from .last_login import LastLoginBuffer, flush_last_logins
+from .autocomplete import mark_dirty as mark_autocomplete_dirty
+from .management.commands.generate_campus_dataset import CAMPUS_TZ
+from .middleware import QueryBudgetExceeded
+from .checks import check_deploy_cache, check_shared_cache
+from .replicas import has_recent_write, use_replica
+from .references import ReferenceCache, clear_reference_caches, reference_cache_for
+from .serializers import OnboardingSerializer, ProfileUpdateSerializer
+from .throttling import LocalBucketStore, parse_rate, reset_throttles
 
 class PersonalityQuestionTests(APITestCase):
     """
@@ -25,6 +63,55 @@ class PersonalityQuestionTests(APITestCase):
         self.assertEqual(response.data[0]['text'], "What is your favorite color?")
         self.assertEqual(response.data[1]['text'], "Are you a morning person or a night owl?")
 
+    def test_question_list_conditional_get(self):
+        """
+        Ensure the list carries a strong ETag and a matching If-None-Match gets a 304.
+        """
+        url = reverse('api:personality-questions')
+        response = self.client.get(url, format='json')
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('max-age', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_question_list_refreshes_on_change(self):
+        """
+        Ensure modifying a question replaces the pre-rendered list.
+        """
+        url = reverse('api:personality-questions')
+        etag = self.client.get(url, format='json')['ETag']
+        PersonalityQuestion.objects.create(text="Do you like surprises?", order=3)
+
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 3)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_question_list_expires_without_invalidation(self):
+        """
+        Ensure the pre-rendered list is rebuilt after QUESTION_LIST_LOCAL_MAX_AGE
+        even when no invalidation reaches this process.
+        """
+        cache.clear()
+        url = reverse('api:personality-questions')
+        self.client.get(url, format='json')
+        # update() sends no signal, like a bump that went to another process's cache
+        PersonalityQuestion.objects.filter(text="What is your favorite color?").update(text="Tea or coffee?")
+        self.assertEqual(self.client.get(url, format='json').data[0]['text'], "What is your favorite color?")
+        with override_settings(QUESTION_LIST_LOCAL_MAX_AGE=0):
+            self.assertEqual(self.client.get(url, format='json').data[0]['text'], "Tea or coffee?")
+
+    def test_process_local_cache_deploy_warning(self):
+        """
+        Ensure `check --deploy` warns when invalidations can't reach other processes.
+        """
+        self.assertEqual([warning.id for warning in check_deploy_cache(None)], ['api.W002'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}):
+            self.assertEqual(check_deploy_cache(None), [])
+
 # Add more test classes below for other endpoints (Onboarding, Auth, Profile)
 
 class OnboardingTests(APITestCase):
@@ -112,6 +199,7 @@ class OnboardingTests(APITestCase):
 
 from django.contrib.auth import get_user_model # Add this import if not already present
 
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0) # No flush timer outliving the test
 class AuthTests(APITestCase):
     """
     Tests for the JWT Authentication endpoints.
@@ -209,6 +297,7 @@ class AuthTests(APITestCase):
 # Make sure these models are imported at the top
 from .models import Profile, Interest, Course, Club, Major, Minor
 
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0) # No flush timer outliving the test
 class ProfileTests(APITestCase):
     """
     Tests for the User Profile endpoint (/api/profile/me/).
@@ -345,6 +434,1604 @@ class ProfileTests(APITestCase):
 
     # Todo: Add tests for invalid PATCH data (e.g., bad year_in_school choice) later
 
+class AsyncViewTests(APITestCase):
+    """
+    Tests for the async location and question views served under ASGI.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='async@example.com', password='pass1234')
+        cls.token = str(AccessToken.for_user(cls.user))
+        PersonalityQuestion.objects.create(text="Enjoy quiet evenings?", order=1)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def test_location_ping_round_trip(self):
+        """
+        Ensure an authenticated user can post a ping and read it back.
+        """
+        view = AsyncUserLocationView.as_view()
+        auth = {'headers': {'Authorization': f'Bearer {self.token}'}}
+        response = await view(self.factory.post('/api/location/', {'latitude': 39.67, 'longitude': -104.96}, content_type='application/json', **auth))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = await view(self.factory.get('/api/location/', **auth))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['latitude'], 39.67)
+
+    async def test_location_requires_valid_token(self):
+        """
+        Ensure missing or bad tokens get DRF's 401 responses.
+        """
+        view = AsyncUserLocationView.as_view()
+        response = await view(self.factory.get('/api/location/'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        response = await view(self.factory.get('/api/location/', headers={'Authorization': 'Bearer not-a-token'}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(response.content)['code'], 'token_not_valid')
+
+    async def test_question_list_matches_sync_view(self):
+        """
+        Ensure the async question list serves the same pre-rendered body and ETag.
+        """
+        response = await AsyncPersonalityQuestionListView.as_view()(self.factory.get('/api/personality-questions/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)[0]['text'], "Enjoy quiet evenings?")
+        sync_response = await sync_to_async(self.client.get)(reverse('api:personality-questions'))
+        self.assertEqual(sync_response['ETag'], response['ETag'])
+
+class ProfileCacheTests(APITestCase):
+    """
+    Tests for the cached GET /api/profile/me/ response and its invalidation.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        cls.test_user = cls.User.objects.create_user(
+            username='cacheuser',
+            password='cachepassword123',
+            email='cache@example.com'
+        )
+        cls.profile = Profile.objects.create(user=cls.test_user, department="Cached Department")
+        cls.question = PersonalityQuestion.objects.create(text="Cached question?", domain="E", order=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.test_user)
+        self.url = reverse('api:profile-me')
+
+    def test_etag_returns_not_modified(self):
+        """
+        Ensure a repeat GET with If-None-Match is answered with 304 from cache.
+        """
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_profile_save_invalidates_cache(self):
+        """
+        Ensure saving the profile drops the cached payload.
+        """
+        etag = self.client.get(self.url, format='json')['ETag']
+        self.profile.department = "Changed Department"
+        self.profile.save()
+
+        response = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['department'], "Changed Department")
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_m2m_and_answer_changes_invalidate_cache(self):
+        """
+        Ensure M2M changes (both sides) and answer changes drop the cached payload.
+        """
+        self.client.get(self.url, format='json')
+        interest = Interest.objects.create(name="Cached Interest")
+        self.profile.interests.add(interest)
+        self.assertEqual(self.client.get(self.url, format='json').data['interests'], ["Cached Interest"])
+
+        club = Club.objects.create(name="Cached Club")
+        club.profile_set.add(self.profile)
+        self.assertEqual(self.client.get(self.url, format='json').data['clubs'], ["Cached Club"])
+
+        interest.name = "Renamed Interest"
+        interest.save()
+        self.assertEqual(self.client.get(self.url, format='json').data['interests'], ["Renamed Interest"])
+
+        self.assertIsNone(self.client.get(self.url, format='json').data['personality_results'])
+        PersonalityAnswer.objects.create(profile=self.profile, question=self.question, answer_score=5)
+        self.assertIsNotNone(self.client.get(self.url, format='json').data['personality_results'])
+
+class PersonalityCatalogTests(APITestCase):
+    """
+    Tests for compact profile personality results and the text catalog endpoint.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        cls.test_user = cls.User.objects.create_user(
+            username='catalogUser',
+            password='catalogpassword123',
+            email='catalog@example.com'
+        )
+        cls.profile = Profile.objects.create(user=cls.test_user)
+        for i, (domain, facet, score) in enumerate([("E", "1", 5), ("E", "2", 4), ("N", "1", 1)], 1):
+            question = PersonalityQuestion.objects.create(text=f"Catalog question {i}", domain=domain, facet=facet, order=i)
+            PersonalityAnswer.objects.create(profile=cls.profile, question=question, answer_score=score)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_profile_returns_codes_and_scores_only(self):
+        """
+        Ensure profile personality results carry no catalog prose.
+        """
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get(reverse('api:profile-me'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data['personality_results']
+        self.assertIn('version', results)
+        self.assertEqual([d['domain'] for d in results['domains']], ["E", "N"])
+        extraversion = results['domains'][0]
+        self.assertEqual(extraversion['result'], 'high')
+        self.assertEqual(extraversion['score'], 9)
+        self.assertEqual(set(extraversion['facets']), {"1", "2"})
+        self.assertNotIn('description', extraversion)
+        self.assertNotIn('result_text', extraversion)
+
+    def test_catalog_matches_profile_version(self):
+        """
+        Ensure the catalog serves the texts under the version profiles refer to.
+        """
+        version = self.profile.personality_scores['version']
+        url = reverse('api:personality-catalog')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['version'], version)
+        self.assertEqual(data['domains']['E']['title'], "Extraversion")
+        self.assertIn('high', data['domains']['E']['results'])
+        self.assertIn('description', data['domains']['E']['facets']['1'])
+
+        response = self.client.get(url, {'v': version}, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('immutable', response['Cache-Control'])
+
+class SparseFieldsetTests(APITestCase):
+    """
+    Tests for ?fields=, ?expand= and ?compact= on profile responses.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        cls.profiles = []
+        for i in range(3):
+            user = cls.User.objects.create_user(
+                username=f'sparse{i}',
+                password='sparsepassword123',
+                email=f'sparse{i}@example.com',
+                preferred_name=f'Sparse {i}'
+            )
+            profile = Profile.objects.create(user=user, department="Sparse Department")
+            profile.interests.add(Interest.objects.get_or_create(name="Sparse Interest")[0])
+            profile.clubs.add(Club.objects.get_or_create(name="Sparse Club")[0])
+            cls.profiles.append(profile)
+        cls.test_user = cls.profiles[0].user
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.test_user)
+        self.url = reverse('api:profile-me')
+
+    def test_fields_limits_output_and_queries(self):
+        """
+        Ensure ?fields= only returns (and only queries) the requested fields.
+        """
+        full = self.client.get(self.url, format='json')
+        self.assertEqual(full.data['name'], "Sparse 0")
+        self.assertIn('clubs', full.data)
+
+        cache.clear()
+        with self.assertNumQueries(2): # profile + interests
+            response = self.client.get(self.url, {'fields': 'name,interests'}, format='json')
+        self.assertEqual(set(response.data), {'name', 'interests'})
+        self.assertEqual(response.data['interests'], ["Sparse Interest"])
+
+    def test_compact_with_expand(self):
+        """
+        Ensure ?compact=1 uses the compact fieldset and ?expand= adds to it.
+        """
+        response = self.client.get(self.url, {'compact': '1', 'expand': 'clubs'}, format='json')
+        self.assertEqual(set(response.data), {'name', 'image', 'image_thumbnails', 'year_in_school', 'majors', 'interests', 'clubs'})
+
+    def test_fields_do_not_restrict_writes(self):
+        """
+        Ensure a PATCH with ?fields= still updates fields it doesn't return.
+        """
+        response = self.client.patch(self.url + '?fields=name', {'department': "Updated"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'name'})
+        self.profiles[0].refresh_from_db()
+        self.assertEqual(self.profiles[0].department, "Updated")
+
+    def test_prefetch_for_fieldset(self):
+        """
+        Ensure list serialization only prefetches the requested relations.
+        """
+        request = Request(APIRequestFactory().get(self.url, {'fields': 'name,interests'}))
+        queryset = ProfileUpdateSerializer.prefetch_for_fieldset(
+            Profile.objects.filter(pk__in=[p.pk for p in self.profiles]), request
+        )
+        with self.assertNumQueries(3): # profiles + users + interests
+            data = ProfileUpdateSerializer(queryset, many=True, context={'request': request}).data
+        self.assertEqual(len(data), 3)
+        self.assertEqual(set(data[0]), {'name', 'interests'})
+
+class ReferenceCacheTests(APITestCase):
+    """
+    Tests for the process-local Major/Minor/Interest/Club/Course name cache.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.hiking = Interest.objects.create(name="Cached Hiking")
+
+    def setUp(self):
+        clear_reference_caches()
+        self.reference_cache = reference_cache_for(Interest)
+
+    def tearDown(self):
+        # Cached ids would outlive the rows rolled back after each test
+        clear_reference_caches()
+
+    def test_known_names_skip_the_database(self):
+        """
+        Ensure a warmed cache answers lookups without queries.
+        """
+        self.reference_cache.warm()
+        with self.assertNumQueries(0):
+            interest = self.reference_cache.get_or_create("Cached Hiking")
+        self.assertEqual(interest.pk, self.hiking.pk)
+
+    def test_created_names_are_cached_after_commit(self):
+        """
+        Ensure new names are only remembered once their row is committed.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.reference_cache.get_or_create("Cached Climbing")
+            self.assertIsNone(self.reference_cache.lookup("Cached Climbing"))
+        self.assertEqual(self.reference_cache.lookup("Cached Climbing"), created.pk)
+
+    def test_rename_and_delete_evict(self):
+        """
+        Ensure renamed and deleted rows are dropped from the cache.
+        """
+        self.reference_cache.warm()
+        self.hiking.name = "Cached Trail Running"
+        self.hiking.save()
+        self.assertIsNone(self.reference_cache.lookup("Cached Hiking"))
+
+        self.reference_cache.warm()
+        self.hiking.delete()
+        self.assertIsNone(self.reference_cache.lookup("Cached Trail Running"))
+
+    def test_cache_is_bounded(self):
+        """
+        Ensure the least recently used names are evicted past maxsize.
+        """
+        reference_cache = ReferenceCache(Interest, maxsize=2)
+        reference_cache.remember(1, "a")
+        reference_cache.remember(2, "b")
+        reference_cache.lookup("a")
+        reference_cache.remember(3, "c")
+        self.assertEqual(len(reference_cache), 2)
+        self.assertIsNone(reference_cache.lookup("b"))
+        self.assertEqual(reference_cache.lookup("a"), 1)
+
+@override_settings(REFERENCE_CACHE_SHARED_INVALIDATION=False)
+class StaleReferenceTests(APITransactionTestCase):
+    """
+    Tests for writes that meet a reference id another worker has deleted.
+    Transactional, because the foreign key is only checked at commit.
+    """
+    def tearDown(self):
+        clear_reference_caches()
+
+    def test_deleted_name_is_created_again(self):
+        """
+        Ensure a PATCH naming a row deleted behind the cache's back recreates it instead of failing.
+        """
+        user = get_user_model().objects.create_user(email='stale@example.com', password='pass1234')
+        Profile.objects.create(user=user)
+        hiking = Interest.objects.create(name="Stale Hiking")
+        reference_cache = reference_cache_for(Interest)
+        reference_cache.warm()
+        # Deleted by another worker: this one still has the id cached
+        Interest.objects.filter(pk=hiking.pk).delete()
+        reference_cache.remember(hiking.pk, "Stale Hiking")
+
+        self.client.force_authenticate(user=user)
+        response = self.client.patch(reverse('api:profile-me'), {'interests': ["Stale Hiking"]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['interests'], ["Stale Hiking"])
+        recreated = Interest.objects.get(name="Stale Hiking")
+        self.assertNotEqual(recreated.pk, hiking.pk)
+        self.assertEqual(list(user.profile.interests.all()), [recreated])
+
+class AutocompleteTests(APITestCase):
+    """
+    Tests for the /api/autocomplete/<kind>/ typeahead endpoint.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        hiking = Interest.objects.create(name="Hiking")
+        history = Interest.objects.create(name="History")
+        Interest.objects.create(name="Hip Hop")
+        Interest.objects.create(name="Rock Climbing")
+        # History is linked by two profiles, Hiking by one
+        for i, interests in enumerate([[history], [history, hiking]]):
+            user = cls.User.objects.create_user(username=f'auto{i}', password='autopassword123', email=f'auto{i}@example.com')
+            Profile.objects.create(user=user).interests.set(interests)
+        Course.objects.create(name="Intro to Computer Science", department="COMP", course_number="101")
+
+    def setUp(self):
+        mark_autocomplete_dirty(Interest)
+        mark_autocomplete_dirty(Course)
+
+    def test_prefix_ranked_by_popularity(self):
+        """
+        Ensure prefix matches come back most-used first.
+        """
+        url = reverse('api:autocomplete', args=['interests'])
+        response = self.client.get(url, {'q': 'hi'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [{'name': "History", 'count': 2}, {'name': "Hiking", 'count': 1}, {'name': "Hip Hop", 'count': 0}]
+        )
+        response = self.client.get(url, {'q': 'hi', 'limit': 1}, format='json')
+        self.assertEqual([match['name'] for match in response.data], ["History"])
+
+    def test_substring_fallback_and_index_reuse(self):
+        """
+        Ensure mid-name matches are found and repeat queries skip the database.
+        """
+        url = reverse('api:autocomplete', args=['courses'])
+        self.assertEqual(self.client.get(url, {'q': 'comp'}, format='json').data[0]['name'], "Intro to Computer Science")
+        with self.assertNumQueries(0):
+            self.client.get(url, {'q': 'compu'}, format='json')
+
+    def test_new_names_appear(self):
+        """
+        Ensure newly created names are added to the built index without rebuilding it.
+        """
+        url = reverse('api:autocomplete', args=['interests'])
+        self.client.get(url, {'q': 'ro'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            Interest.objects.create(name="Robotics")
+        with self.assertNumQueries(0):
+            names = [match['name'] for match in self.client.get(url, {'q': 'ro'}, format='json').data]
+            self.assertEqual(names, ["Robotics", "Rock Climbing"])
+            names = [match['name'] for match in self.client.get(url, {'q': 'bot'}, format='json').data]
+            self.assertEqual(names, ["Robotics"])
+
+    def test_names_created_together_appear(self):
+        """
+        Ensure names a profile update creates in one insert still reach the index.
+        """
+        url = reverse('api:autocomplete', args=['interests'])
+        self.client.get(url, {'q': 'ro'}, format='json')
+        user = self.User.objects.get(username='auto0')
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('api:profile-me'), {'interests': ["Robotics", "Rowing", "History"]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Interest.objects.filter(name__in=["Robotics", "Rowing"]).count(), 2)
+        with self.assertNumQueries(0):
+            names = [match['name'] for match in self.client.get(url, {'q': 'ro'}, format='json').data]
+        self.assertEqual(sorted(names), ["Robotics", "Rock Climbing", "Rowing"])
+
+    def test_renames_rebuild_only_their_kind(self):
+        """
+        Ensure renaming a name rebuilds that kind's index once the change commits, and no other.
+        """
+        interests_url = reverse('api:autocomplete', args=['interests'])
+        courses_url = reverse('api:autocomplete', args=['courses'])
+        self.client.get(interests_url, {'q': 'hi'}, format='json')
+        self.client.get(courses_url, {'q': 'comp'}, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            renamed = Interest.objects.get(name="Hip Hop")
+            renamed.name = "Breakdance"
+            renamed.save()
+            # Nothing is marked before the commit
+            with self.assertNumQueries(0):
+                self.client.get(interests_url, {'q': 'br'}, format='json')
+        self.assertEqual(len(callbacks), 1)
+
+        with self.assertNumQueries(0):
+            self.client.get(courses_url, {'q': 'comp'}, format='json')
+        names = [match['name'] for match in self.client.get(interests_url, {'q': 'br'}, format='json').data]
+        self.assertEqual(names, ["Breakdance"])
+
+    def test_unknown_kind(self):
+        """
+        Ensure an unsupported type returns 404.
+        """
+        response = self.client.get(reverse('api:autocomplete', args=['pets']), {'q': 'do'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class GenerateTestUsersTests(APITestCase):
+    """
+    Tests for the generate_test_users management command.
+    """
+    def test_bulk_mode(self):
+        """
+        Ensure --bulk creates complete users that can log in with the shared password.
+        """
+        call_command('generate_test_users', count=5, bulk=True, batch_size=2, seed=7, stdout=StringIO())
+
+        users = get_user_model().objects.filter(email__endswith='@testuser.com')
+        self.assertEqual(users.count(), 5)
+        user = users.first()
+        self.assertTrue(user.check_password('testpassword'))
+        profile = user.profile
+        self.assertTrue(1 <= profile.majors.count() <= 2)
+        self.assertTrue(3 <= profile.interests.count() <= 7)
+        self.assertTrue(set(profile.favorite_courses.all()) <= set(profile.courses_taking.all()))
+        self.assertEqual(profile.personality_answers.count(), PersonalityQuestion.objects.count())
+
+def failing_batch(job):
+    # Module level, so forked workers can unpickle it
+    if job == 0:
+        raise ValueError("batch failed")
+    return job
+
+class RunBatchesTests(APITestCase):
+    """
+    Tests for api.bulk.run_batches.
+    """
+    @patch('api.bulk.connections.close_all') # Would break the test's transaction
+    def test_failing_batch_shuts_the_pool_down(self, close_all):
+        """
+        Ensure a failing batch's error propagates without leaving worker processes behind.
+        """
+        self.assertEqual(sorted(run_batches(failing_batch, [1, 2, 3], workers=2)), [1, 2, 3])
+        with self.assertRaisesMessage(ValueError, "batch failed"):
+            for _ in run_batches(failing_batch, list(range(20)), workers=2):
+                pass
+        self.assertEqual(multiprocessing.active_children(), [])
+
+class PopulateBig5TestTests(APITestCase):
+    """
+    Tests for the populate_big5_test management command.
+    """
+    def test_reload_updates_questions_in_place(self):
+        """
+        Ensure re-running the load restores changed questions without
+        duplicating them and refreshes the cached question list.
+        """
+        call_command('populate_big5_test', stdout=StringIO())
+        self.assertEqual(PersonalityQuestion.objects.count(), 120)
+        question = PersonalityQuestion.objects.get(order=1)
+        # update() sends no signals, like an edit made straight in the database
+        PersonalityQuestion.objects.filter(pk=question.pk).update(domain='C', reverse_scale=True, order=500)
+
+        url = reverse('api:personality-questions')
+        etag = self.client.get(url, format='json')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('populate_big5_test', stdout=StringIO())
+
+        self.assertEqual(PersonalityQuestion.objects.count(), 120)
+        question.refresh_from_db()
+        self.assertEqual((question.domain, question.reverse_scale, question.order), ('N', False, 1))
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class ImportUsersTests(APITestCase):
+    """
+    Tests for the import_users management command.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.question = PersonalityQuestion.objects.create(text="Life of the party?", domain='E')
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_import_jsonl(self):
+        """
+        Ensure valid records are imported with their references and answers,
+        and duplicate or invalid records are reported without stopping the import.
+        """
+        records = [
+            {"email": "Ada@Example.com", "first_name": "Ada", "majors": ["Mathematics"], "interests": ["Chess", "Hiking"],
+             "personality_answers": [{"question_id": self.question.id, "answer_score": 4}]},
+            {"email": "ada@example.com", "first_name": "Duplicate"},
+            {"email": "not-an-email"},
+            {"email": "grace@example.com", "year_in_school": "SR", "courses_taking": ["COMP 2800"], "favorite_courses": ["COMP 2800"]},
+        ]
+        path = self.write('roster.jsonl', '\n'.join(json.dumps(record) for record in records) + '\n{broken\n')
+        call_command('import_users', path, chunk_size=2, stdout=StringIO(), stderr=StringIO())
+
+        User = get_user_model()
+        ada = User.objects.get(email='ada@example.com')
+        self.assertEqual((ada.first_name, ada.username), ("Ada", "ada"))
+        self.assertFalse(ada.has_usable_password())
+        self.assertEqual(set(ada.profile.interests.values_list('name', flat=True)), {"Chess", "Hiking"})
+        self.assertTrue(ada.profile.personality_answers.filter(question=self.question, answer_score=4).exists())
+        grace = User.objects.get(email='grace@example.com')
+        self.assertEqual(grace.profile.year_in_school, 'SR')
+        self.assertEqual(list(grace.profile.favorite_courses.all()), list(grace.profile.courses_taking.all()))
+        self.assertEqual(User.objects.count(), 2)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_resume_csv_from_checkpoint(self):
+        """
+        Ensure a checkpointed CSV import skips the records it already committed.
+        """
+        path = self.write('roster.csv', (
+            'email,first_name,interests\n'
+            'first@example.com,First,Music;Art\n'
+            'second@example.com,Second,Music\n'
+        ))
+        self.write('roster.csv.checkpoint', json.dumps(
+            {'sha256': file_sha256(path), 'records': 1, 'created': 1, 'skipped': 0, 'rejected': 0}
+        ))
+        call_command('import_users', path, stdout=StringIO())
+
+        User = get_user_model()
+        self.assertFalse(User.objects.filter(email='first@example.com').exists())
+        second = User.objects.get(email='second@example.com')
+        self.assertEqual(list(second.profile.interests.values_list('name', flat=True)), ["Music"])
+
+    def test_checkpoint_of_edited_file_is_refused(self):
+        """
+        Ensure a checkpoint isn't applied to a file edited since, even one of the same size.
+        """
+        content = 'email\nfirst@example.com\nsecond@example.com\n'
+        path = self.write('roster.csv', content)
+        self.write('roster.csv.checkpoint', json.dumps(
+            {'sha256': file_sha256(path), 'records': 1, 'created': 1, 'skipped': 0, 'rejected': 0}
+        ))
+        self.write('roster.csv', content.replace('first', 'third'))
+        with self.assertRaisesMessage(CommandError, "changed since the checkpoint"):
+            call_command('import_users', path, stdout=StringIO())
+        self.assertFalse(get_user_model().objects.exists())
+
+class BulkInsertTests(APITestCase):
+    """
+    Tests for api.bulk.bulk_insert.
+    """
+    def insert_and_read_back(self):
+        User = get_user_model()
+        user = User.objects.create_user(email='copy@example.com', password='pass1234')
+        bulk_insert(Interest, [Interest(name='Say "hi", then\nleave'), Interest(name='Plain')])
+        bulk_insert(Profile, [Profile(user=user, department='', socials={'handle': 'a "b", c'}, year_in_school=None)])
+        bulk_insert(UserLocation, [
+            UserLocation(user=user, latitude=39.678, longitude=-104.962, is_active=True),
+            UserLocation(user=user, latitude=-0.5, longitude=0.25, is_active=False),
+        ])
+
+        self.assertEqual(set(Interest.objects.values_list('name', flat=True)), {'Say "hi", then\nleave', 'Plain'})
+        profile = Profile.objects.get(user=user)
+        self.assertEqual((profile.department, profile.year_in_school, profile.image_hash), ('', None, ''))
+        self.assertEqual(profile.socials, {'handle': 'a "b", c'})
+        locations = list(user.locations.order_by('latitude').values_list('latitude', 'longitude', 'is_active'))
+        self.assertEqual(locations, [(-0.5, 0.25, False), (39.678, -104.962, True)])
+        self.assertTrue(all(location.last_updated for location in user.locations.all()))
+
+    def test_values_round_trip(self):
+        """
+        Ensure inserted rows read back unchanged, whichever path the database takes.
+        """
+        self.insert_and_read_back()
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY is only used on PostgreSQL")
+    def test_copy_round_trips_values(self):
+        """
+        Ensure PostgreSQL loads through COPY, keeping quotes, commas, newlines,
+        empty strings, NULLs, booleans and JSON intact.
+        """
+        with patch('django.db.models.QuerySet.bulk_create', side_effect=AssertionError("bulk_create used")):
+            self.insert_and_read_back()
+
+class ExportTests(APITestCase):
+    """
+    Tests for the streaming export endpoint and export_data command.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(email='staff@example.com', password='pass1234', is_staff=True)
+        cls.user = User.objects.create_user(email='student@example.com', password='pass1234', first_name="Sam")
+        profile = Profile.objects.create(user=cls.user, department="History")
+        profile.interests.create(name="Chess")
+        profile.interests.create(name="Hiking")
+        question = PersonalityQuestion.objects.create(text="Enjoy crowds?", domain='E', facet='2')
+        PersonalityAnswer.objects.create(profile=profile, question=question, answer_score=5)
+
+    def test_export_requires_staff(self):
+        """
+        Ensure regular users can't export data.
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('api:export', kwargs={'name': 'profiles'}))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stream_profiles_jsonl(self):
+        """
+        Ensure profiles stream as one JSON object per line with their names.
+        """
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(reverse('api:export', kwargs={'name': 'profiles'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['email'], 'student@example.com')
+        self.assertEqual(sorted(rows[0]['interests']), ["Chess", "Hiking"])
+
+    def test_export_answers_csv_command(self):
+        """
+        Ensure export_data writes a CSV with a header row.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'answers.csv')
+            call_command('export_data', 'answers', format='csv', output=path, stderr=StringIO())
+            with open(path, newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['domain'], rows[0]['facet'], rows[0]['answer_score']), ('E', '2', '5'))
+
+class PurgeUsersTests(APITestCase):
+    """
+    Tests for the purge_users management command.
+    """
+    def test_purge_test_users_in_batches(self):
+        """
+        Ensure test users and everything hanging off them are deleted and
+        archived, while other accounts are left alone.
+        """
+        call_command('generate_test_users', count=3, bulk=True, seed=1, stdout=StringIO())
+        User = get_user_model()
+        keep = User.objects.create_user(email='keep@example.com', password='pass1234')
+        Profile.objects.create(user=keep)
+        purged = User.objects.filter(email__endswith='@testuser.com').first()
+        UserLocation.objects.create(user=purged, latitude=1, longitude=2)
+        # A token that outlives the account mustn't keep getting its cached profile
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(purged).access_token}')
+        self.assertEqual(self.client.get(reverse('api:profile-me')).status_code, status.HTTP_200_OK)
+
+        with tempfile.TemporaryDirectory() as directory, self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_users', test_users=True, batch_size=2, archive=directory, stdout=StringIO())
+            with open(os.path.join(directory, 'profiles.jsonl')) as f:
+                self.assertEqual(len(f.readlines()), 3)
+
+        self.assertEqual(list(User.objects.all()), [keep])
+        self.assertEqual(Profile.objects.count(), 1)
+        self.assertFalse(PersonalityAnswer.objects.exists())
+        self.assertFalse(UserLocation.objects.exists())
+        self.assertFalse(Profile.interests.through.objects.exists())
+        self.assertEqual(self.client.get(reverse('api:profile-me')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_requires_a_selection(self):
+        """
+        Ensure the command refuses to run without selecting users.
+        """
+        with self.assertRaises(CommandError):
+            call_command('purge_users', stdout=StringIO())
+
+class DatabaseHealthTests(APITestCase):
+    """
+    Tests for the database health endpoint.
+    """
+    def test_reports_database_status_to_staff(self):
+        """
+        Ensure staff see each database's status and regular users are refused.
+        """
+        User = get_user_model()
+        url = reverse('api:health-db')
+        self.client.force_authenticate(user=User.objects.create_user(email='user@example.com', password='pass1234'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=User.objects.create_user(email='ops@example.com', password='pass1234', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        default = response.data['databases']['default']
+        self.assertTrue(default['ok'])
+        self.assertIn('conn_max_age', default)
+        self.assertIn('pool', default)
+
+class ReplicaRoutingTests(APITestCase):
+    """
+    Tests for read-replica routing and read-your-writes stickiness.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_route_to_replica_only_when_asked(self):
+        """
+        Ensure reads use a replica only inside use_replica() and writes never do.
+        """
+        with self.settings(DATABASE_REPLICAS=['replica_1']):
+            self.assertEqual(router.db_for_read(Profile), 'default')
+            with use_replica():
+                self.assertEqual(router.db_for_read(Profile), 'replica_1')
+                self.assertEqual(router.db_for_write(Profile), 'default')
+                # Related lookups stay where the instance was loaded from
+                profile = Profile(pk=1)
+                profile._state.db = 'default'
+                self.assertEqual(router.db_for_read(PersonalityAnswer, instance=profile), 'default')
+            self.assertEqual(router.db_for_read(Profile), 'default')
+        with use_replica():
+            self.assertEqual(router.db_for_read(Profile), 'default') # No replicas configured
+
+    def test_reads_go_to_replica_but_cached_payloads_dont(self):
+        """
+        Ensure a GET from a user who hasn't written lately reads from a replica,
+        except to build a cached profile payload.
+        """
+        User = get_user_model()
+        user = User.objects.create_user(email='reader@example.com', password='pass1234')
+        Profile.objects.create(user=user, department='Physics')
+        self.client.force_authenticate(user=user)
+        with self.settings(DATABASE_REPLICAS=['replica_1']):
+            # replica_1 doesn't exist here, so reaching for it is the proof
+            with self.assertRaises(ConnectionDoesNotExist):
+                self.client.get(reverse('api:location-history'))
+            response = self.client.get(reverse('api:profile-me'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['department'], 'Physics')
+
+    def test_database_cache_reads_stay_on_default(self):
+        """
+        Ensure a DatabaseCache is read from 'default' inside a replica-reading
+        GET, so other workers' invalidations are seen at once.
+        """
+        User = get_user_model()
+        user = User.objects.create_user(email='cached@example.com', password='pass1234')
+        Profile.objects.create(user=user, department='Physics')
+        self.client.force_authenticate(user=user)
+        database_cache = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'replica_test_cache'}}
+        # The cache's own queries count towards the request here, so budgets don't apply
+        with self.settings(CACHES=database_cache, DATABASE_REPLICAS=['replica_1'], ENFORCE_QUERY_BUDGETS=False):
+            call_command('createcachetable', stdout=StringIO())
+            # replica_1 doesn't exist here: any cache read sent there raises
+            for department in ('Physics', 'History'):
+                response = self.client.get(reverse('api:profile-me'))
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['department'], department)
+                # Saved by another worker: its invalidation must be seen by the next GET
+                Profile.objects.filter(user=user).update(department='History')
+                invalidate_profiles([user.pk])
+            with use_replica():
+                self.assertEqual(router.db_for_read(cache.cache_model_class), 'default')
+
+    def test_process_local_cache_warning(self):
+        """
+        Ensure replicas with a per-process cache are reported by the system checks.
+        """
+        self.assertEqual(check_shared_cache(None), [])
+        with self.settings(DATABASE_REPLICAS=['replica_1']):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['api.W001'])
+            with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}):
+                self.assertEqual(check_shared_cache(None), [])
+
+    def test_writes_keep_reads_on_default(self):
+        """
+        Ensure a PATCH or onboarding pins the user's following reads to 'default'.
+        """
+        User = get_user_model()
+        user = User.objects.create_user(email='writer@example.com', password='pass1234')
+        self.client.force_authenticate(user=user)
+        url = reverse('api:profile-me')
+        with self.settings(DATABASE_REPLICAS=['replica_1']):
+            response = self.client.patch(url, {'department': 'Physics'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(has_recent_write(user.pk))
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['department'], 'Physics')
+
+            self.client.force_authenticate(user=None)
+            response = self.client.post(reverse('api:onboarding'), {'email': 'new@example.com', 'password': 'pass1234', 'personality_answers': []}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+            self.assertTrue(has_recent_write(User.objects.get(email='new@example.com').pk))
+
+class RequestMetricsTests(APITestCase):
+    """
+    Tests for the request metrics middleware.
+    """
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='metrics@example.com', password='pass1234')
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_and_log_line(self):
+        """
+        Ensure responses carry Server-Timing and each request logs one JSON line.
+        """
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            response = self.client.get(reverse('api:profile-me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'serializer;dur=', 'view;dur='):
+            self.assertIn(metric, timing)
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'api:profile-me')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn(f'desc="{record["queries"]} queries"', timing)
+
+    def test_query_budget_enforcement(self):
+        """
+        Ensure going over an endpoint's budget logs a warning, and fails when enforced.
+        """
+        url = reverse('api:profile-me')
+        with self.settings(QUERY_BUDGETS={'GET api:profile-me': 0}):
+            with self.settings(ENFORCE_QUERY_BUDGETS=False):
+                with self.assertLogs('api.requests', 'WARNING'):
+                    self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            cache.clear()
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(url)
+
+class QueryBudgetTests(APITestCase):
+    """
+    Runs every endpoint in QUERY_BUDGETS with realistic data. The test runner
+    enforces budgets for the whole suite; these tests make sure each budgeted
+    endpoint is exercised with enough rows that an N+1 query would show.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.questions = [
+            PersonalityQuestion.objects.create(text=f"Question {number}", order=number, domain='E', facet=1)
+            for number in range(1, 51)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def onboard(self, email):
+        payload = {
+            "email": email,
+            "password": "strongpassword123",
+            "majors": ["Computer Science", "Mathematics"],
+            "minors": ["Physics"],
+            "interests": ["Board Games", "Hiking", "Programming"],
+            "courses_taking": ["COMP 2800", "MATH 3100"],
+            "favorite_courses": ["COMP 1800"],
+            "clubs": ["Coding Club"],
+            "personality_answers": [
+                {"question_id": question.id, "answer_score": 3} for question in self.questions
+            ],
+        }
+        response = self.client.post(reverse('api:onboarding'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['tokens']['access']
+
+    def test_endpoints_stay_within_budget(self):
+        """
+        Ensure onboarding, profile, location, question and autocomplete requests
+        run no more queries than QUERY_BUDGETS allows.
+        """
+        self.onboard('first@example.com')
+        # Every answer refers to a question; their number mustn't matter
+        access = self.onboard('second@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        profile_url = reverse('api:profile-me')
+        self.assertEqual(self.client.get(profile_url).status_code, status.HTTP_200_OK)
+        response = self.client.patch(profile_url, {'interests': ['Hiking', 'Climbing'], 'department': 'Physics'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Replacing every list with names nobody used before is the most a PATCH
+        # can cost, however long the lists are
+        response = self.client.patch(profile_url, {
+            field: [f"{field} {number}" for number in range(10)]
+            for field in ('majors', 'minors', 'interests', 'courses_taking', 'favorite_courses', 'clubs')
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['favorite_courses']), 10)
+        self.assertEqual(self.client.get(profile_url).status_code, status.HTTP_200_OK)
+
+        location_url = reverse('api:location')
+        response = self.client.post(location_url, {'latitude': 39.678, 'longitude': -104.962}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.get(location_url).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.get(reverse('api:personality-questions')).status_code, status.HTTP_200_OK)
+        autocomplete_url = reverse('api:autocomplete', kwargs={'kind': 'interests'})
+        self.assertEqual(self.client.get(autocomplete_url, {'q': 'hi'}).status_code, status.HTTP_200_OK)
+
+class PrometheusMetricsTests(APITestCase):
+    """
+    Tests for the Prometheus /metrics endpoint.
+    """
+    def test_metrics_exposition(self):
+        """
+        Ensure /metrics reports per-route requests, query histograms and cache lookups.
+        """
+        cache.clear()
+        User = get_user_model()
+        user = User.objects.create_user(email='prom@example.com', password='pass1234')
+        Profile.objects.create(user=user)
+        self.client.force_authenticate(user=user)
+        self.client.get(reverse('api:profile-me'))
+        self.client.get(reverse('api:profile-me'))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{method="GET",route="api:profile-me",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",route="api:profile-me"}', body)
+        self.assertIn('http_request_db_queries_count{method="GET",route="api:profile-me"}', body)
+        self.assertIn('cache_lookups_total{cache="profile",result="hit"}', body)
+        self.assertIn('personality_scoring_duration_seconds_count', body)
+
+    def test_metrics_token(self):
+        """
+        Ensure a configured METRICS_TOKEN is required.
+        """
+        with self.settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class RequestProfilingTests(APITestCase):
+    """
+    Tests for on-demand and sampled request profiling.
+    """
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = self.settings(PROFILING_DIR=directory.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        User = get_user_model()
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(email='student@example.com', password='pass1234')
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def test_staff_profile_on_demand(self):
+        """
+        Ensure staff get a profile stored under the request ID and can download it.
+        """
+        self.authenticate(self.staff)
+        response = self.client.get(reverse('api:profile-me'), HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response['X-Profile-Id']
+        self.assertTrue(profile_id.startswith(response['X-Request-ID'] + '-'))
+
+        listing = self.client.get(reverse('api:request-profiles'))
+        self.assertEqual(listing.data[0]['id'], profile_id)
+        self.assertEqual(listing.data[0]['request_id'], response['X-Request-ID'])
+        self.assertEqual(listing.data[0]['format'], 'collapsed')
+        download = self.client.get(reverse('api:request-profile', kwargs={'profile_id': profile_id}))
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        for line in b''.join(download.streaming_content).decode().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(int(count) > 0 and stack)
+
+        response = self.client.get(reverse('api:profile-me'), {'profile': 'cprofile'})
+        found = self.client.get(reverse('api:request-profile', kwargs={'profile_id': response['X-Profile-Id']}))
+        self.assertIn('.prof', found['Content-Disposition'])
+
+    def test_profiling_requires_staff(self):
+        """
+        Ensure regular users can neither trigger profiling nor read profiles.
+        """
+        self.authenticate(self.user)
+        response = self.client.get(reverse('api:profile-me'), HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get(reverse('api:request-profiles')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_random_sampling(self):
+        """
+        Ensure PROFILING_SAMPLE_RATE profiles anyone's requests, keyed by a safe request ID
+        that a replayed X-Request-ID can't reuse.
+        """
+        with self.settings(PROFILING_SAMPLE_RATE=1.0):
+            first = self.client.get(reverse('api:personality-questions'), HTTP_X_REQUEST_ID='edge-1234')
+            replay = self.client.get(reverse('api:personality-questions'), HTTP_X_REQUEST_ID='edge-1234')
+            self.assertTrue(first['X-Profile-Id'].startswith('edge-1234-'))
+            self.assertNotEqual(first['X-Profile-Id'], replay['X-Profile-Id'])
+            self.assertEqual(len(os.listdir(settings.PROFILING_DIR)), 2)
+            response = self.client.get(reverse('api:personality-questions'), HTTP_X_REQUEST_ID='../../etc/passwd')
+            self.assertNotIn('/', response['X-Profile-Id'])
+            self.assertNotEqual(response['X-Request-ID'], '../../etc/passwd')
+
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0) # No flush timer outliving the test
+class StatelessAuthenticationTests(APITestCase):
+    """
+    Tests for token claims and StatelessJWTAuthentication.
+    """
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='claims@example.com', password='pass1234')
+        self.profile = Profile.objects.create(user=self.user)
+
+    def test_login_tokens_carry_claims(self):
+        """
+        Ensure login issues tokens with the active flag.
+        """
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'claims@example.com', 'password': 'pass1234'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(AccessToken(response.data['access'])['is_active'])
+
+        # Refreshed access tokens keep it
+        response = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']}, format='json')
+        self.assertTrue(AccessToken(response.data['access'])['is_active'])
+
+    def test_only_reads_skip_the_user_query(self):
+        """
+        Ensure location reads authenticate without loading the user row, and pings still load it.
+        """
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with self.assertNumQueries(2): # User, INSERT
+            response = self.client.post(reverse('api:location'), {'latitude': 39.678, 'longitude': -104.962}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserLocation.objects.get().user_id, self.user.pk)
+        with self.assertNumQueries(1): # Latest location only
+            response = self.client.get(reverse('api:location'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_user_token_creates_nothing(self):
+        """
+        Ensure a still-valid token of a deleted user gets 401 and leaves no orphan rows.
+        """
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.user.delete()
+        response = self.client.post(reverse('api:location'), {'latitude': 39.678, 'longitude': -104.962}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('api:profile-me')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(UserLocation.objects.exists())
+        self.assertFalse(Profile.objects.exists())
+
+    def test_claims_user_loads_lazily(self):
+        """
+        Ensure the claims user answers its id from the token and loads the row on demand.
+        """
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        user = StatelessJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.pk, user.is_active, user.is_authenticated), (self.user.pk, True, True))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'claims@example.com')
+            self.assertFalse(user.is_staff)
+
+        token['is_active'] = False
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get(reverse('api:location')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+class LastLoginTests(APITestCase):
+    """
+    Tests for the deferred, batched last_login writes.
+    """
+    def setUp(self):
+        User = get_user_model()
+        self.users = [User.objects.create_user(email=f'login{i}@example.com', password='pass1234') for i in range(3)]
+
+    def tearDown(self):
+        flush_last_logins()
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=3600)
+    def test_login_and_refresh_defer_last_login(self):
+        """
+        Ensure login and refresh don't write last_login until the buffer is flushed.
+        """
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'login0@example.com', 'password': 'pass1234'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1): # simplejwt's active-account check, no UPDATE
+            response = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.users[0].refresh_from_db()
+        self.assertIsNone(self.users[0].last_login)
+
+        self.assertEqual(flush_last_logins(), 1)
+        self.users[0].refresh_from_db()
+        self.assertIsNotNone(self.users[0].last_login)
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=3600)
+    def test_flush_writes_latest_logins_in_one_query(self):
+        """
+        Ensure a flush writes each user's latest login in a single UPDATE.
+        """
+        buffer = LastLoginBuffer()
+        now = timezone.now()
+        for user in self.users:
+            buffer.record(user.pk, now - timedelta(minutes=5))
+            buffer.record(user.pk, now)
+        buffer.record(self.users[0].pk, now - timedelta(minutes=10)) # Older, ignored
+        self.assertEqual(len(buffer), 3)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 3)
+        for user in self.users:
+            user.refresh_from_db()
+            self.assertEqual(user.last_login, now)
+        self.assertEqual(buffer.flush(), 0)
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_immediately(self):
+        """
+        Ensure LAST_LOGIN_FLUSH_INTERVAL=0 writes last_login during the request.
+        """
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'login1@example.com', 'password': 'pass1234'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.users[1].refresh_from_db()
+        self.assertIsNotNone(self.users[1].last_login)
+
+
+def throttle_rates(**rates):
+    """REST_FRAMEWORK settings with the given throttle rates."""
+    return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+
+class ThrottlingTests(APITestCase):
+    """
+    Tests for the token-bucket throttling of location pings and onboarding.
+    """
+    def setUp(self):
+        cache.clear()
+        reset_throttles()
+        self.user = get_user_model().objects.create_user(email='pinger@example.com', password='pass1234')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def tearDown(self):
+        reset_throttles()
+
+    def test_bucket_refills_over_time(self):
+        """
+        Ensure a bucket allows a burst of its capacity, then refills at capacity per period.
+        """
+        self.assertEqual(parse_rate('60/min'), (60, 60))
+        self.assertEqual(parse_rate('10/5m'), (10, 300))
+        self.assertIsNone(parse_rate(None))
+        store = LocalBucketStore(maxsize=2)
+        with patch('api.throttling.time.monotonic', return_value=1000.0) as clock:
+            self.assertEqual([store.consume('a', 3, 60) for _ in range(3)], [0, 0, 0])
+            self.assertAlmostEqual(store.consume('a', 3, 60), 20.0)
+            clock.return_value = 1020.0 # One token back
+            self.assertEqual(store.consume('a', 3, 60), 0)
+            self.assertGreater(store.consume('a', 3, 60), 0)
+            store.consume('b', 3, 60)
+            store.consume('c', 3, 60)
+        self.assertEqual(len(store), 2) # 'a' was dropped
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(location='2/min'))
+    def test_location_pings_throttled_per_user(self):
+        """
+        Ensure pings past the rate get 429 with Retry-After, without writing anything.
+        """
+        url = reverse('api:location')
+        ping = {'latitude': 39.678, 'longitude': -104.962}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, ping, format='json').status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1): # Authentication's user lookup only
+            response = self.client.post(url, ping, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(UserLocation.objects.count(), 2)
+
+        # Other users have their own bucket
+        other = get_user_model().objects.create_user(email='other@example.com', password='pass1234')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(other)}')
+        self.assertEqual(self.client.post(url, ping, format='json').status_code, status.HTTP_201_CREATED)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(onboarding='1/hour'))
+    def test_onboarding_throttled_per_ip(self):
+        """
+        Ensure signups are limited per IP address before the serializer runs.
+        """
+        self.client.credentials()
+        url = reverse('api:onboarding')
+        response = self.client.post(url, {'email': 'first@example.com', 'password': 'pass1234', 'personality_answers': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with patch.object(OnboardingSerializer, 'is_valid') as is_valid:
+            response = self.client.post(url, {'email': 'second@example.com', 'password': 'pass1234', 'personality_answers': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        is_valid.assert_not_called()
+        # Without a configured proxy, X-Forwarded-For is the client's to make up
+        response = self.client.post(url, {'email': 'second@example.com', 'password': 'pass1234', 'personality_answers': []}, format='json', HTTP_X_FORWARDED_FOR='203.0.113.9')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post(url, {'email': 'second@example.com', 'password': 'pass1234', 'personality_answers': []}, format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(location='1/min'), THROTTLE_STORE='cache')
+    def test_cache_store_is_shared(self):
+        """
+        Ensure the cache store keeps buckets outside the worker's memory.
+        """
+        url = reverse('api:location')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        reset_throttles() # Only clears in-process buckets
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(location='1/min'))
+    async def test_async_location_view_throttled(self):
+        """
+        Ensure the async location view applies the same bucket.
+        """
+        view = AsyncUserLocationView.as_view()
+        auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+        factory = AsyncRequestFactory()
+        self.assertEqual((await view(factory.get('/api/location/', **auth))).status_code, status.HTTP_404_NOT_FOUND)
+        response = await view(factory.get('/api/location/', **auth))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+
+class KeysetPaginationTests(APITestCase):
+    """
+    Tests for keyset (cursor) pagination of the question list.
+    """
+    def setUp(self):
+        cache.clear()
+        # Repeated orders, so pages have to break ties by id
+        self.questions = [
+            PersonalityQuestion.objects.create(text=f"Question {i}", order=i // 2)
+            for i in range(7)
+        ]
+        self.url = reverse('api:personality-questions')
+
+    def collect_pages(self, url):
+        texts, pages = [], 0
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            texts += [question['text'] for question in response.data['results']]
+            url = response.data['next']
+            pages += 1
+        return texts, pages
+
+    def test_pages_cover_every_question_once(self):
+        """
+        Ensure following `next` returns every question once, in display order.
+        """
+        texts, pages = self.collect_pages(f'{self.url}?page_size=3')
+        self.assertEqual(texts, [question.text for question in self.questions])
+        self.assertEqual(pages, 3)
+
+        # Without pagination parameters the full list is served as before
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 7)
+
+    def test_cursor_is_stable_across_inserts(self):
+        """
+        Ensure rows added before the cursor's position don't shift later pages.
+        """
+        response = self.client.get(f'{self.url}?page_size=3')
+        PersonalityQuestion.objects.create(text="Question early", order=0)
+        texts, _ = self.collect_pages(response.data['next'])
+        self.assertEqual(texts, [question.text for question in self.questions[3:]])
+
+    def test_invalid_cursor(self):
+        """
+        Ensure malformed cursors get 404 rather than a server error.
+        """
+        for cursor in ['not-base64!', 'WyJ4Il0', 'WyJ4IiwgIjEiXQ']: # '["x"]', '["x", "1"]'
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_view_pages(self):
+        """
+        Ensure the async question view serves the same pages.
+        """
+        view = AsyncPersonalityQuestionListView.as_view()
+        response = await view(AsyncRequestFactory().get(self.url, {'page_size': 5}))
+        page = json.loads(response.content)
+        self.assertEqual(len(page['results']), 5)
+        response = await view(AsyncRequestFactory().get(page['next']))
+        self.assertEqual([question['text'] for question in json.loads(response.content)['results']], ["Question 5", "Question 6"])
+        sync_page = (await sync_to_async(self.client.get)(page['next'])).data
+        self.assertIsNone(sync_page['next'])
+
+
+class LocationHistoryTests(APITestCase):
+    """
+    Tests for the paged, optionally downsampled location history.
+    """
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='trail@example.com', password='pass1234')
+        self.other = User.objects.create_user(email='elsewhere@example.com', password='pass1234')
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        # A ping every 10 seconds for 5 minutes
+        for i in range(30):
+            location = UserLocation.objects.create(user=self.user, latitude=39.6 + i / 1000, longitude=-104.9)
+            UserLocation.objects.filter(pk=location.pk).update(last_updated=self.start + timedelta(seconds=10 * i))
+        UserLocation.objects.create(user=self.other, latitude=0, longitude=0)
+        self.url = reverse('api:location-history')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def collect(self, url, params=None):
+        times, pages = [], 0
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            times += [location['last_updated'] for location in response.data['results']]
+            url, params, pages = response.data['next'], None, pages + 1
+        return times, pages
+
+    def test_history_pages_newest_first(self):
+        """
+        Ensure the history comes back newest first in pages, without other users' pings.
+        """
+        times, pages = self.collect(self.url, {'page_size': 8})
+        self.assertEqual(len(times), 30)
+        self.assertEqual(pages, 4)
+        self.assertEqual(times, sorted(times, reverse=True))
+
+    def test_crafted_cursor(self):
+        """
+        Ensure well-formed cursors holding values of the wrong type get 404 rather than a server error.
+        """
+        for cursor in ['W3t9LCAwXQ', 'W251bGwsIDBd', 'WzAsIG51bGxd']: # '[{}, 0]', '[null, 0]', '[0, null]'
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_time_range(self):
+        """
+        Ensure since is inclusive and until exclusive.
+        """
+        since = (self.start + timedelta(seconds=100)).isoformat()
+        until = (self.start + timedelta(seconds=200)).isoformat()
+        times, _ = self.collect(self.url, {'since': since, 'until': until})
+        self.assertEqual(len(times), 10)
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_downsampling(self):
+        """
+        Ensure ?every= keeps the newest ping per window, consistently across pages.
+        """
+        times, _ = self.collect(self.url, {'every': 60})
+        self.assertEqual(len(times), 5) # One per minute
+        paged_times, pages = self.collect(self.url, {'every': 60, 'page_size': 2})
+        self.assertEqual(paged_times, times)
+        self.assertEqual(pages, 3)
+        self.assertEqual(self.client.get(self.url, {'every': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_staff_see_other_users(self):
+        """
+        Ensure ?user= is limited to staff.
+        """
+        response = self.client.get(self.url, {'user': self.other.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(self.url, {'user': self.other.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+def jpeg_upload(name='photo.jpg', size=(3000, 2000), color=(200, 80, 40)):
+    """An in-memory JPEG upload carrying EXIF data (rotation and a camera model)."""
+    exif = Image.Exif()
+    exif[0x0112] = 6 # Orientation: rotate 90 degrees
+    exif[0x0110] = "Phone 12" # Camera model
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+class ProfileImageTests(APITestCase):
+    """
+    Tests for the profile image pipeline.
+    """
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name, PROFILE_IMAGE_WORKERS=0)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = get_user_model().objects.create_user(email='photo@example.com', password='pass1234')
+        self.profile = Profile.objects.create(user=self.user)
+        self.url = reverse('api:profile-me')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(self.user).access_token}')
+
+    def test_upload_is_processed_after_commit(self):
+        """
+        Ensure an upload is resized, stripped of metadata and served with thumbnails.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {'image': jpeg_upload()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['image_thumbnails']) # Rendered before processing
+
+        self.profile.refresh_from_db()
+        self.assertEqual(len(self.profile.image_hash), 64)
+        self.assertEqual(self.profile.image.name, image_path(self.profile.image_hash, 'full'))
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'profile_images')), [self.profile.image_hash[:2]]) # Original deleted
+        with Image.open(self.profile.image.path) as full:
+            self.assertEqual(full.size, (1067, 1600)) # Rotated upright, longest side capped
+            self.assertEqual(len(full.getexif()), 0)
+        with default_storage.open(image_path(self.profile.image_hash, 'small')) as f, Image.open(f) as small:
+            self.assertEqual(small.size, (128, 128))
+
+        response = self.client.get(self.url)
+        self.assertEqual(set(response.data['image_thumbnails']), {'small', 'medium'})
+        self.assertTrue(response.data['image_thumbnails']['small'].endswith(f"{self.profile.image_hash}/small.jpg"))
+        self.assertTrue(response.data['image'].endswith('full.jpg'))
+
+    def test_identical_uploads_are_stored_once(self):
+        """
+        Ensure the same upload from another profile reuses the processed files.
+        """
+        other = Profile.objects.create(user=get_user_model().objects.create_user(email='twin@example.com', password='pass1234'))
+        upload = jpeg_upload()
+        for profile in (self.profile, other):
+            upload.seek(0)
+            profile.image.save('photo.jpg', upload)
+        first_hash = process_profile_image(self.profile.pk)
+        with patch('api.images.render_variants') as render_variants:
+            self.assertEqual(process_profile_image(other.pk), first_hash)
+        render_variants.assert_not_called()
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, image_path(first_hash, 'full'))
+        self.assertIsNone(process_profile_image(other.pk)) # Nothing left to do
+
+    def test_replaced_upload_is_left_alone(self):
+        """
+        Ensure processing doesn't overwrite an image uploaded while it ran.
+        """
+        self.profile.image.save('first.jpg', jpeg_upload())
+        real_store = store_variants
+        def upload_meanwhile(image_hash, data):
+            Profile.objects.filter(pk=self.profile.pk).update(image='profile_images/second.jpg')
+            return real_store(image_hash, data)
+        with patch('api.images.store_variants', side_effect=upload_meanwhile):
+            process_profile_image(self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.image.name, self.profile.image_hash), ('profile_images/second.jpg', ''))
+
+    def test_processing_runs_in_worker_pool(self):
+        """
+        Ensure uploads are handed to the worker pool, not processed during the request.
+        """
+        with override_settings(PROFILE_IMAGE_WORKERS=2), patch('api.images._get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(self.url, {'image': jpeg_upload()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        get_executor.return_value.submit.assert_called_once_with(_process_in_background, self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.image_hash, '')
+
+
+class MediaServingTests(APITestCase):
+    """
+    Tests for serving MEDIA_ROOT with conditional requests, byte ranges and caching headers.
+    """
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.hashed = f"profile_images/ab/{'ab' * 32}/small.jpg"
+        for name in ('profile_images/upload.jpg', self.hashed):
+            os.makedirs(os.path.dirname(os.path.join(media_root.name, name)), exist_ok=True)
+            with open(os.path.join(media_root.name, name), 'wb') as f:
+                f.write(b'0123456789')
+
+    def get(self, name, **headers):
+        return self.client.get(reverse('media', args=[name]), headers=headers)
+
+    def test_conditional_requests(self):
+        """
+        Ensure files carry validators and a matching If-None-Match gets 304.
+        """
+        response = self.get('profile_images/upload.jpg')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual((response['Content-Type'], response['Content-Length'], response['Accept-Ranges']), ('image/jpeg', '10', 'bytes'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        not_modified = self.get('profile_images/upload.jpg', If_None_Match=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified.content, b'')
+
+    def test_content_hashed_files_are_immutable(self):
+        """
+        Ensure processed (content-hashed) images may be cached for a year.
+        """
+        cache_control = self.get(self.hashed)['Cache-Control']
+        self.assertIn('immutable', cache_control)
+        self.assertIn('max-age=31536000', cache_control)
+
+    def test_byte_ranges(self):
+        """
+        Ensure single byte ranges get 206 with just those bytes.
+        """
+        for header, body, content_range in [
+            ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=8-100', b'89', 'bytes 8-9/10'),
+        ]:
+            response = self.get(self.hashed, Range=header)
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(b''.join(response.streaming_content), body)
+            self.assertEqual(response['Content-Range'], content_range)
+            self.assertEqual(response['Content-Length'], str(len(body)))
+
+        response = self.get(self.hashed, Range='bytes=10-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        # A partial copy from an older version gets the whole file
+        self.assertEqual(self.get(self.hashed, Range='bytes=2-5', If_Range='"stale"').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get(self.hashed, Range='bytes=0-1,4-5').status_code, status.HTTP_200_OK)
+
+    def test_only_files_inside_media_root(self):
+        """
+        Ensure paths outside MEDIA_ROOT, directories and missing files get 404.
+        """
+        for name in ['../outside.jpg', 'profile_images', 'profile_images/missing.jpg']:
+            self.assertEqual(self.client.get(f'/media/{name}').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.post(reverse('media', args=[self.hashed])).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_head_and_accel_redirect(self):
+        """
+        Ensure HEAD sends only headers and MEDIA_ACCEL_REDIRECT hands the file to nginx.
+        """
+        response = self.client.head(reverse('media', args=[self.hashed]))
+        self.assertEqual((response.status_code, response['Content-Length'], response.content), (200, '10', b''))
+
+        with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = self.get(self.hashed)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.hashed}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+class GenerateCampusDatasetTests(APITestCase):
+    """
+    Tests for the generate_campus_dataset management command.
+    """
+    def test_generates_profiles_answers_and_location_history(self):
+        """
+        Ensure students get the full question set answered and keep the
+        historical timestamps of their location pings, none in the future.
+        """
+        call_command('generate_campus_dataset', users=3, days=2, ping_minutes=60, batch_size=2, seed=3, stdout=StringIO())
+
+        self.assertGreaterEqual(PersonalityQuestion.objects.count(), 120)
+        users = get_user_model().objects.filter(email__endswith='@testuser.com')
+        self.assertEqual(users.count(), 3)
+        for user in users:
+            self.assertEqual(user.profile.personality_answers.count(), PersonalityQuestion.objects.count())
+            self.assertTrue(user.profile.interests.exists())
+            timestamps = user.locations.values_list('last_updated', flat=True)
+            days = {timestamp.astimezone(CAMPUS_TZ).date() for timestamp in timestamps}
+            self.assertEqual(len(days), 2)
+            self.assertLess(max(timestamps), timezone.now())
+
 class ProfileModelTests(APITestCase):
         """tests for the profile model methods"""
         @classmethod 
@@ -0,0 +1,172 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# --- Token-bucket throttling ---
+# Every client (the user, or the IP address for anonymous requests) has one
+# bucket per throttle scope. A bucket holds up to N tokens and refills at
+# N per period, so a client can burst N requests and then gets N per period.
+# Each request takes a token; without one it is rejected with 429 and a
+# Retry-After header. DRF checks throttles after authentication but before
+# the handler runs, so a rejected request never parses its body or reaches
+# a serializer.
+#
+# Views opt in with `throttle_scope`. The rates, like '60/min', live in
+# REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+#
+# Buckets live in the worker's memory by default (THROTTLE_STORE='local'):
+# no I/O at all, but each worker counts separately, so a client can get up
+# to N per period from every worker. THROTTLE_STORE='cache' keeps them in
+# the shared cache instead, which costs a get and a set per request. There
+# the read-modify-write isn't atomic, so concurrent requests can let a few
+# extra through.
+
+RATE_PATTERN = re.compile(r'^(?P<requests>\d+)/(?P<count>\d*)(?P<unit>[a-z]+)$')
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Args:
+        rate: '<requests>/<period>', period one of s, m, h, d (or sec, min,
+              hour, day), optionally with a count, e.g. '10/5min'
+
+    Returns:
+        Tuple of (capacity, period in seconds), or None for no limit
+    """
+    if not rate:
+        return None
+    match = RATE_PATTERN.match(rate)
+    if match is None or match['unit'] not in PERIODS:
+        raise ValueError(f"Invalid throttle rate {rate!r}, expected e.g. '60/min'")
+    return int(match['requests']), int(match['count'] or 1) * PERIODS[match['unit']]
+
+
+class LocalBucketStore:
+    """
+    Buckets in process memory. Keeps at most `maxsize` buckets, dropping the
+    least recently used (a dropped bucket starts over full).
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict() # key -> (tokens, monotonic time)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def consume(self, key, capacity, period):
+        """
+        Take a token from bucket `key`.
+
+        Returns:
+            0 if the request may go ahead, else seconds until a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens, wait = _take(bucket, capacity, period, now)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def aconsume(self, key, capacity, period):
+        return self.consume(key, capacity, period)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets in the default cache, shared by every worker using it."""
+    def consume(self, key, capacity, period):
+        now = time.time()
+        tokens, wait = _take(cache.get(f"throttle:{key}"), capacity, period, now)
+        # An untouched bucket is full again after one period, so it can expire then
+        cache.set(f"throttle:{key}", (tokens, now), math.ceil(period))
+        return wait
+
+    async def aconsume(self, key, capacity, period):
+        now = time.time()
+        tokens, wait = _take(await cache.aget(f"throttle:{key}"), capacity, period, now)
+        await cache.aset(f"throttle:{key}", (tokens, now), math.ceil(period))
+        return wait
+
+def _take(bucket, capacity, period, now):
+    """Refill `bucket` ((tokens, time) or None for a new one) up to `now` and take a token."""
+    refill_rate = capacity / period
+    if bucket is None:
+        tokens = capacity
+    else:
+        tokens, updated = bucket
+        tokens = min(capacity, tokens + max(now - updated, 0) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill_rate
+
+
+_local_store = LocalBucketStore(settings.THROTTLE_LOCAL_MAX_BUCKETS)
+_cache_store = CacheBucketStore()
+
+def get_store():
+    return _cache_store if settings.THROTTLE_STORE == 'cache' else _local_store
+
+def reset_throttles():
+    """Empty the in-process buckets (for tests)."""
+    _local_store.clear()
+
+def throttle_rate(scope):
+    """The (capacity, period) for `scope`, or None if it isn't limited."""
+    if scope is None:
+        return None
+    return parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+
+def client_key(request, scope):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"{scope}:user:{user.pk}"
+    # get_ident honours REST_FRAMEWORK['NUM_PROXIES'] for X-Forwarded-For
+    return f"{scope}:ip:{BaseThrottle().get_ident(request)}"
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle (in DEFAULT_THROTTLE_CLASSES) for views that set
+    `throttle_scope`; other views aren't limited.
+    """
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = throttle_rate(scope)
+        if rate is None:
+            return True
+        self.wait_time = get_store().consume(client_key(request, scope), *rate)
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
+
+async def acheck_throttle(request, scope):
+    """
+    TokenBucketThrottle for the async views.
+
+    Raises:
+        Throttled: The client's bucket for `scope` is empty
+    """
+    rate = throttle_rate(scope)
+    if rate is None:
+        return
+    wait = await get_store().aconsume(client_key(request, scope), *rate)
+    if wait:
+        raise Throttled(wait)
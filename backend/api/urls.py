@@ -1,14 +1,31 @@
 # backend/api/urls.py
+from django.conf import settings
 from django.urls import path
+from .async_views import AsyncPersonalityQuestionListView, AsyncUserLocationView
 from .views import (
     OnboardingView,
     UserProfileView,
     PersonalityQuestionListView,
+    PersonalityCatalogView,
+    AutocompleteView,
+    ExportView,
+    DatabaseHealthView,
+    RequestProfileListView,
+    RequestProfileView,
     UserLocationView,
+    UserLocationHistoryView,
 )
 
 app_name = 'api' # Namespace for the API urls
 
+# Under ASGI (see core/asgi.py) the I/O-bound endpoints use native async views
+if settings.ASYNC_API_VIEWS:
+    personality_question_list_view = AsyncPersonalityQuestionListView.as_view()
+    user_location_view = AsyncUserLocationView.as_view()
+else:
+    personality_question_list_view = PersonalityQuestionListView.as_view()
+    user_location_view = UserLocationView.as_view()
+
 urlpatterns = [
     # POST /api/onboarding/ -> Creates a new user and profile
     path('onboarding/', OnboardingView.as_view(), name='onboarding'),
@@ -17,8 +34,29 @@ urlpatterns = [
     path('profile/me/', UserProfileView.as_view(), name='profile-me'),
 
     # GET /api/personality-questions/ -> Lists available personality questions
-    path('personality-questions/', PersonalityQuestionListView.as_view(), name='personality-questions'),
+    path('personality-questions/', personality_question_list_view, name='personality-questions'),
+
+    # GET /api/personality-catalog/ -> Static texts for personality result codes
+    path('personality-catalog/', PersonalityCatalogView.as_view(), name='personality-catalog'),
+
+    # GET /api/autocomplete/<interests|clubs|majors|minors|courses>/?q= -> Typeahead suggestions
+    path('autocomplete/<str:kind>/', AutocompleteView.as_view(), name='autocomplete'),
+
+    # GET /api/export/<profiles|answers|locations>/?output=csv -> Streams data for analysis (staff only)
+    path('export/<str:name>/', ExportView.as_view(), name='export'),
+
+    # GET /api/health/db/ -> Database round trip, connection settings and pool stats (staff only)
+    path('health/db/', DatabaseHealthView.as_view(), name='health-db'),
+
+    # GET /api/debug/request-profiles/ -> Newest stored request profiles (staff only)
+    path('debug/request-profiles/', RequestProfileListView.as_view(), name='request-profiles'),
+
+    # GET /api/debug/request-profiles/<request id>/ -> Download one (staff only)
+    path('debug/request-profiles/<slug:profile_id>/', RequestProfileView.as_view(), name='request-profile'),
 
     # GET or POST
-    path('location/', UserLocationView.as_view(), name='location'),
+    path('location/', user_location_view, name='location'),
+
+    # GET /api/location/history/?since=&until=&every= -> The user's pings, newest first, in pages
+    path('location/history/', UserLocationHistoryView.as_view(), name='location-history'),
 ]
\ No newline at end of file
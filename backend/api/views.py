@@ -1,8 +1,24 @@
 from rest_framework import generics, permissions, status # Ensure permissions is imported
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from .cache import cached_profile_payload, etag_matches, get_question_list
+from .authentication import StatelessJWTAuthentication, TokenClaimsUser
+from .autocomplete import AUTOCOMPLETE_SOURCES, get_index
+from .catalog import get_personality_catalog
+from .export import EXPORT_FORMATS, EXPORTS, export_lines, parse_since
+from .health import database_status
+from .pagination import LocationHistoryPagination, PersonalityQuestionPagination
+from .profiling import PROFILE_FORMATS, find_profile, list_profiles
+from .replicas import ReplicaReadMixin, mark_recent_write, pick_replica
 from .models import (
+    PersonalityAnswer,
     Profile,
     PersonalityQuestion,
     UserLocation,
@@ -12,10 +28,30 @@ from .serializers import (
     ProfileUpdateSerializer,
     PersonalityQuestionSerializer,
     UserLocationSerializer,
+    fieldset_key,
 )
 
 User = get_user_model()
 
+class PrerenderedResponse(Response):
+    """
+    A Response whose JSON body was encoded ahead of time (see api.cache.prerender).
+    Other renderers, like the browsable API, still render `data` as usual.
+    """
+    def __init__(self, payload, **kwargs):
+        super().__init__(payload.data, **kwargs)
+        self.prerendered_body = payload.body
+        self['ETag'] = payload.etag
+
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, 'accepted_renderer', None)
+        # An indent parameter asks for different bytes than we have stored
+        if type(renderer) is JSONRenderer and 'indent' not in (self.accepted_media_type or ''):
+            self['Content-Type'] = renderer.media_type
+            return self.prerendered_body
+        return super().rendered_content
+
 # --- View for Onboarding (POST) ---
 class OnboardingView(generics.CreateAPIView):
     """
@@ -25,6 +61,12 @@ class OnboardingView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = OnboardingSerializer
     permission_classes = [permissions.AllowAny] # Anyone can create a new user account
+    throttle_scope = 'onboarding' # Per IP; password hashing makes signups expensive
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        # The new user's first reads must not hit a replica that hasn't seen them yet
+        mark_recent_write(serializer.instance.pk)
 
 # --- View for Personality Questions (GET) ---
 class PersonalityQuestionListView(generics.ListAPIView):
@@ -35,14 +77,162 @@ class PersonalityQuestionListView(generics.ListAPIView):
     queryset = PersonalityQuestion.objects.all().order_by('order')
     serializer_class = PersonalityQuestionSerializer
     permission_classes = [permissions.AllowAny] # Anyone can view the questions
+    pagination_class = PersonalityQuestionPagination
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serves the question list from its pre-rendered in-memory copy. The set
+        only changes when questions are (re)loaded, so shared caches may keep
+        it briefly and revalidate with the strong ETag.
+
+        With ?page_size= or ?cursor=, returns one keyset page instead.
+        """
+        if self.paginator.is_requested(request):
+            response = super().list(request, *args, **kwargs)
+            patch_cache_control(response, public=True, max_age=settings.QUESTION_LIST_MAX_AGE)
+            return response
+        payload = get_question_list(
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data)
+        )
+        if etag_matches(request, payload.etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': payload.etag})
+        else:
+            response = PrerenderedResponse(payload)
+        patch_cache_control(response, public=True, max_age=settings.QUESTION_LIST_MAX_AGE)
+        return response
+
+# --- View for the Personality Text Catalog (GET) ---
+class PersonalityCatalogView(generics.GenericAPIView):
+    """
+    Provides the static personality texts (domain/facet titles, descriptions and
+    result texts) that profile personality results refer to by code.
+    Accessible by anyone.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        payload = get_personality_catalog()
+        if etag_matches(request, payload.etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': payload.etag})
+        else:
+            response = PrerenderedResponse(payload)
+        if request.query_params.get('v') == payload.version:
+            # Versioned URLs never change content
+            patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=settings.PERSONALITY_CATALOG_MAX_AGE)
+        return response
+
+# --- View for Name Autocomplete (GET) ---
+class AutocompleteView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Typeahead for the names accepted by the onboarding and profile endpoints
+    (interests, clubs, majors, minors, courses), ranked by how many profiles
+    use each name. Served from an in-memory index.
+    Accessible by anyone (onboarding happens before login).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, kind, *args, **kwargs):
+        if kind not in AUTOCOMPLETE_SOURCES:
+            raise NotFound(f"Unknown autocomplete type '{kind}'.")
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        matches = get_index(kind).search(request.query_params.get('q', ''), limit)
+        response = Response([{'name': name, 'count': count} for name, count in matches])
+        patch_cache_control(response, public=True, max_age=60)
+        return response
+
+# --- View for Data Export (GET) ---
+class ExportView(generics.GenericAPIView):
+    """
+    Streams profiles, personality answers or locations for offline analysis
+    as JSONL (default) or CSV (?output=csv), optionally limited to rows since
+    ?since=<ISO date or datetime>. Rows are written as they are read, so
+    large tables don't build up in memory.
+    Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name, *args, **kwargs):
+        if name not in EXPORTS:
+            raise NotFound(f"Unknown export '{name}'.")
+        # Not ?format=, which DRF reserves for picking a renderer
+        file_format = request.query_params.get('output', 'jsonl')
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'output': f"Must be one of: {', '.join(EXPORT_FORMATS)}."})
+        since = request.query_params.get('since')
+        try:
+            since = parse_since(since) if since else None
+        except ValueError as e:
+            raise ValidationError({'since': str(e)})
+
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        # The rows are read while the response streams, after this view has returned
+        lines = export_lines(name, file_format, since=since, using=pick_replica())
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{name}.{file_format}"'
+        return response
+
+# --- View for Database Health (GET) ---
+class DatabaseHealthView(generics.GenericAPIView):
+    """
+    Reports whether each database answers, how long a round trip takes and
+    the connection settings in effect, including connection pool counters.
+    Returns 503 if any database is unreachable.
+    Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        databases = database_status()
+        healthy = all(database['ok'] for database in databases.values())
+        return Response(
+            {'databases': databases},
+            status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+# --- Views for Request Profiles (GET) ---
+class RequestProfileListView(generics.GenericAPIView):
+    """
+    Lists the newest stored request profiles (see ProfilingMiddleware).
+    Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(list_profiles())
+
+class RequestProfileView(generics.GenericAPIView):
+    """
+    Downloads a stored request profile by its ID: collapsed stacks as text
+    (feed to flamegraph.pl or speedscope) or cProfile stats (.prof).
+    Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, profile_id, *args, **kwargs):
+        found = find_profile(profile_id)
+        if found is None:
+            raise NotFound(f"No profile stored as '{profile_id}'.")
+        path, profile_format = found
+        return FileResponse(
+            open(path, 'rb'),
+            content_type=PROFILE_FORMATS[profile_format],
+            as_attachment=True,
+            filename=f"{profile_id}.{profile_format}",
+        )
 
 # --- View for User Profile (GET, PATCH) ---
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     """
     Allows authenticated users to retrieve (GET) and update (PATCH) their own profile.
     """
     queryset = Profile.objects.all() # Base queryset
     serializer_class = ProfileUpdateSerializer
+    authentication_classes = [StatelessJWTAuthentication] # Cached GETs need no query at all
     permission_classes = [permissions.IsAuthenticated] # Only logged-in users can access
 
     def get_object(self):
@@ -51,26 +241,70 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         currently authenticated user (request.user). Creates a profile if one
         doesn't exist yet for the user.
         """
-        # Use get_or_create to handle cases where a user might exist but not have a profile yet
-        # (e.g., created via createsuperuser or if onboarding failed mid-way)
-        profile, created = Profile.objects.get_or_create(user=self.request.user)
+        # get_or_create always reads from 'default'; try the (possibly replica) read first
+        profile = Profile.objects.select_related('user').filter(user_id=self.request.user.pk).first()
+        if profile is None:
+            # Use get_or_create to handle cases where a user might exist but not have a profile yet
+            # (e.g., created via createsuperuser or if onboarding failed mid-way).
+            # A GET only checked the token, which may outlive the account: load the
+            # user first (AuthenticationFailed if it's gone).
+            user = self.request.user
+            if isinstance(user, TokenClaimsUser):
+                user = user.user
+            try:
+                with transaction.atomic():
+                    profile = Profile.objects.create(user=user)
+            except IntegrityError:
+                # Created by a concurrent request, or the user was deleted meanwhile
+                profile = Profile.objects.select_related('user').filter(user_id=user.pk).first()
+                if profile is None:
+                    raise AuthenticationFailed("User not found", code="user_not_found")
+            else:
+                # A new profile has no relations yet; don't query for them
+                profile._prefetched_objects_cache = {
+                    field.name: getattr(profile, field.name).none()
+                    for field in Profile._meta.many_to_many
+                }
+                profile._prefetched_objects_cache['personality_answers'] = PersonalityAnswer.objects.none()
         return profile
 
-class UserLocationView(generics.GenericAPIView):
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serves the rendered profile from cache when nothing has changed, and
+        answers a matching If-None-Match with 304 Not Modified. Each requested
+        fieldset (?fields=, ?expand=, ?compact=) is cached separately.
+        """
+        etag, data = cached_profile_payload(
+            request.user.pk,
+            lambda: self.get_serializer(self.get_object()).data,
+            variant=fieldset_key(request.query_params),
+        )
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        # Clients may keep a copy but must revalidate before reusing it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class UserLocationView(ReplicaReadMixin, generics.GenericAPIView):
     """
     Endpoint for user location operations.
     GET: Retrieves the user's latest location
     POST: Creates a new location entry
     """
     serializer_class = UserLocationSerializer
+    authentication_classes = [StatelessJWTAuthentication] # Reads don't need the user row
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'location'
     
     def get(self, request, *args, **kwargs):
         """Handle GET requests - return the user's latest location"""
         try:
             # Get the most recent location for this user
             location = UserLocation.objects.filter(
-                user=self.request.user
+                user_id=self.request.user.pk
             ).order_by('-last_updated').first()
             
             if location:
@@ -97,7 +331,7 @@ class UserLocationView(generics.GenericAPIView):
         
         # Create a new location entry
         location = UserLocation.objects.create(
-            user=request.user,
+            user_id=request.user.pk,
             latitude=serializer.validated_data['latitude'],
             longitude=serializer.validated_data['longitude'],
             is_active=serializer.validated_data.get('is_active', True)
@@ -105,4 +339,39 @@ class UserLocationView(generics.GenericAPIView):
         
         # Return the created location data
         result_serializer = self.get_serializer(location)
-        return Response(result_serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(result_serializer.data, status=status.HTTP_201_CREATED)
+
+class UserLocationHistoryView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    The user's location pings, newest first, in keyset pages
+    (see LocationHistoryPagination). ?since= and ?until= (ISO date or
+    datetime) limit the pings to since <= last_updated < until, and
+    ?every=<seconds> keeps one ping per window. Staff can look at anyone's
+    history with ?user=<id>.
+    """
+    serializer_class = UserLocationSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LocationHistoryPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        user_id = self.request.user.pk
+        if params.get('user'):
+            try:
+                user_id = int(params['user'])
+            except ValueError:
+                raise ValidationError({'user': "Must be a user id."})
+            # is_staff loads the user row, so only when asking for someone else
+            if user_id != self.request.user.pk and not self.request.user.is_staff:
+                raise PermissionDenied("Only staff can see other users' locations.")
+
+        queryset = UserLocation.objects.filter(user_id=user_id)
+        for param, lookup in (('since', 'last_updated__gte'), ('until', 'last_updated__lt')):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: parse_since(params[param])})
+                except ValueError as e:
+                    raise ValidationError({param: str(e)})
+        return queryset
+
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+# Serve I/O-bound endpoints with async views (see api/async_views.py)
+os.environ.setdefault("ASYNC_API_VIEWS", "True")
 
 application = get_asgi_application()
@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.RequestMetricsMiddleware", # First, so it measures everything below
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -63,6 +64,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.ProfilingMiddleware", # After authentication; staff may ask for a profile
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -96,9 +98,137 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'), # This will be the service name in docker-compose.yml
         'PORT': os.getenv('POSTGRES_PORT', '5432'), # Default PG port
+        # Keep connections open between requests instead of reconnecting every
+        # time, and check a reused connection still works before handing it out
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)), # Seconds; 0 closes after every request
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Connection pool (psycopg 3). Each worker process gets its own pool, and a
+# gthread worker never uses more connections than it has threads, so the pool
+# is sized from GUNICORN_THREADS by default. The total across the server is
+# workers x DB_POOL_MAX_SIZE; keep it below PostgreSQL's max_connections.
+# Prefer the pool under ASGI, where persistent connections aren't reused.
+# CONN_HEALTH_CHECKS also makes the pool check connections it hands out.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 4)) # Must match --threads
+if DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0 # Connections go back to the pool instead
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', GUNICORN_THREADS)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)), # Seconds a request waits for a free connection
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 10 * 60)), # Seconds before idle connections above min_size close
+        },
+    }
+
+# Read replicas. POSTGRES_REPLICA_HOSTS is a comma-separated list of host[:port];
+# each becomes a 'replica_<n>' alias with the default database's name and
+# credentials. api.replicas.ReplicaRouter sends opted-in reads (profile,
+# location and autocomplete GETs, exports) to them. Any other aliases
+# listed in DATABASE_REPLICAS work the same way, e.g. a second SQLite file.
+# After a user writes, their reads stay on 'default' for REPLICA_STICKY_SECONDS;
+# keep it above the usual replication lag.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, map(str.strip, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(','))), start=1):
+    hostname, _, port = host.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': hostname,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'}, # Tests read their own writes through the replica
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# Serve the location and question endpoints with native async views. core/asgi.py
+# turns this on; WSGI workers keep the DRF views.
+ASYNC_API_VIEWS = os.getenv('ASYNC_API_VIEWS', 'False') == 'True'
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cached profiles, version tokens (invalidations), the read-your-writes marker
+# and shared throttle buckets must be seen by every process: all Gunicorn
+# workers, the backend-asgi service and management commands. Local memory is
+# per process and a FileBasedCache per container, so both only suit a single
+# process (development, tests). Deployments use a shared backend, e.g.
+# django.core.cache.backends.db.DatabaseCache (after `manage.py
+# createcachetable`) or Redis; `manage.py check --deploy` warns otherwise.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'serendipity'),
+    }
+}
+
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', 60 * 60)) # Seconds a rendered profile stays cached
+QUESTION_LIST_MAX_AGE = int(os.getenv('QUESTION_LIST_MAX_AGE', 5 * 60)) # Cache-Control max-age for the question list
+QUESTION_LIST_LOCAL_MAX_AGE = int(os.getenv('QUESTION_LIST_LOCAL_MAX_AGE', 5 * 60)) # Seconds a worker keeps its pre-rendered list without a version change
+PERSONALITY_CATALOG_MAX_AGE = int(os.getenv('PERSONALITY_CATALOG_MAX_AGE', 24 * 60 * 60)) # Cache-Control max-age for the text catalog
+
+# Process-local name <-> id cache for Major/Minor/Interest/Club/Course lookups
+REFERENCE_CACHE_MAXSIZE = int(os.getenv('REFERENCE_CACHE_MAXSIZE', 10000)) # Entries per model
+REFERENCE_CACHE_SHARED_INVALIDATION = os.getenv('REFERENCE_CACHE_SHARED_INVALIDATION', 'True') == 'True' # Propagate changes to other workers via the cache
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.getenv('REFERENCE_CACHE_CHECK_INTERVAL', 1)) # Seconds between shared version checks
+
+# In-memory autocomplete index over the reference tables
+AUTOCOMPLETE_MAX_RESULTS = int(os.getenv('AUTOCOMPLETE_MAX_RESULTS', 20)) # Upper bound for ?limit=
+AUTOCOMPLETE_REFRESH_INTERVAL = float(os.getenv('AUTOCOMPLETE_REFRESH_INTERVAL', 5 * 60)) # Seconds before popularity counts are recomputed
+AUTOCOMPLETE_CHECK_INTERVAL = float(os.getenv('AUTOCOMPLETE_CHECK_INTERVAL', 1)) # Seconds between shared version checks
+
+# Request metrics (api.middleware.RequestMetricsMiddleware)
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True') == 'True' # Send query count and timings to clients
+# Most queries each endpoint may run, keyed by '<METHOD> <url name>' or '<url name>'.
+# Going over logs a warning; with ENFORCE_QUERY_BUDGETS (always on under
+# `manage.py test`, see TEST_RUNNER) the request fails instead.
+QUERY_BUDGETS = {
+    # Name lists cost at most 4 queries each (lookup, savepoint, one insert,
+    # release) however many names they hold, and replacing a list's rows
+    # another 4, so the write budgets are the worst case: every list new.
+    'POST api:onboarding': 44, # Six lists of new names; answers cost one query in total
+    'GET api:profile-me': 9, # The profile and its relations; a first GET creates the profile instead
+    'PATCH api:profile-me': 60, # Six lists replaced with new names, plus the UPDATE and rendering the result
+    'api:personality-questions': 2,
+    'api:autocomplete': 3,
+    'GET api:location': 1, # Stateless JWT authentication: no user lookup
+    'POST api:location': 2, # Writes load the user row: the token may outlive the account
+    'api:location-history': 2, # One page; staff asking for another user also load their own row
+}
+ENFORCE_QUERY_BUDGETS = os.getenv('ENFORCE_QUERY_BUDGETS', 'False') == 'True'
+TEST_RUNNER = 'api.test_runner.QueryBudgetTestRunner' # Enforces QUERY_BUDGETS for every test
+
+# Request profiling (api.middleware.ProfilingMiddleware). Staff can profile any
+# request on demand; PROFILING_SAMPLE_RATE additionally samples that fraction of
+# all requests (e.g. 0.001). Outputs are kept in PROFILING_DIR by request ID.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL = float(os.getenv('PROFILING_INTERVAL', 0.001)) # Seconds between stack samples
+PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/request_profiles')
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 500)) # Oldest are deleted beyond this
+
+# Prometheus scrape endpoint (/metrics, see api/monitoring.py). When set, scrapers
+# must send this as a bearer token; leave empty if /metrics isn't publicly reachable.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request; INFO logs every request, WARNING only those over budget
+        'api.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,6 +276,14 @@ AUTH_USER_MODEL = 'api.CustomUser'
 # User uploads/media
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+SERVE_MEDIA = os.getenv('SERVE_MEDIA', 'True') == 'True' # Serve MEDIA_URL from Django (api/media.py); off when a web server or CDN does
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '') # nginx `internal` location aliasing MEDIA_ROOT, e.g. /protected-media/; empty sends files from Django
+
+# Profile image processing (api/images.py)
+PROFILE_IMAGE_WORKERS = int(os.getenv('PROFILE_IMAGE_WORKERS', 2)) # Threads per process; 0 processes during the request
+PROFILE_IMAGE_MAX_SIZE = int(os.getenv('PROFILE_IMAGE_MAX_SIZE', 1600)) # Longest side of the full-size image, px
+PROFILE_IMAGE_THUMBNAILS = {'small': 128, 'medium': 512} # Square thumbnails: name -> side in px
+PROFILE_IMAGE_QUALITY = int(os.getenv('PROFILE_IMAGE_QUALITY', 82)) # JPEG quality
 
 # REST Framework Settings
 REST_FRAMEWORK = {
@@ -160,17 +298,32 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
         # Or be more restrictive:
         # 'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    # Token buckets for views with a throttle_scope (api/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.TokenBucketThrottle',
+    ),
+    # '<burst>/<period>': up to <burst> requests at once, refilled at <burst> per period
+    'DEFAULT_THROTTLE_RATES': {
+        'location': os.getenv('THROTTLE_RATE_LOCATION', '60/min'), # Per user
+        'onboarding': os.getenv('THROTTLE_RATE_ONBOARDING', '10/min'), # Per IP address; campus NAT puts many students behind one
+    },
+    # Proxies in front of the app that append to X-Forwarded-For (nginx: 1). 0 uses
+    # REMOTE_ADDR; never None, which trusts the whole client-supplied header
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES') or 0),
     # Add pagination, filtering settings here if needed later
 }
 
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'local') # 'local' (per worker, in memory) or 'cache' (shared via CACHES)
+THROTTLE_LOCAL_MAX_BUCKETS = int(os.getenv('THROTTLE_LOCAL_MAX_BUCKETS', 100000)) # Least recently used are dropped beyond this
+
 # Simple JWT Settings (Customize token lifetimes, algorithms, etc.)
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60), # e.g., 1 hour
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),    # e.g., 1 day
     'ROTATE_REFRESH_TOKENS': False, # Set to True to issue new refresh token on refresh
     'BLACKLIST_AFTER_ROTATION': False, # Requires adding 'rest_framework_simplejwt.token_blacklist' to INSTALLED_APPS if True
-    'UPDATE_LAST_LOGIN': True, # Update user's last_login field on token refresh
+    'UPDATE_LAST_LOGIN': False, # Login and refresh buffer last_login instead (api/last_login.py, LAST_LOGIN_FLUSH_INTERVAL)
 
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY, # Use Django's secret key loaded from .env
@@ -185,6 +338,10 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
+    # Tokens also carry is_active so hot endpoints can skip the user lookup
+    # on reads (api.authentication.StatelessJWTAuthentication)
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.LastLoginTokenRefreshSerializer',
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
@@ -196,3 +353,7 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5), # Not typically used with access/refresh pair
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1), # Not typically used with access/refresh pair
 }
+
+# Seconds a login or token refresh may wait before its last_login is written
+# (in bulk, per worker). 0 writes it during the request.
+LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 30))
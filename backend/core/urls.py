@@ -14,8 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include # Import include
+from api.media import serve_media
+from api.monitoring import metrics_view
 # Import Simple JWT views
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -29,4 +32,10 @@ urlpatterns = [
     # Authentication URLs using Simple JWT
     path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'), # POST username/password -> access/refresh tokens
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), # POST refresh token -> new access token
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+# Uploaded files (profile images) with ETags, byte ranges and long-lived caching
+if settings.SERVE_MEDIA and settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'))
@@ -0,0 +1,25 @@
+# backend/gunicorn.conf.py
+# Gunicorn reads this from the working directory (/app in the container) on
+# every start, for both the WSGI and the ASGI service.
+import os
+import shutil
+
+# Each worker writes its Prometheus samples to files here and /metrics adds
+# them up across workers (see api/monitoring.py). Set before the workers
+# import the app, since prometheus_client reads it on import.
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to this one's
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir)
+
+def child_exit(server, worker):
+    # Counters of dead workers are kept; only their live gauges are dropped
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def worker_exit(server, worker):
+    # Write last_login values still waiting in this worker (api/last_login.py)
+    from api.last_login import flush_last_logins
+    flush_last_logins()